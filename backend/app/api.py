@@ -1,604 +1,534 @@
-from flask import Blueprint, jsonify, request
-import sqlite3
-from .config import DB_PATH
+import base64
+import time
+from datetime import datetime, timedelta
+
+from flask import Blueprint, Response, g, jsonify, request
+from .config import SITES
+from .db import PoolTimeout, connection
+from .response_cache import cached_response, responses
+from . import archive, export, metrics, stats, tracks
+from .broadcast import broadcaster
+from . import jobs
 
 api_bp = Blueprint("api", __name__)
 
+
+@api_bp.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+@api_bp.after_request
+def _record_request(resp):
+    # labelled by route pattern, not path, so /api/flights/<id>/track is one
+    # series; streamed bodies (/api/stream, /api/export) count until the
+    # response starts, not until the client has read it
+    started = g.pop("request_started", None)
+    if started is not None and request.url_rule is not None:
+        route = request.url_rule.rule
+        metrics.HTTP_SECONDS.labels(route, request.method).observe(time.perf_counter() - started)
+        metrics.HTTP_REQUESTS.labels(route, request.method, str(resp.status_code)).inc()
+    return resp
+
+
+@api_bp.errorhandler(PoolTimeout)
+def _pool_exhausted(e):
+    print("[API] Busy:", e)
+    resp = jsonify({"error": "database busy, retry shortly"})
+    resp.headers["Retry-After"] = "1"
+    return resp, 503
+
+
+def _encode_cursor(last_seen: str, flight_id: int) -> str:
+    raw = f"{last_seen}|{flight_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        last_seen, flight_id = (
+            base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rsplit("|", 1)
+        )
+        return last_seen, int(flight_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
 @api_bp.route("/api/flights")
+@cached_response
 def get_flights():
+    """
+    Newest events first, paged by keyset: each page returns X-Next-Cursor,
+    and ?before=<cursor> continues strictly after that row. Every page is an
+    index seek on (last_seen, id) — or (<filter>, last_seen) — so page 500
+    costs the same as page 1. Optional filters: classification, reg,
+    callsign, site_id, since, until (ISO timestamps; since inclusive, until
+    exclusive).
+    """
     limit = min(int(request.args.get("limit", 100)), 1000)
-    offset = int(request.args.get("offset", 0))
-
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute(
-        """
+    offset = int(request.args.get("offset", 0))  # legacy; prefer `before`
+
+    where = []
+    params = []
+
+    for column in ("classification", "reg", "callsign", "site_id"):
+        value = request.args.get(column)
+        if value:
+            where.append(f"{column} = ?")
+            params.append(value)
+
+    if request.args.get("since"):
+        where.append("last_seen >= ?")
+        params.append(request.args["since"])
+    if request.args.get("until"):
+        where.append("last_seen < ?")
+        params.append(request.args["until"])
+    upper = request.args.get("until")
+
+    before = request.args.get("before")
+    if before:
+        cursor = _decode_cursor(before)
+        if cursor is None:
+            return jsonify({"error": "invalid cursor"}), 400
+        where.append("(last_seen, id) < (?, ?)")
+        params.extend(cursor)
+        offset = 0
+        upper = min(upper or cursor[0], cursor[0])
+
+    sql = f"""
         SELECT *
         FROM flights
-        ORDER BY last_seen DESC
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY last_seen DESC, id DESC
         LIMIT ? OFFSET ?;
-        """,
-        (limit, offset),
+    """
+
+    with connection() as conn:
+        cur = conn.cursor()
+
+        cur.execute(sql, (*params, limit, offset))
+        rows = [dict(r) for r in cur.fetchall()]
+
+        # A short page has run off the end of the hot table; archived events
+        # are all older, so the same query continues in the partitions.
+        if len(rows) < limit and not offset:
+            seen = {r["id"] for r in rows}
+            rows += [
+                r
+                for r in archive.fetch(
+                    cur,
+                    sql,
+                    (*params, limit - len(rows), 0),
+                    since=request.args.get("since"),
+                    until=upper,
+                    limit=limit - len(rows),
+                )
+                if r["id"] not in seen
+            ]
+
+    resp = jsonify(rows)
+    if len(rows) == limit:
+        resp.headers["X-Next-Cursor"] = _encode_cursor(rows[-1]["last_seen"], rows[-1]["id"])
+    return resp
+
+
+@api_bp.route("/api/sites")
+def get_sites():
+    """The configured observer sites; each id is a valid ?site_id= filter"""
+    return jsonify([site._asdict() for site in SITES])
+
+
+@api_bp.route("/api/flights/<int:flight_id>/track")
+@cached_response
+def get_flight_track(flight_id):
+    """
+    Position history of one event, decoded from its packed blob straight into
+    parallel arrays: t (seconds since started_at), lat, lon, altitude_ft,
+    ground_speed_kt, distance_nm, heading_deg. ?max_points=N thins it evenly.
+    """
+    try:
+        max_points = max(2, int(request.args["max_points"])) if "max_points" in request.args else None
+    except ValueError:
+        return jsonify({"error": "max_points must be an integer"}), 400
+
+    sql = "SELECT started_at, tail, data FROM flight_tracks WHERE flight_id = ?;"
+    with connection() as conn:
+        cur = conn.cursor()
+        found = cur.execute(sql, (flight_id,)).fetchone()
+
+        if found is None:
+            # archived event: its track moved to the same partition
+            for arc in archive.connections(cur):
+                has_tracks = arc.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'flight_tracks';"
+                ).fetchone()
+                found = has_tracks and arc.execute(sql, (flight_id,)).fetchone()
+                if found:
+                    break
+
+    if not found:
+        return jsonify({"error": "no track for this flight"}), 404
+
+    return jsonify({
+        "flight_id": flight_id,
+        **tracks.to_columns(
+            found["started_at"], tracks.joined(found["data"], found["tail"]), max_points
+        ),
+    })
+
+
+@api_bp.route("/api/export")
+def export_flights():
+    """
+    Streams the whole log, or a filtered range, oldest first.
+    ?format=csv|ndjson (default csv), ?gzip=true, and the /api/flights
+    filters: classification, reg, callsign, site_id, since, until. Memory
+    stays at one chunk of rows however long the range is.
+    """
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in export.FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(export.FORMATS)}"}), 400
+    compress = request.args.get("gzip", "false").lower() == "true"
+
+    filters = {col: request.args.get(col) for col in export.FILTER_COLUMNS}
+    chunks = export.export_rows(filters, request.args.get("since"), request.args.get("until"))
+    body = export.encode(fmt, chunks)
+
+    mimetype, extension = export.FORMATS[fmt]
+    filename = f"flights-{datetime.now():%Y%m%d-%H%M%S}.{extension}"
+    if compress:
+        body = export.gzipped(body)
+        mimetype, filename = "application/gzip", filename + ".gz"
+
+    return Response(
+        body,
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Accel-Buffering": "no",
+        },
     )
 
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
 
-    return jsonify(rows)
+@api_bp.route("/api/stream")
+def stream():
+    """
+    Server-Sent Events: a "flight" event with the full row each time an event
+    is logged, refreshed or enriched. Reconnects resume from Last-Event-ID;
+    a "reset" event means the gap was too long and the client should refetch
+    /api/flights.
+    """
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    return Response(
+        broadcaster.stream(last_event_id),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # don't let nginx buffer the stream
+        },
+    )
+
 
 @api_bp.route("/api/flights/search-by-time")
 def search_by_time():
-    """Find flights nearest to a given datetime"""
+    """
+    Find flights nearest to a given datetime.
+    ?limit=10 (max 100) results, no further than ?window_hours=168 either side.
+    """
     datetime_str = request.args.get("datetime")
 
     if not datetime_str:
         return jsonify({"error": "datetime parameter required"}), 400
 
-    # Ensure datetime has seconds (datetime-local doesn't include them)
-    if len(datetime_str) == 16 and datetime_str[13] == ':':  # Format: YYYY-MM-DDTHH:MM
-        datetime_str += ":00"
+    try:
+        # datetime-local inputs come without seconds; fromisoformat accepts both
+        target = datetime.fromisoformat(datetime_str)
+        if target.tzinfo:
+            target = target.astimezone().replace(tzinfo=None)  # last_seen is local
+        limit = min(max(1, int(request.args.get("limit", 10))), 100)
+        window_hours = min(max(0, float(request.args.get("window_hours", 24 * 7))), 24 * 366)
+    except ValueError:
+        return jsonify({"error": "invalid datetime, limit or window_hours"}), 400
+
+    target_iso = target.isoformat(timespec="seconds")
+    window = timedelta(hours=window_hours)
+    earliest = (target - window).isoformat(timespec="seconds")
+    latest = (target + window).isoformat(timespec="seconds")
+
+    # Two seeks on idx_flights_last_seen walking away from the target in
+    # each direction; the nearest `limit` overall are among these rows.
+    seeks = (
+        (
+            """
+            SELECT *
+            FROM flights
+            WHERE last_seen <= ? AND last_seen >= ?
+            ORDER BY last_seen DESC
+            LIMIT ?;
+            """,
+            (target_iso, earliest, limit),
+        ),
+        (
+            """
+            SELECT *
+            FROM flights
+            WHERE last_seen > ? AND last_seen <= ?
+            ORDER BY last_seen ASC
+            LIMIT ?;
+            """,
+            (target_iso, latest, limit),
+        ),
+    )
+
+    with connection() as conn:
+        cur = conn.cursor()
 
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
+        rows = []
+        for sql, params in seeks:
+            cur.execute(sql, params)
+            rows += [dict(r) for r in cur.fetchall()]
 
-    # Find flights closest to the provided datetime
-    # Using ABS to get time difference and sort by it
-    cur.execute(
-        """
-        SELECT *,
-            ABS(julianday(last_seen) - julianday(?)) * 86400 as time_diff_seconds
-        FROM flights
-        ORDER BY time_diff_seconds ASC
-        LIMIT 50;
-        """,
-        (datetime_str,),
-    )
+            # the same seeks in any archive month the window reaches into
+            rows += archive.fetch(cur, sql, params, since=earliest, until=latest)
 
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+    rows = list({r["id"]: r for r in rows}.values())
 
-    # Filter to flights within 7 days (more lenient than 24h)
-    filtered = [r for r in rows if r.get('time_diff_seconds', float('inf')) <= 604800]
+    for r in rows:
+        r["time_diff_seconds"] = abs(
+            (datetime.fromisoformat(r["last_seen"]) - target).total_seconds()
+        )
+    rows.sort(key=lambda r: r["time_diff_seconds"])
 
-    return jsonify(filtered[:10])  # Return top 10 closest
+    return jsonify(rows[:limit])
 
-from .db import classify_flight  # add near your other imports
+
+from .db import intel_cache_stats, RULES_PENDING_SQL  # add near your other imports
 
 @api_bp.route("/api/admin/classification-stats", methods=["GET"])
 def classification_stats():
     """
     Diagnostic: shows current state of classifications in DB
     """
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-            COUNT(*) as total,
-            COUNT(CASE WHEN classification IS NULL THEN 1 END) as null_count,
-            COUNT(CASE WHEN TRIM(classification) = '' THEN 1 END) as empty_count,
-            COUNT(CASE WHEN classification = 'unknown' THEN 1 END) as unknown_count,
-            COUNT(CASE WHEN classification NOT IN ('commercial', 'private', 'government', 'cargo', 'unknown')
-                       AND classification IS NOT NULL
-                       AND TRIM(classification) != ''
-                  THEN 1 END) as invalid_count
-        FROM flights;
-    """)
-
-    stats = dict(cur.fetchone())
-    conn.close()
+    with connection() as conn:
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT
+                COUNT(*) as total,
+                COUNT(CASE WHEN classification IS NULL THEN 1 END) as null_count,
+                COUNT(CASE WHEN TRIM(classification) = '' THEN 1 END) as empty_count,
+                COUNT(CASE WHEN classification = 'unknown' THEN 1 END) as unknown_count,
+                COUNT(CASE WHEN classification NOT IN ('commercial', 'private', 'government', 'cargo', 'unknown')
+                           AND classification IS NOT NULL
+                           AND TRIM(classification) != ''
+                      THEN 1 END) as invalid_count
+            FROM flights;
+        """)
+
+        stats = dict(cur.fetchone())
+
+        # rows the background classifier has yet to visit under the current rules
+        cur.execute(f"SELECT COUNT(*) FROM flights WHERE {RULES_PENDING_SQL};")
+        stats["pending_count"] = cur.fetchone()[0]
 
     return jsonify(stats)
 
 
+@api_bp.route("/api/admin/cache-stats", methods=["GET"])
+def cache_stats():
+    """
+    Diagnostic: hit/miss counters for the in-memory aircraft and callsign
+    caches and the API response cache
+    """
+    stats = intel_cache_stats()
+    stats["responses"] = responses.stats()
+    return jsonify(stats)
+
+
+@api_bp.route("/api/admin/metrics", methods=["GET"])
+def metrics_exposition():
+    """Prometheus text exposition of app/metrics.py (scrape target)"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @api_bp.route("/api/admin/backfill-classification", methods=["POST"])
 def backfill_classification():
     """
-    Reclassifies ALL flights (or specific subset based on query params)
+    Starts a background job that reclassifies flights in id-ordered chunks.
     Query params:
       - force=true: Reclassify everything (default: only NULL/empty/unknown)
       - limit=N: Limit number of rows to update (default: all)
+    Returns 202 with the job; poll /api/admin/jobs/<id> for progress.
     """
     force = request.args.get("force", "false").lower() == "true"
     limit = request.args.get("limit", type=int)
+    if limit is not None and limit <= 0:
+        return jsonify({"error": "limit must be a positive integer"}), 400
 
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
+    running = jobs.active_job("backfill-classification")
+    if running:
+        return jsonify({"error": "backfill already running", "job": running.to_dict()}), 409
 
-    # Build query based on force flag
-    if force:
-        query = """
-            SELECT id, airline_name, owner, callsign, type_code, reg, hex, country, country_iso
-            FROM flights
-        """
-    else:
-        query = """
-            SELECT id, airline_name, owner, callsign, type_code, reg, hex, country, country_iso
-            FROM flights
-            WHERE classification IS NULL
-               OR TRIM(classification) = ''
-               OR classification = 'unknown';
-        """
+    job = jobs.start_backfill(force, limit)
+    return jsonify(job.to_dict()), 202, {"Location": f"/api/admin/jobs/{job.id}"}
 
-    if limit:
-        query += f" LIMIT {limit};"
-    else:
-        query += ";"
 
-    cur.execute(query)
-    rows = cur.fetchall()
+@api_bp.route("/api/admin/jobs", methods=["GET"])
+def list_jobs():
+    """Recent background jobs, newest first"""
+    return jsonify([job.to_dict() for job in jobs.list_jobs()])
 
-    updated = 0
-    changed = 0
 
-    for r in rows:
-        row_dict = dict(r)
-        old_class = row_dict.get("classification")
-        new_class = classify_flight(row_dict)
+@api_bp.route("/api/admin/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(job.to_dict())
 
-        cur.execute(
-            "UPDATE flights SET classification = ? WHERE id = ?;",
-            (new_class, r["id"]),
-        )
-        updated += 1
 
-        if old_class != new_class:
-            changed += 1
+@api_bp.route("/api/admin/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """Stops the job after the chunk in progress has been committed"""
+    job = jobs.cancel_job(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(job.to_dict()), 202 if job.active else 200
 
-    conn.commit()
-    conn.close()
 
-    return jsonify({
-        "updated": updated,
-        "changed": changed,
-        "forced": force
-    })
+def _stats_panel(name: str, **kwargs):
+    # every panel takes ?site_id= (default: all sites)
+    site = request.args.get("site_id")
+    with connection() as conn:
+        data = stats.PANELS[name](stats.StatsSnapshot(conn.cursor(), site=site, **kwargs))
+    return jsonify(data)
 
 
 @api_bp.route("/api/stats/summary")
+@cached_response
 def stats_summary():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-          COUNT(*) AS total_events,
-
-          COUNT(
-            DISTINCT COALESCE(NULLIF(reg, ''), hex)
-          ) AS unique_aircraft,
-
-          COUNT(
-            DISTINCT COALESCE(NULLIF(airline_name, ''), NULLIF(owner, ''))
-          ) AS operators,
-
-          COUNT(DISTINCT country_iso) AS countries,
-
-          CAST(AVG(
-            CASE
-              WHEN altitude_ft IS NOT NULL
-                   AND altitude_ft != 'ground'
-              THEN altitude_ft
-            END
-          ) AS INTEGER) AS avg_altitude
-        FROM flights;
-    """)
-
-    row = dict(cur.fetchone())
-    conn.close()
-    return jsonify(row)
+    return _stats_panel("summary")
 
 
 @api_bp.route("/api/stats/top-aircraft")
+@cached_response
 def stats_top_aircraft():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-          reg,
-          model,
-          type_code,
-          COALESCE(airline_name, owner) AS operator,
-          country_iso,
-          MAX(times_seen) AS times_seen,
-          classification,
-          manufacturer,
-          MAX(last_seen) AS last_seen
-        FROM flights
-        WHERE reg IS NOT NULL
-        GROUP BY reg
-        ORDER BY times_seen DESC
-        LIMIT 10;
-    """)
+    return _stats_panel("top-aircraft")
 
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return jsonify(rows)
 
 @api_bp.route("/api/stats/top-operators")
+@cached_response
 def stats_top_operators():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-          COALESCE(NULLIF(airline_name, ''), NULLIF(owner, '')) AS operator,
-
-          COUNT(*) AS total_events,
-
-          COUNT(
-            DISTINCT COALESCE(NULLIF(reg, ''), hex)
-          ) AS unique_aircraft,
-
-          (SELECT SUBSTR(f2.callsign, 1, 3)
-           FROM flights f2
-           WHERE COALESCE(NULLIF(f2.airline_name, ''), NULLIF(f2.owner, '')) =
-                 COALESCE(NULLIF(flights.airline_name, ''), NULLIF(flights.owner, ''))
-             AND f2.callsign IS NOT NULL
-             AND LENGTH(f2.callsign) >= 3
-             AND UNICODE(SUBSTR(f2.callsign, 1, 1)) BETWEEN 65 AND 90
-           GROUP BY SUBSTR(f2.callsign, 1, 3)
-           ORDER BY COUNT(*) DESC
-           LIMIT 1
-          ) AS icao_code
-
-        FROM flights
-        WHERE airline_name IS NOT NULL
-           OR owner IS NOT NULL
-
-        GROUP BY operator
-        ORDER BY total_events DESC
-        LIMIT 10;
-    """)
-
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return jsonify(rows)
+    return _stats_panel("top-operators")
 
 
 @api_bp.route("/api/stats/countries")
+@cached_response
 def stats_countries():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-          country_iso,
-          country,
-
-          COUNT(
-            DISTINCT COALESCE(NULLIF(reg, ''), hex)
-          ) AS aircraft_count,
-
-          COUNT(*) AS event_count
-
-        FROM flights
-        WHERE country_iso IS NOT NULL
-
-        GROUP BY country_iso
-        ORDER BY event_count DESC;
-    """)
-
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return jsonify(rows)
-
+    return _stats_panel("countries")
 
 
 @api_bp.route("/api/stats/routes")
+@cached_response
 def stats_routes():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-          f.origin_iata,
-          f.dest_iata,
-          COUNT(*) AS event_count,
-          o.city AS origin_city,
-          o.country AS origin_country,
-          d.city AS dest_city,
-          d.country AS dest_country,
-          o.latitude AS origin_lat,
-          o.longitude AS origin_lon,
-          d.latitude AS dest_lat,
-          d.longitude AS dest_lon
-        FROM flights f
-        LEFT JOIN airports o ON f.origin_iata = o.iata_code
-        LEFT JOIN airports d ON f.dest_iata = d.iata_code
-        WHERE f.origin_iata IS NOT NULL
-          AND f.dest_iata IS NOT NULL
-        GROUP BY f.origin_iata, f.dest_iata
-        HAVING event_count >= 2
-        ORDER BY event_count DESC
-        LIMIT 10;
-    """)
-
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return jsonify(rows)
+    return _stats_panel("routes")
+
 
 @api_bp.route("/api/stats/summary-24h")
+@cached_response
 def stats_summary_24h():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-          COUNT(*) AS events_24h,
-
-          COUNT(
-            DISTINCT COALESCE(NULLIF(reg, ''), hex)
-          ) AS aircraft_24h,
-
-          COUNT(
-            DISTINCT COALESCE(NULLIF(airline_name, ''), NULLIF(owner, ''))
-          ) AS operators_24h
-
-        FROM flights
-        WHERE last_seen >= datetime('now', '-24 hours');
-    """)
-
-    row = dict(cur.fetchone())
-    conn.close()
-    return jsonify(row)
+    return _stats_panel("summary-24h")
 
 
 @api_bp.route("/api/stats/classification")
+@cached_response
 def stats_classification():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-          COALESCE(classification, 'unknown') AS classification,
-          COUNT(*) AS count
-        FROM flights
-        GROUP BY classification;
-    """)
+    return _stats_panel("classification")
 
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return jsonify(rows)
 
 @api_bp.route("/api/stats/hourly")
+@cached_response
 def stats_hourly():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-      SELECT
-        strftime('%H', last_seen, 'localtime') AS hour,
-        COUNT(*) AS events
-      FROM flights
-      WHERE last_seen >= datetime('now', '-24 hours', 'localtime')
-      GROUP BY hour
-      ORDER BY hour;
-    """)
-
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return jsonify(rows)
+    return _stats_panel("hourly")
 
 
 @api_bp.route("/api/stats/altitude-distribution")
+@cached_response
 def stats_altitude_distribution():
     """Returns altitude bands: low (<10k), medium (10k-25k), high (>25k)"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-            CASE
-                WHEN altitude_ft = 'ground' OR altitude_ft IS NULL THEN 'ground'
-                WHEN CAST(altitude_ft AS INTEGER) < 10000 THEN 'low'
-                WHEN CAST(altitude_ft AS INTEGER) BETWEEN 10000 AND 25000 THEN 'medium'
-                ELSE 'high'
-            END as altitude_band,
-            COUNT(*) as count
-        FROM flights
-        GROUP BY altitude_band
-        ORDER BY
-            CASE altitude_band
-                WHEN 'ground' THEN 0
-                WHEN 'low' THEN 1
-                WHEN 'medium' THEN 2
-                WHEN 'high' THEN 3
-            END;
-    """)
-
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return jsonify(rows)
+    return _stats_panel("altitude-distribution")
 
 
 @api_bp.route("/api/stats/aircraft-types")
+@cached_response
 def stats_aircraft_types():
     """Returns breakdown of most common aircraft types"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-            type_code,
-            model,
-            MAX(manufacturer) AS manufacturer,
-            COUNT(*) AS event_count,
-            COUNT(DISTINCT COALESCE(NULLIF(reg, ''), hex)) AS unique_aircraft
-        FROM flights
-        WHERE type_code IS NOT NULL AND type_code != ''
-        GROUP BY type_code
-        ORDER BY event_count DESC
-        LIMIT 15;
-    """)
-
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return jsonify(rows)
+    return _stats_panel("aircraft-types")
 
 
 @api_bp.route("/api/stats/activity-by-day")
+@cached_response
 def stats_activity_by_day():
     """Returns activity levels by day of week"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-            CASE CAST(strftime('%w', last_seen) AS INTEGER)
-                WHEN 0 THEN 'Sun'
-                WHEN 1 THEN 'Mon'
-                WHEN 2 THEN 'Tue'
-                WHEN 3 THEN 'Wed'
-                WHEN 4 THEN 'Thu'
-                WHEN 5 THEN 'Fri'
-                WHEN 6 THEN 'Sat'
-            END as day_name,
-            CAST(strftime('%w', last_seen) AS INTEGER) as day_num,
-            COUNT(*) as events
-        FROM flights
-        WHERE last_seen >= datetime('now', '-7 days')
-        GROUP BY day_num
-        ORDER BY day_num;
-    """)
-
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return jsonify(rows)
+    return _stats_panel("activity-by-day")
 
 
 @api_bp.route("/api/stats/recent-notable")
+@cached_response
 def stats_recent_notable():
     """Returns recent government/military and unusual activity"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-            callsign,
-            reg,
-            classification,
-            COALESCE(airline_name, owner) as operator,
-            type_code,
-            model,
-            altitude_ft,
-            last_seen,
-            times_seen,
-            country_iso
-        FROM flights
-        WHERE classification IN ('government', 'cargo')
-           OR times_seen >= 5
-        ORDER BY last_seen DESC
-        LIMIT 20;
-    """)
-
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return jsonify(rows)
+    return _stats_panel("recent-notable")
 
 
 @api_bp.route("/api/stats/classification-detailed")
+@cached_response
 def stats_classification_detailed():
     """Returns classification breakdown with percentages and 24h comparisons"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-            COALESCE(classification, 'unknown') AS classification,
-            COUNT(*) AS total_count,
-            COUNT(DISTINCT COALESCE(NULLIF(reg, ''), hex)) AS unique_aircraft,
-            CAST(AVG(
-                CASE WHEN altitude_ft != 'ground' AND altitude_ft IS NOT NULL
-                     THEN CAST(altitude_ft AS INTEGER)
-                END
-            ) AS INTEGER) AS avg_altitude,
-            SUM(CASE WHEN last_seen >= datetime('now', '-24 hours') THEN 1 ELSE 0 END) AS count_24h
-        FROM flights
-        GROUP BY classification
-        ORDER BY total_count DESC;
-    """)
-
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return jsonify(rows)
+    return _stats_panel("classification-detailed")
 
 
 @api_bp.route("/api/stats/routes-map")
+@cached_response
 def stats_routes_map():
     """Returns top routes with coordinates for map visualization"""
     time_range = request.args.get("range", "all")  # "all" or "week"
-
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    # Build time filter
-    time_filter = ""
-    if time_range == "week":
-        time_filter = "WHERE last_seen >= datetime('now', '-7 days')"
-
-    # Optimized query with subquery for better performance
-    query = f"""
-        SELECT
-            f.origin_iata,
-            f.dest_iata,
-            f.flight_count,
-            o.latitude AS origin_lat,
-            o.longitude AS origin_lon,
-            o.city AS origin_city,
-            o.country AS origin_country,
-            d.latitude AS dest_lat,
-            d.longitude AS dest_lon,
-            d.city AS dest_city,
-            d.country AS dest_country,
-            f.classifications
-        FROM (
-            SELECT
-                origin_iata,
-                dest_iata,
-                COUNT(*) AS flight_count,
-                GROUP_CONCAT(DISTINCT classification) AS classifications
-            FROM flights
-            {time_filter}
-            {"AND" if time_filter else "WHERE"} origin_iata IS NOT NULL
-              AND dest_iata IS NOT NULL
-            GROUP BY origin_iata, dest_iata
-            HAVING flight_count >= 2
-            ORDER BY flight_count DESC
-            LIMIT 12
-        ) f
-        JOIN airports o ON f.origin_iata = o.iata_code
-        JOIN airports d ON f.dest_iata = d.iata_code;
-    """
-
-    cur.execute(query)
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-
-    return jsonify(rows)
-
-
-
+    return _stats_panel("routes-map", route_range=time_range)
 
 
+@api_bp.route("/api/stats/dashboard")
+@cached_response
+def stats_dashboard():
+    """
+    Several stats panels from one read snapshot.
+    ?panels=summary,hourly,...  (default: everything the Stats page shows)
+    ?hours=24  window for summary-24h, hourly and count_24h
+    ?days=7    window for activity-by-day
+    ?range=all|week  for routes-map
+    ?site_id=home    one observer site's panels (default: all sites)
+    """
+    names = [p.strip() for p in request.args.get("panels", "").split(",") if p.strip()]
+    names = names or list(stats.DASHBOARD_PANELS)
+    unknown = [n for n in names if n not in stats.PANELS]
+    if unknown:
+        return jsonify({"error": f"unknown panels: {', '.join(unknown)}"}), 400
+
+    try:
+        hours = int(request.args.get("hours", stats.DEFAULT_HOURS))
+        days = int(request.args.get("days", stats.DEFAULT_DAYS))
+    except ValueError:
+        return jsonify({"error": "hours and days must be integers"}), 400
+
+    with connection() as conn:
+        cur = conn.cursor()
+        # one WAL snapshot for every panel, so they agree with each other
+        cur.execute("BEGIN;")
+        snap = stats.StatsSnapshot(
+            cur,
+            hours=hours,
+            days=days,
+            route_range=request.args.get("range", "all"),
+            site=request.args.get("site_id"),
+        )
+        data = {name: stats.PANELS[name](snap) for name in names}
 
+    return jsonify(data)
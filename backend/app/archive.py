@@ -0,0 +1,367 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from .config import (
+    ARCHIVE_AFTER_DAYS,
+    ARCHIVE_DIR,
+    ARCHIVE_INTERVAL_SECONDS,
+    SQLITE_BUSY_TIMEOUT_MS,
+)
+from .db import ARCHIVED_AIRCRAFT_FIELDS, connection, record_archived_aircraft
+from .tracks import install_tracks
+
+
+# ------------------------------------------------------------
+# Tiered storage: monthly archive partitions
+# ------------------------------------------------------------
+#
+# Events whose last_seen is older than ARCHIVE_AFTER_DAYS are moved out of the
+# hot flights table into one SQLite file per calendar month of last_seen
+# (ARCHIVE_DIR/flights-YYYY-MM.db), with the same columns and ids. The
+# archive_partitions table in the hot DB records each file and the last_seen
+# range it holds, so a reader opens only the months its time range touches.
+#
+# Every archived row is older than every hot row, and months don't overlap,
+# so "hot, then partitions newest first" is already last_seen DESC order.
+#
+# The rollups are not decremented when rows leave flights (there are no
+# delete triggers): all-time panels keep counting archived events. Archived
+# rows are frozen — the classifier and the backfill only see the hot table.
+# archived_events keeps each moved event key's times_seen in the hot DB, so an
+# aircraft returning later continues its count instead of starting at 1, and
+# archived_aircraft keeps each aircraft's best archived event for the all-time
+# top aircraft.
+
+# The stats windows (up to 30 days) and routes-map?range=week are always
+# served from the hot table alone.
+MIN_ARCHIVE_AFTER_DAYS = 31
+
+CHUNK_SIZE = 5000
+
+# Indexes each partition carries for the reads below
+_PARTITION_INDEXES = (
+    "idx_flights_last_seen ON flights(last_seen)",
+    "idx_flights_reg ON flights(reg, last_seen)",
+    "idx_flights_callsign ON flights(callsign, last_seen)",
+    "idx_flights_classification ON flights(classification, last_seen)",
+    "idx_flights_times_seen ON flights(times_seen) WHERE reg IS NOT NULL",
+    "idx_flights_site ON flights(site_id, last_seen)",
+)
+
+
+def archive_after_days() -> int:
+    """Effective retention of the hot table; 0 when archiving is off."""
+    if ARCHIVE_AFTER_DAYS <= 0:
+        return 0
+    return max(ARCHIVE_AFTER_DAYS, MIN_ARCHIVE_AFTER_DAYS)
+
+
+def partition_path(month: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"flights-{month}.db")
+
+
+# ------------------------------------------------------------
+# Reads
+# ------------------------------------------------------------
+
+def partitions(cur, since: Optional[str] = None, until: Optional[str] = None) -> List[str]:
+    """
+    Paths of the partitions holding events with since <= last_seen <= until
+    (either bound open), newest month first. Costs one read of the small
+    archive_partitions table; an empty list means the hot table has it all.
+    """
+    where = []
+    params = []
+    if since:
+        where.append("newest >= ?")
+        params.append(since)
+    if until:
+        where.append("oldest <= ?")
+        params.append(until)
+
+    cur.execute(
+        f"""
+        SELECT month
+        FROM archive_partitions
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY month DESC;
+        """,
+        params,
+    )
+    paths = [partition_path(r[0]) for r in cur.fetchall()]
+    return [p for p in paths if os.path.exists(p)]
+
+
+def open_partition(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        f"file:{quote(os.path.abspath(path))}?mode=ro",
+        uri=True,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+    )
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def connections(
+    cur, since: Optional[str] = None, until: Optional[str] = None
+) -> Iterator[sqlite3.Connection]:
+    """
+    Read-only connections to the partitions overlapping [since, until],
+    newest first, each closed once the caller moves on to the next.
+    """
+    for path in partitions(cur, since, until):
+        with closing(open_partition(path)) as conn:
+            yield conn
+
+
+def fetch(
+    cur,
+    sql: str,
+    params: Iterable[Any] = (),
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Runs sql (written against `flights`) on every partition overlapping
+    [since, until], newest first, and returns the rows as dicts. With limit,
+    stops opening partitions once that many rows have been collected.
+    """
+    rows: List[Dict[str, Any]] = []
+    params = tuple(params)
+    for conn in connections(cur, since, until):
+        rows.extend(dict(r) for r in conn.execute(sql, params))
+        if limit is not None and len(rows) >= limit:
+            return rows[:limit]
+    return rows
+
+
+# ------------------------------------------------------------
+# Archiving
+# ------------------------------------------------------------
+
+def _months(first: str, cutoff: str) -> List[Tuple[str, str, str, bool]]:
+    """
+    (month, start, end, closed) for each calendar month from first up to
+    cutoff; the last one is cut short at cutoff and not closed yet.
+    """
+    out = []
+    year, month = int(first[:4]), int(first[5:7])
+    while True:
+        start = f"{year:04d}-{month:02d}-01T00:00:00"
+        if start >= cutoff:
+            return out
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        end = f"{year:04d}-{month:02d}-01T00:00:00"
+        out.append((start[:7], start, min(end, cutoff), end <= cutoff))
+
+
+def _ensure_partition_schema(cur) -> List[str]:
+    """Creates / widens arc.flights to the hot table's columns; returns them."""
+    cur.execute("PRAGMA main.table_info(flights);")
+    # a column added later keeps its default: rows archived before it read
+    # back as the hot table's pre-migration rows did
+    columns = [
+        (r[1], r[2] if r[4] is None else f"{r[2]} DEFAULT {r[4]}")
+        for r in cur.fetchall()
+    ]
+
+    cur.execute("PRAGMA arc.table_info(flights);")
+    existing = {r[1] for r in cur.fetchall()}
+
+    if not existing:
+        defs = ",\n".join(
+            f"{name} INTEGER PRIMARY KEY" if name == "id" else f"{name} {ctype}"
+            for name, ctype in columns
+        )
+        cur.execute(f"CREATE TABLE arc.flights (\n{defs}\n);")
+    else:
+        for name, ctype in columns:
+            if name not in existing:
+                cur.execute(f"ALTER TABLE arc.flights ADD COLUMN {name} {ctype};")
+
+    for index in _PARTITION_INDEXES:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS arc.{index};")
+
+    # position tracks travel with their events
+    install_tracks(cur, "arc")
+
+    return [name for name, _ in columns]
+
+
+def upgrade_partitions() -> int:
+    """
+    Widens partitions written before a flights column was added, so readers
+    can run the hot table's SQL on every month. Returns how many changed; a
+    partition that is already current costs one PRAGMA.
+    """
+    upgraded = 0
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("PRAGMA main.table_info(flights);")
+        hot = {r[1] for r in cur.fetchall()}
+
+        for path in partitions(cur):
+            with closing(open_partition(path)) as arc:
+                archived = {r[1] for r in arc.execute("PRAGMA table_info(flights);")}
+            if hot <= archived:
+                continue
+
+            cur.execute("ATTACH DATABASE ? AS arc;", (path,))
+            try:
+                _ensure_partition_schema(cur)
+                conn.commit()
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                cur.execute("DETACH DATABASE arc;")
+            upgraded += 1
+
+    if upgraded:
+        print(f"[ARCHIVE] Upgraded {upgraded} partition(s) to the current schema")
+    return upgraded
+
+
+def _archive_month(month: str, start: str, end: str, closed: bool) -> int:
+    """Moves events with start <= last_seen < end into month's partition."""
+    moved = 0
+    path = partition_path(month)
+
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("ATTACH DATABASE ? AS arc;", (path,))
+        try:
+            columns = ", ".join(_ensure_partition_schema(cur))
+            conn.commit()
+
+            chunk = f"""
+                SELECT id FROM main.flights
+                WHERE last_seen >= ? AND last_seen < ?
+                ORDER BY last_seen
+                LIMIT {int(CHUNK_SIZE)}
+            """
+            while True:
+                # Copy, delete and record in one transaction. Across an
+                # attached file it is not atomic under WAL; a crash between
+                # the two leaves rows in both, which INSERT OR IGNORE absorbs
+                # on the next run and readers de-duplicate by id.
+                cur.execute(
+                    f"""
+                    INSERT OR IGNORE INTO arc.flights ({columns})
+                    SELECT {columns} FROM main.flights WHERE id IN ({chunk});
+                    """,
+                    (start, end),
+                )
+                cur.execute(
+                    f"""
+                    INSERT OR IGNORE INTO arc.flight_tracks
+                    SELECT * FROM main.flight_tracks WHERE flight_id IN ({chunk});
+                    """,
+                    (start, end),
+                )
+                cur.execute(
+                    f"DELETE FROM main.flight_tracks WHERE flight_id IN ({chunk});",
+                    (start, end),
+                )
+                # an aircraft returning after this carries its count on
+                # (log_flights reads archived_events when the hot table misses)
+                cur.execute(
+                    f"""
+                    INSERT INTO main.archived_events (event_key, times_seen, last_seen)
+                    SELECT event_key, COALESCE(times_seen, 1), last_seen
+                    FROM main.flights
+                    WHERE id IN ({chunk}) AND event_key NOT LIKE '%|||'
+                    ORDER BY last_seen
+                    ON CONFLICT (event_key) DO UPDATE SET
+                        times_seen = excluded.times_seen,
+                        last_seen = excluded.last_seen
+                    WHERE excluded.last_seen >= archived_events.last_seen;
+                    """,
+                    (start, end),
+                )
+                cur.execute(
+                    f"""
+                    SELECT site_id, {ARCHIVED_AIRCRAFT_FIELDS}
+                    FROM main.flights
+                    WHERE id IN ({chunk}) AND reg IS NOT NULL;
+                    """,
+                    (start, end),
+                )
+                record_archived_aircraft(cur, cur.fetchall())
+                cur.execute(f"DELETE FROM main.flights WHERE id IN ({chunk});", (start, end))
+                deleted = cur.rowcount
+                if deleted <= 0:
+                    conn.rollback()
+                    break
+
+                cur.execute(
+                    """
+                    INSERT INTO archive_partitions (month, events, oldest, newest, archived_at)
+                    SELECT ?, COUNT(*), MIN(last_seen), MAX(last_seen), ?
+                    FROM arc.flights
+                    WHERE true
+                    ON CONFLICT(month) DO UPDATE SET
+                        events = excluded.events,
+                        oldest = excluded.oldest,
+                        newest = excluded.newest,
+                        archived_at = excluded.archived_at;
+                    """,
+                    (month, datetime.now().isoformat(timespec="seconds")),
+                )
+                conn.commit()
+                moved += deleted
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            cur.execute("DETACH DATABASE arc;")
+
+    if moved and closed:
+        # a closed month never changes again: compact its file once
+        with closing(sqlite3.connect(path)) as arc:
+            arc.execute("VACUUM;")
+
+    return moved
+
+
+def archive_old_events(now: Optional[datetime] = None) -> int:
+    """Moves every event older than the retention into its partition."""
+    days = archive_after_days()
+    if not days:
+        return 0
+
+    cutoff = ((now or datetime.now()) - timedelta(days=days)).isoformat(timespec="seconds")
+
+    with connection() as conn:
+        first = conn.execute("SELECT MIN(last_seen) FROM flights;").fetchone()[0]
+    if not first or first >= cutoff:
+        return 0
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+
+    moved = 0
+    for month, start, end, closed in _months(first, cutoff):
+        count = _archive_month(month, start, end, closed)
+        if count:
+            print(f"[ARCHIVE] Moved {count} events to {partition_path(month)}")
+        moved += count
+    return moved
+
+
+def archive_loop():
+    if not archive_after_days():
+        return
+
+    print(f"[ARCHIVE] Archiving events older than {archive_after_days()} days")
+
+    while True:
+        try:
+            archive_old_events()
+        except Exception as e:
+            print("[ARCHIVE] Error:", e)
+
+        time.sleep(ARCHIVE_INTERVAL_SECONDS)
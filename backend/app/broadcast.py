@@ -0,0 +1,139 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Iterator, List, Optional, Tuple
+
+from .config import SSE_CLIENT_BUFFER, SSE_HEARTBEAT_SECONDS, SSE_REPLAY_SIZE
+
+
+# ------------------------------------------------------------
+# Live event fan-out (/api/stream)
+# ------------------------------------------------------------
+#
+# The write path publishes each new or changed event once. It is serialized
+# to an SSE frame a single time and appended to every subscriber's buffer,
+# so publishing never waits on a client. A subscriber whose bounded buffer
+# overflows is cut off instead; its EventSource reconnects with Last-Event-ID
+# and catches up from the replay ring.
+#
+# Event ids are "<boot>:<seq>". An id from a previous process, or one older
+# than the ring, can't be replayed — that client gets a "reset" event and
+# refetches /api/flights. With nobody subscribed the write path skips
+# publishing altogether (skip_if_idle()): the ring is emptied, so a client resuming
+# from before the gap gets that reset rather than a silent hole.
+
+Frame = Tuple[int, bytes]
+
+
+class Subscriber:
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self.frames: Deque[Frame] = deque()
+        self.overflowed = False
+        self.wake = threading.Condition()
+
+    def push(self, frame: Frame) -> None:
+        with self.wake:
+            if len(self.frames) >= self.maxlen:
+                self.overflowed = True
+            else:
+                self.frames.append(frame)
+            self.wake.notify()
+
+
+class Broadcaster:
+    def __init__(self, replay_size: int, client_buffer: int):
+        self.boot = uuid.uuid4().hex[:8]
+        self.client_buffer = max(1, client_buffer)
+        self._seq = 0
+        self._ring: Deque[Frame] = deque(maxlen=max(1, replay_size))
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+
+    def publish(self, event: str, payload: Any) -> None:
+        data = json.dumps(payload, separators=(",", ":"), default=str)
+        with self._lock:
+            self._seq += 1
+            frame = (
+                self._seq,
+                f"id: {self.boot}:{self._seq}\nevent: {event}\ndata: {data}\n\n".encode("utf-8"),
+            )
+            self._ring.append(frame)
+            subscribers = list(self._subscribers)
+
+        for sub in subscribers:
+            sub.push(frame)
+
+    def skip_if_idle(self) -> bool:
+        """
+        With no subscriber, stands in for a batch of publishes and returns
+        True; the caller then needn't build them. Checked under the lock, so
+        a client subscribing concurrently is either published to or reset.
+        """
+        with self._lock:
+            if self._subscribers:
+                return False
+            self._seq += 1
+            self._ring.clear()
+            return True
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Tuple[Subscriber, bool]:
+        """
+        Registers a client. Frames after last_event_id are queued straight
+        away; the flag is False when they could not be replayed.
+        """
+        sub = Subscriber(self.client_buffer)
+        with self._lock:
+            resumed = True
+            if last_event_id:
+                boot, _, seq = last_event_id.partition(":")
+                oldest = self._ring[0][0] if self._ring else self._seq + 1
+                if boot != self.boot or not seq.isdigit() or int(seq) < oldest - 1:
+                    resumed = False
+                else:
+                    missed = [f for f in self._ring if f[0] > int(seq)]
+                    sub.frames.extend(missed[-sub.maxlen:])
+                    resumed = len(missed) <= sub.maxlen
+            self._subscribers.append(sub)
+        return sub, resumed
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def stream(self, last_event_id: Optional[str] = None) -> Iterator[bytes]:
+        """SSE byte stream for one client; ends if the client falls behind."""
+        sub, resumed = self.subscribe(last_event_id)
+        try:
+            yield b"retry: 3000\n\n"
+            if not resumed:
+                yield f"id: {self.boot}:{self._seq}\nevent: reset\ndata: {{}}\n\n".encode("utf-8")
+
+            while True:
+                with sub.wake:
+                    if not sub.frames and not sub.overflowed:
+                        sub.wake.wait(SSE_HEARTBEAT_SECONDS)
+                    frames = list(sub.frames)
+                    sub.frames.clear()
+                    overflowed = sub.overflowed
+
+                if frames:
+                    yield b"".join(frame for _, frame in frames)
+                elif not overflowed:
+                    # comment line: keeps proxies from timing the stream out
+                    yield f": {int(time.time())}\n\n".encode("utf-8")
+
+                if overflowed:
+                    return  # the client reconnects and resumes from the ring
+        finally:
+            self.unsubscribe(sub)
+
+
+broadcaster = Broadcaster(SSE_REPLAY_SIZE, SSE_CLIENT_BUFFER)
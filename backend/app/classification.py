@@ -0,0 +1,173 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List
+
+
+# ------------------------------------------------------------
+# Classification rules
+# ------------------------------------------------------------
+#
+# Returns one of: commercial | private | government | cargo | unknown, using
+# only fields we already store (airline_name, owner, callsign, type_code).
+#
+# The term lists are compiled once into one regex alternation per rule and
+# the type codes into frozensets. The rules only need airline, owner and
+# type_code plus whether the callsign has a military prefix, so results are
+# memoized on that normalized tuple: a busy log repeats the same few thousand
+# combinations.
+
+
+def _any_of(terms: Iterable[str]) -> "re.Pattern[str]":
+    return re.compile("|".join(re.escape(t) for t in terms))
+
+
+# ---- GOVERNMENT / MILITARY (highest priority - most specific) ----
+
+GOV_OWNER = _any_of((
+    "air force", "usaf", "navy", "army", "marines", "government",
+    "homeland", "state dept", "department of", "police", "sheriff",
+    "coast guard", "national guard", "royal air force", "raf",
+    "us marshal", "dhs", "customs", "border patrol", "fbi",
+    "military", "defense", "armed forces", "ministry of defence",
+))
+
+# Military callsign prefixes (US and international)
+GOV_CALLSIGN_PREFIXES = (
+    "RCH", "SAM", "MC", "AF", "NAVY", "ARMY", "AE", "EVAC",
+    "BOXER", "REACH", "SPAR", "VENUS", "EXEC", "PAT",
+    "CNV", "SHAMU", "CONVOY", "TEAL",
+)
+
+# ---- COMMERCIAL AIRLINES (high confidence) ----
+
+# cargo masquerading as commercial
+CARGO_AIRLINE = _any_of((
+    "fedex", "ups", "united parcel", "dhl", "amazon air", "amazon prime",
+    "atlas air", "kalitta", "polar air", "southern air", "cargo", "freight",
+    "air cargo", "express freight",
+))
+
+COMMERCIAL_OWNER = _any_of(("airlines", "airways", "air lines", "airline"))
+COMMERCIAL_OWNER_EXCLUDE = _any_of(("cargo", "freight", "charter"))
+
+# ---- CARGO OPERATIONS ----
+
+CARGO_OWNER = _any_of(("cargo", "freight", "logistics", "express"))
+
+CARGO_TYPE_CODES = frozenset({
+    "B763", "B762", "B752", "B744", "B748", "MD11",  # Common cargo conversions
+    "A306", "A30B", "DC10", "DC86", "DC87",
+})
+
+# ---- PRIVATE / BUSINESS JETS ----
+
+# Charter operators (technically commercial but often categorized as private)
+CHARTER_OWNER = _any_of((
+    "flexjet", "netjets", "wheels up", "xojet", "sentient",
+    "vistajet", "luxaviation", "privé", "air charter",
+    "charter", "executive", "flight options", "bombardier fractional",
+))
+
+# Personal ownership patterns: the term ends the owner name or is followed
+# by a space
+PRIVATE_OWNER = re.compile(
+    "(?:"
+    + "|".join(re.escape(t) for t in (
+        " llc", " inc", " trust", " corp", "holdings",
+        "management", "investments", "aviation llc",
+    ))
+    + r")(?: |\Z)"
+)
+
+# Business jet type codes (comprehensive list)
+PRIVATE_TYPE_CODES = frozenset({
+    # Embraer Phenom/Praetor/Legacy
+    "E50P", "E55P", "E545", "E550", "E35L", "E35X", "E135", "E145",
+    # Cessna Citation family
+    "C25A", "C25B", "C25C", "C500", "C501", "C510", "C525", "C550",
+    "C551", "C560", "C56X", "C650", "C680", "C700", "C750",
+    # Gulfstream
+    "GLF2", "GLF3", "GLF4", "GLF5", "GLF6", "G150", "G200", "G280",
+    "GLEX", "G650",
+    # Bombardier/Canadair
+    "CL30", "CL35", "CL60", "CL64", "CL65", "GALX", "GL5T", "GL7T",
+    # Dassault Falcon
+    "F900", "FA10", "FA20", "FA50", "FA7X", "FA8X", "FA2T", "FA5X",
+    # Learjet
+    "LJ23", "LJ24", "LJ25", "LJ31", "LJ35", "LJ40", "LJ45", "LJ55",
+    "LJ60", "LJ70", "LJ75", "LJ85",
+    # Hawker/Beechjet
+    "H25A", "H25B", "H25C", "BE40", "BE20", "BE30", "BE9L", "BE9T",
+    # Pilatus
+    "PC12", "PC24",
+    # Other common business jets
+    "HDJT", "HA4T", "ASTR", "C68A", "PRM1", "EA50",
+    # Small single/twin props (likely private/training)
+    "C172", "C182", "C206", "PA28", "PA32", "PA46", "SR20", "SR22",
+    "BE36", "BE58", "C310", "C340", "C414", "C421",
+})
+
+CLASSIFY_CACHE_SIZE = 65536
+
+# Stamped on every row the background classifier resolves. Bump it whenever a
+# rule above changes: rows stamped with an older version are re-queued.
+RULES_VERSION = 1
+
+
+@lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
+def classify_key(airline: str, owner: str, gov_callsign: bool, type_code: str) -> str:
+    """
+    Rules applied to already-normalized fields: airline / owner lowercased,
+    type_code uppercased, all stripped.
+    """
+    if GOV_OWNER.search(owner):
+        return "government"
+    if gov_callsign:
+        return "government"
+
+    # Airline name from callsign lookup is strongest signal
+    if airline:
+        if CARGO_AIRLINE.search(airline):
+            return "cargo"
+        return "commercial"
+
+    if COMMERCIAL_OWNER.search(owner) and not COMMERCIAL_OWNER_EXCLUDE.search(owner):
+        return "commercial"
+
+    if CARGO_OWNER.search(owner):
+        return "cargo"
+    if type_code in CARGO_TYPE_CODES:
+        return "cargo"
+
+    if CHARTER_OWNER.search(owner):
+        return "private"
+    # Only private if the owner looks personal AND there is a type code
+    if type_code and PRIVATE_OWNER.search(owner):
+        return "private"
+    if type_code in PRIVATE_TYPE_CODES:
+        return "private"
+
+    return "unknown"
+
+
+def _key(row: Dict[str, Any]):
+    return (
+        (row.get("airline_name") or "").strip().lower(),
+        (row.get("owner") or "").strip().lower(),
+        (row.get("callsign") or "").strip().upper().startswith(GOV_CALLSIGN_PREFIXES),
+        (row.get("type_code") or "").strip().upper(),
+    )
+
+
+def classify_flight(row: Dict[str, Any]) -> str:
+    """
+    Returns one of: commercial | private | government | cargo | unknown
+    Uses only fields we already store: airline_name, owner, callsign, type_code.
+    """
+    return classify_key(*_key(row))
+
+
+def classify_many(rows: Iterable[Dict[str, Any]]) -> List[str]:
+    """classify_flight for a batch, in order."""
+    key, classify = _key, classify_key
+    return [classify(*key(row)) for row in rows]
@@ -1,54 +1,101 @@
 import time
-import sqlite3
-from .config import DB_PATH
-from .db import classify_flight
+from .db import (
+    RULES_PENDING_SQL,
+    RULES_VERSION,
+    classify_many,
+    connection,
+    publish_events,
+)
+from .metrics import CLASSIFIER_ROWS, CLASSIFIER_SECONDS
 
 INTERVAL_SECONDS = 30
 
+# Batch size grows while the queue keeps filling batches (a rules bump or a
+# freshly migrated log) and falls back once it drains.
+MIN_BATCH = 250
+MAX_BATCH = 2000
+
+# Keyset position in the pending queue. Rows re-queued behind it (an input
+# changed) are picked up after the scan wraps back to 0.
+_watermark = 0
+_batch = MIN_BATCH
+
 
 def classification_loop():
     print("[CLASSIFIER] Classification worker started")
 
     while True:
         try:
-            run_classification_pass()
+            # A full batch means more is queued: keep going without sleeping
+            while run_classification_pass():
+                pass
         except Exception as e:
             print("[CLASSIFIER] Error:", e)
 
         time.sleep(INTERVAL_SECONDS)
 
 
-def run_classification_pass():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    # Only rows that need classification
-    cur.execute("""
-        SELECT id, airline_name, owner, callsign, type_code
-        FROM flights
-        WHERE classification IS NULL
-           OR TRIM(classification) = ''
-           OR classification = 'unknown'
-        LIMIT 250;
-    """)
-
-    rows = cur.fetchall()
-    updated = 0
-
-    for r in rows:
-        row_dict = dict(r)
-        cls = classify_flight(row_dict)
-
-        if cls and cls != "unknown":
-            cur.execute(
-                "UPDATE flights SET classification = ? WHERE id = ?;",
-                (cls, r["id"]),
+def run_classification_pass() -> bool:
+    """
+    Resolves the next batch of pending rows after the watermark and stamps
+    them with RULES_VERSION, whatever they resolve to, so rows that stay
+    unknown are not re-read. Returns True when the batch was full.
+    """
+    global _watermark, _batch
+
+    started = time.perf_counter()
+    with connection() as conn:
+        cur = conn.cursor()
+
+        # Served by idx_flights_rules_pending: an empty queue is one probe
+        cur.execute(
+            f"""
+            SELECT id, airline_name, owner, callsign, type_code, classification
+            FROM flights
+            WHERE {RULES_PENDING_SQL}
+              AND id > ?
+            ORDER BY id
+            LIMIT ?;
+            """,
+            (_watermark, _batch),
+        )
+        rows = [dict(r) for r in cur.fetchall()]
+
+        changed = []
+        updates = []
+        for r, cls in zip(rows, classify_many(rows)):
+            # "unknown" never overwrites an existing answer
+            if cls != "unknown" and cls != r["classification"]:
+                changed.append(r["id"])
+            updates.append((cls, RULES_VERSION, r["id"]))
+
+        if updates:
+            cur.executemany(
+                """
+                UPDATE flights
+                SET
+                    classification = COALESCE(NULLIF(?, 'unknown'), classification),
+                    classification_rule_version = ?
+                WHERE id = ?;
+                """,
+                updates,
             )
-            updated += 1
+            conn.commit()
+            publish_events(cur, changed)
+
+    full = len(rows) == _batch
+    if full:
+        _watermark = rows[-1]["id"]
+        _batch = min(_batch * 2, MAX_BATCH)
+    else:
+        _watermark = 0
+        _batch = max(_batch // 2, MIN_BATCH)
+
+    CLASSIFIER_SECONDS.observe(time.perf_counter() - started)
+    CLASSIFIER_ROWS.labels("read").inc(len(rows))
+    CLASSIFIER_ROWS.labels("changed").inc(len(changed))
 
-    conn.commit()
-    conn.close()
+    if changed:
+        print(f"[CLASSIFIER] Updated {len(changed)} of {len(rows)} rows")
 
-    if updated:
-        print(f"[CLASSIFIER] Updated {updated} rows")
+    return full
@@ -1,4 +1,8 @@
 import os
+import re
+from typing import List, NamedTuple
+from urllib.parse import urlsplit
+
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,6 +12,152 @@ ME_LON = float(os.getenv("ME_LON", "-83.0315"))
 RADIUS_NM = float(os.getenv("RADIUS_NM", "50"))
 
 POLL_SECONDS = int(os.getenv("POLL_SECONDS", "12"))
+
+# Where a site's aircraft come from (app/sources.py): "adsb.lol" (the public
+# API), "sbs://host[:port]" (a receiver's SBS-1 / BaseStation feed, port
+# 30003 by default) or a readsb / dump1090 aircraft.json path or http(s) URL.
+# INGEST_SOURCE_<SITE ID> overrides it for one site.
+INGEST_SOURCE = os.getenv("INGEST_SOURCE", "adsb.lol").strip()
+# Local receivers are read every RECEIVER_POLL_SECONDS instead of POLL_SECONDS:
+# they cost no upstream request, and their data is fresher than a 12 s poll.
+# Each poll is a write transaction, though: it ends the response cache's
+# generation and fires the rollup triggers, so going much lower trades cache
+# hits and write load for freshness.
+RECEIVER_POLL_SECONDS = float(os.getenv("RECEIVER_POLL_SECONDS", "5"))
+# local receivers: an aircraft not heard from for this long has left
+RECEIVER_STALE_SECONDS = float(os.getenv("RECEIVER_STALE_SECONDS", "60"))
+
+
+class Site(NamedTuple):
+    id: str
+    lat: float
+    lon: float
+    radius_nm: float
+    poll_seconds: float
+
+
+# reserved site id under which the rollups keep the all-sites totals
+ALL_SITES = "*"
+
+
+def _check_source(name: str, spec: str) -> str:
+    """Rejects a source spec app/sources.py could not open, at startup."""
+    if spec.startswith("sbs://"):
+        try:
+            parts = urlsplit(spec)
+            parts.port  # raises on a malformed port
+        except ValueError:
+            parts = None
+        if not parts or not parts.hostname:
+            raise ValueError(f"{name}: expected sbs://host[:port], got {spec!r}")
+    elif not spec or ("://" in spec and not spec.startswith(("http://", "https://"))):
+        raise ValueError(
+            f"{name}: expected adsb.lol, sbs://host[:port] or an aircraft.json "
+            f"path or http(s) URL, got {spec!r}"
+        )
+    return spec
+
+
+def _site_source(site_id: str) -> str:
+    name = f"INGEST_SOURCE_{site_id.upper().replace('-', '_')}"
+    if name not in os.environ:
+        name = "INGEST_SOURCE"
+    return _check_source(name, os.getenv(name, INGEST_SOURCE).strip())
+
+
+def _default_poll(site_id: str) -> float:
+    if _site_source(site_id) == "adsb.lol":
+        return POLL_SECONDS
+    return RECEIVER_POLL_SECONDS
+
+
+def _parse_sites(spec: str) -> List[Site]:
+    """
+    "id:lat:lon[:radius_nm[:poll_seconds]]" entries separated by ";";
+    radius defaults to RADIUS_NM, cadence to POLL_SECONDS (adsb.lol) or
+    RECEIVER_POLL_SECONDS (a local receiver).
+    """
+    sites = []
+    for entry in filter(None, (e.strip() for e in spec.split(";"))):
+        parts = [p.strip() for p in entry.split(":")]
+        if not 3 <= len(parts) <= 5 or not re.fullmatch(r"[A-Za-z0-9_-]+", parts[0]):
+            raise ValueError(f"SITES: bad entry {entry!r} (id:lat:lon[:radius_nm[:poll_seconds]])")
+        sites.append(Site(
+            parts[0],
+            float(parts[1]),
+            float(parts[2]),
+            float(parts[3]) if len(parts) > 3 else RADIUS_NM,
+            float(parts[4]) if len(parts) > 4 else _default_poll(parts[0]),
+        ))
+    if len({s.id for s in sites}) != len(sites):
+        raise ValueError("SITES: site ids must be unique")
+    return sites
+
+
+# Observer sites polled concurrently, each at its own cadence. Unset means a
+# single site "default" at ME_LAT / ME_LON. The first site owns the events
+# logged before sites existed.
+SITES = _parse_sites(os.getenv("SITES", "")) or [
+    Site("default", ME_LAT, ME_LON, RADIUS_NM, _default_poll("default"))
+]
+PRIMARY_SITE = SITES[0].id
+SITE_SOURCES = {site.id: _site_source(site.id) for site in SITES}
+
+# "radius" logs every aircraft inside RADIUS_NM per poll; "closest" keeps the
+# original single-aircraft behaviour.
+INGEST_MODE = os.getenv("INGEST_MODE", "radius").strip().lower()
+ENRICH_WORKERS = int(os.getenv("ENRICH_WORKERS", "8"))
+ENRICH_QUEUE_SIZE = int(os.getenv("ENRICH_QUEUE_SIZE", "512"))
+
+# In-memory intel caches in front of aircraft_cache / callsign_cache
+INTEL_CACHE_SIZE = int(os.getenv("INTEL_CACHE_SIZE", "4096"))
+INTEL_CACHE_TTL_SECONDS = int(os.getenv("INTEL_CACHE_TTL_SECONDS", "21600"))
+INTEL_NEGATIVE_TTL_SECONDS = int(os.getenv("INTEL_NEGATIVE_TTL_SECONDS", "900"))
 EVENT_WINDOW_MINUTES = int(os.getenv("EVENT_WINDOW_MINUTES", "20"))
 
 DB_PATH = os.getenv("DB_PATH", os.path.join(os.path.dirname(__file__), "..", "data", "flight_log.db"))
+
+# SQLite connection pool / pragmas
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# API response cache (app/response_cache.py)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+# upper bound for windowed panels ("last 24h") that age without any writes
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))
+
+# Live stream (app/broadcast.py)
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_CLIENT_BUFFER = int(os.getenv("SSE_CLIENT_BUFFER", "256"))
+SSE_REPLAY_SIZE = int(os.getenv("SSE_REPLAY_SIZE", "2048"))
+
+# Background reclassification job (app/jobs.py); 0 workers = classify in the
+# job thread, N > 0 spreads each chunk over N spawned processes
+BACKFILL_CHUNK_SIZE = int(os.getenv("BACKFILL_CHUNK_SIZE", "2000"))
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "0"))
+
+# Tiered storage (app/archive.py): events older than ARCHIVE_AFTER_DAYS move to
+# monthly SQLite files in ARCHIVE_DIR. 0 keeps everything in the hot table.
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "0"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(os.path.dirname(DB_PATH), "archive"))
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+# Position tracks (app/tracks.py): keep at most one sample per this many
+# seconds of an event; 0 keeps every poll
+TRACK_MIN_INTERVAL_SECONDS = int(os.getenv("TRACK_MIN_INTERVAL_SECONDS", "5"))
+
+# Upstream APIs; point these at benchmarks/stub_server.py to run offline
+ADSB_LOL_BASE_URL = os.getenv("ADSB_LOL_BASE_URL", "https://api.adsb.lol/v2").rstrip("/")
+ADSBDB_BASE_URL = os.getenv("ADSBDB_BASE_URL", "https://api.adsbdb.com/v0").rstrip("/")
+
+# Outbound HTTP (app/httpclient.py)
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "4"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF_SECONDS = float(os.getenv("HTTP_BACKOFF_SECONDS", "0.5"))
+# Keep adsbdb responses on disk and revalidate them (ETag / Last-Modified)
+HTTP_CACHE_ENRICH = os.getenv("HTTP_CACHE_ENRICH", "false").lower() == "true"
+HTTP_CACHE_DIR = os.getenv(
+    "HTTP_CACHE_DIR", os.path.join(os.path.dirname(DB_PATH), "http_cache")
+)
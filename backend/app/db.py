@@ -1,19 +1,187 @@
 import os
+import queue
 import sqlite3
-from datetime import datetime
-from typing import Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from .config import (
+    DB_PATH,
+    EVENT_WINDOW_MINUTES,
+    DB_POOL_SIZE,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_MMAP_SIZE,
+    INTEL_CACHE_SIZE,
+    INTEL_CACHE_TTL_SECONDS,
+    INTEL_NEGATIVE_TTL_SECONDS,
+    ALL_SITES,
+    PRIMARY_SITE,
+)
+from .cache import TTLCache
+from .classification import RULES_VERSION, classify_flight, classify_many  # re-exported
+from .broadcast import broadcaster
+from .rollups import (
+    DIMENSIONS,
+    install_presite_rollups,
+    install_rollups,
+    install_operator_codes,
+    rebuild_operator_codes,
+)
+from .enrich import aircraft_fields, route_fields
+from .tracks import append_sample, install_tracks, publish_tails
+from .metrics import POOL_TIMEOUTS, WRITE_ROWS, WRITE_SECONDS, cache_collectors
 
-from .config import DB_PATH, EVENT_WINDOW_MINUTES
+
+# ============================================================
+# Connection pool
+# ============================================================
+
+class PoolTimeout(Exception):
+    """Every pooled connection stayed busy for the whole wait."""
+
+
+class ConnectionPool:
+    """
+    A small pool of SQLite connections shared by the API, the ingest path and
+    the classifier. Every connection runs in WAL mode, so dashboard readers and
+    the ingestion writer no longer block each other.
+
+    A borrower waits at most `timeout` seconds for a connection, so a slow
+    export or a leaked connection fails requests (503) instead of hanging them.
+    """
+
+    def __init__(self, path: str, size: int, timeout: float):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def open(self) -> sqlite3.Connection:
+        """A new connection with the pool's settings, outside the pool."""
+        conn = sqlite3.connect(
+            self.path,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,  # handed between threads by the pool
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")
+        conn.execute(f"PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT_MS)};")
+        conn.execute(f"PRAGMA cache_size = -{int(SQLITE_CACHE_SIZE_KB)};")
+        conn.execute(f"PRAGMA mmap_size = {int(SQLITE_MMAP_SIZE)};")
+        conn.execute("PRAGMA temp_store = MEMORY;")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return self.open()
+                except Exception:
+                    self._opened -= 1
+                    raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            POOL_TIMEOUTS.inc()
+            raise PoolTimeout(
+                f"no database connection free after {self.timeout:g}s "
+                f"(all {self.size} in use; DB_POOL_SIZE)"
+            ) from None
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._opened -= 1
+            conn.close()
+
+
+# waits as long for a free connection as a connection waits on a lock
+_pool = ConnectionPool(DB_PATH, DB_POOL_SIZE, SQLITE_BUSY_TIMEOUT_MS / 1000)
 
 
 # ============================================================
-# Connection helper
+# Write generation
 # ============================================================
+#
+# A process-wide counter bumped after any pooled connection writes. Readers
+# that cache derived results (the API response cache) key them on it: while
+# the generation is unchanged, nothing they read can have changed either.
+
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def write_generation() -> int:
+    return _generation
+
 
-def _connect():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+def bump_write_generation() -> int:
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        return _generation
+
+
+@contextmanager
+def connection():
+    """
+    Borrow a pooled connection. Commits on a clean exit, rolls back if the
+    block raises, and always returns the connection to the pool. Bumps the
+    write generation if the block changed any rows.
+    """
+    conn = _pool.acquire()
+    changes = conn.total_changes
+    try:
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    finally:
+        wrote = conn.total_changes != changes
+        _pool.release(conn)  # rolls back whatever the block left open
+        if wrote:
+            # after the commit, so a reader that sees the new generation
+            # also sees the new rows
+            bump_write_generation()
+
+
+@contextmanager
+def read_snapshot():
+    """
+    A dedicated connection inside one read transaction: every query sees the
+    database as of the first read (WAL keeps that snapshot), however long the
+    caller takes between them. Not pooled, so a slow consumer never holds a
+    connection the API needs.
+    """
+    conn = _pool.open()
+    try:
+        conn.execute("BEGIN;")
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
 
 
 # ============================================================
@@ -26,415 +194,734 @@ def init_db() -> None:
     if db_dir:
         os.makedirs(db_dir, exist_ok=True)
 
-    conn = _connect()
-    cur = conn.cursor()
+    with connection() as conn:
+        cur = conn.cursor()
+
+        # ---- main flight events table ----
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS flights (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                seen_at TEXT,
+                hex TEXT,
+                reg TEXT,
+                callsign TEXT,
+                type_code TEXT,
+                model TEXT,
+                manufacturer TEXT,
+                country TEXT,
+                country_iso TEXT,
+                owner TEXT,
+                airline_name TEXT,
+                origin_iata TEXT,
+                origin_name TEXT,
+                dest_iata TEXT,
+                dest_name TEXT,
+                altitude_ft REAL,
+                ground_speed_kt REAL,
+                distance_nm REAL,
+                heading_deg REAL,
+                event_key TEXT,
+                first_seen TEXT,
+                last_seen TEXT,
+                times_seen INTEGER DEFAULT 1
+            );
+            """
+        )
+
+        # ---- aircraft intelligence cache ----
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS aircraft_cache (
+                reg TEXT PRIMARY KEY,
+                type_code TEXT,
+                model TEXT,
+                manufacturer TEXT,
+                owner TEXT,
+                country TEXT,
+                country_iso TEXT,
+                updated_at TEXT
+            );
+            """
+        )
+
+        # ---- callsign / route cache ----
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS callsign_cache (
+                callsign TEXT PRIMARY KEY,
+                airline_name TEXT,
+                origin_iata TEXT,
+                origin_name TEXT,
+                dest_iata TEXT,
+                dest_name TEXT,
+                updated_at TEXT
+            );
+            """
+        )
 
-    # ---- main flight events table ----
+        # ---- airports reference table ----
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS airports (
+                iata_code TEXT PRIMARY KEY,
+                name TEXT,
+                city TEXT,
+                country TEXT,
+                latitude REAL,
+                longitude REAL
+            );
+            """
+        )
+
+        conn.commit()
+
+        # ---- versioned migrations (safe on existing DBs) ----
+        _run_migrations(conn)
+        _ensure_rules_index(cur)
+        conn.commit()
+
+        # ---- rebuild the in-memory dedup index from recent events ----
+        _active_events.load(cur, datetime.now())
+
+    # ---- archive partitions written under an older schema ----
+    from .archive import upgrade_partitions  # archive.py imports this module
+    upgrade_partitions()
+
+
+
+# ============================================================
+# Schema migrations
+# ============================================================
+
+# Rows the background classifier still has to resolve. Queries must use this
+# exact expression for SQLite to pick the matching partial index.
+UNCLASSIFIED_SQL = (
+    "(classification IS NULL OR classification = '' OR classification = 'unknown')"
+)
+
+
+# Rows the background classifier has not resolved under the current rules:
+# new rows, rows whose classifier inputs changed, and rows stamped by an older
+# RULES_VERSION. Served by idx_flights_rules_pending, which init_db() rebuilds
+# whenever RULES_VERSION changes.
+RULES_PENDING_SQL = f"classification_rule_version < {int(RULES_VERSION)}"
+
+# Columns classify_flight() reads; changing any of them re-queues the row.
+CLASSIFIER_INPUTS = ("airline_name", "owner", "callsign", "type_code")
+
+
+def _migrate_add_classification(cur) -> None:
+    cur.execute("PRAGMA table_info(flights);")
+    cols = {row[1] for row in cur.fetchall()}  # row[1] is column name
+
+    if "classification" not in cols:
+        cur.execute("ALTER TABLE flights ADD COLUMN classification TEXT;")
+
+
+def _migrate_core_indexes(cur) -> None:
+    # feed ordering, 24h / 7d windows, keyset pagination
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_flights_last_seen ON flights(last_seen);")
+    # dedup lookups for aircraft returning after the event window
     cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS flights (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            seen_at TEXT,
-            hex TEXT,
-            reg TEXT,
-            callsign TEXT,
-            type_code TEXT,
-            model TEXT,
-            manufacturer TEXT,
-            country TEXT,
-            country_iso TEXT,
-            owner TEXT,
-            airline_name TEXT,
-            origin_iata TEXT,
-            origin_name TEXT,
-            dest_iata TEXT,
-            dest_name TEXT,
-            altitude_ft REAL,
-            ground_speed_kt REAL,
-            distance_nm REAL,
-            heading_deg REAL,
-            event_key TEXT,
-            first_seen TEXT,
-            last_seen TEXT,
-            times_seen INTEGER DEFAULT 1
-        );
-        """
+        "CREATE INDEX IF NOT EXISTS idx_flights_event_key ON flights(event_key, last_seen);"
     )
-
-    # ---- aircraft intelligence cache ----
+    # classifier loop: only the rows it still has to resolve
     cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS aircraft_cache (
-            reg TEXT PRIMARY KEY,
-            type_code TEXT,
-            model TEXT,
-            manufacturer TEXT,
-            owner TEXT,
-            country TEXT,
-            country_iso TEXT,
-            updated_at TEXT
-        );
-        """
+        f"CREATE INDEX IF NOT EXISTS idx_flights_unclassified ON flights(id) "
+        f"WHERE {UNCLASSIFIED_SQL};"
     )
-
-    # ---- callsign / route cache ----
     cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS callsign_cache (
-            callsign TEXT PRIMARY KEY,
-            airline_name TEXT,
-            origin_iata TEXT,
-            origin_name TEXT,
-            dest_iata TEXT,
-            dest_name TEXT,
-            updated_at TEXT
-        );
-        """
+        "CREATE INDEX IF NOT EXISTS idx_flights_classification "
+        "ON flights(classification, last_seen);"
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_flights_reg ON flights(reg, last_seen);")
+    # route stats only ever look at rows with both ends known
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_flights_route ON flights(origin_iata, dest_iata) "
+        "WHERE origin_iata IS NOT NULL AND dest_iata IS NOT NULL;"
     )
 
-    # ---- airports reference table ----
+
+def _migrate_rollups(cur) -> None:
+    # top-aircraft walks this instead of grouping the whole log
     cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS airports (
-            iata_code TEXT PRIMARY KEY,
-            name TEXT,
-            city TEXT,
-            country TEXT,
-            latitude REAL,
-            longitude REAL
-        );
-        """
+        "CREATE INDEX IF NOT EXISTS idx_flights_times_seen ON flights(times_seen) "
+        "WHERE reg IS NOT NULL;"
     )
+    install_presite_rollups(cur)
 
-        # ---- lightweight migrations (safe on existing DBs) ----
-    cur.execute("PRAGMA table_info(flights);")
-    cols = {row[1] for row in cur.fetchall()}  # row[1] is column name
 
-    if "classification" not in cols:
-        cur.execute("ALTER TABLE flights ADD COLUMN classification TEXT;")
+def _migrate_callsign_index(cur) -> None:
+    # /api/flights?callsign= pages newest-first within one callsign
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_flights_callsign "
+        "ON flights(callsign, last_seen);"
+    )
 
 
-    conn.commit()
-    conn.close()
+def _migrate_operator_codes(cur) -> None:
+    install_operator_codes(cur)
+    rebuild_operator_codes(cur)
 
 
-# ============================================================
-# Event logic
-# ============================================================
+def _migrate_rule_version(cur) -> None:
+    cur.execute("PRAGMA table_info(flights);")
+    cols = {row[1] for row in cur.fetchall()}
 
-def _build_event_key(row: Dict[str, Any]) -> str:
-    hex_ = (row.get("hex") or "").strip()
-    reg = (row.get("reg") or "").strip()
-    cs = (row.get("callsign") or "").strip()
-    return f"{hex_}|{reg}|{cs}"
+    if "classification_rule_version" not in cols:
+        cur.execute(
+            "ALTER TABLE flights ADD COLUMN classification_rule_version "
+            "INTEGER NOT NULL DEFAULT 0;"
+        )
 
+    # Writers classify inline from the sighting in hand; the stored row can
+    # differ (COALESCEd enrichment, late patches), so any change to an input
+    # hands the row back to the background classifier.
+    changed = " OR ".join(f"NEW.{col} IS NOT OLD.{col}" for col in CLASSIFIER_INPUTS)
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_flights_classifier_inputs
+        AFTER UPDATE OF {", ".join(CLASSIFIER_INPUTS)} ON flights
+        WHEN {changed}
+        BEGIN
+            UPDATE flights SET classification_rule_version = 0 WHERE id = NEW.id;
+        END;
+        """
+    )
 
-def classify_flight(row: Dict[str, Any]) -> str:
+
+def _ensure_rules_index(cur) -> None:
     """
-    Returns one of: commercial | private | government | cargo | unknown
-    Uses only fields we already store: airline_name, owner, callsign, type_code, reg, country, etc.
+    Keeps idx_flights_rules_pending's predicate in step with RULES_VERSION.
+    After a bump the index is rebuilt once here and then holds every row
+    the classifier must revisit; when it is empty an idle pass is one probe.
     """
-    airline = (row.get("airline_name") or "").strip().lower()
-    owner = (row.get("owner") or "").strip().lower()
-    callsign = (row.get("callsign") or "").strip().upper()
-    type_code = (row.get("type_code") or "").strip().upper()
-    reg = (row.get("reg") or "").strip().upper()
-
-    # ============================================================
-    # GOVERNMENT / MILITARY (highest priority - most specific)
-    # ============================================================
-
-    gov_owner_terms = [
-        "air force", "usaf", "navy", "army", "marines", "government",
-        "homeland", "state dept", "department of", "police", "sheriff",
-        "coast guard", "national guard", "royal air force", "raf",
-        "us marshal", "dhs", "customs", "border patrol", "fbi",
-        "military", "defense", "armed forces", "ministry of defence",
-    ]
-    if any(t in owner for t in gov_owner_terms):
-        return "government"
-
-    # Military callsign prefixes (US and international)
-    gov_callsign_prefixes = (
-        "RCH", "SAM", "MC", "AF", "NAVY", "ARMY", "AE", "EVAC",
-        "BOXER", "REACH", "SPAR", "VENUS", "EXEC", "PAT",
-        "CNV", "SHAMU", "CONVOY", "TEAL"
+    cur.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = 'idx_flights_rules_pending';"
     )
-    if callsign.startswith(gov_callsign_prefixes):
-        return "government"
-
-    # Military registration prefixes
-    if reg.startswith(("N", "AF", "166", "167", "168", "169")):
-        # US military aircraft often have registrations starting with specific numbers
-        # This is a rough heuristic
-        if any(term in owner for term in ["llc", "inc", "corp", "trust"]) == False:
-            if not airline and not any(term in owner for term in ["aviation", "air charter", "jet"]):
-                # Possible military if no clear commercial/private signals
-                pass
-
-    # ============================================================
-    # COMMERCIAL AIRLINES (high confidence)
-    # ============================================================
-
-    # Airline name from callsign lookup is strongest signal
-    if airline:
-        # Check if it's cargo masquerading as commercial
-        cargo_airlines = [
-            "fedex", "ups", "united parcel", "dhl", "amazon air", "amazon prime",
-            "atlas air", "kalitta", "polar air", "southern air", "cargo", "freight",
-            "air cargo", "express freight"
-        ]
-        if any(c in airline for c in cargo_airlines):
-            return "cargo"
-        return "commercial"
-
-    # Commercial airline owner patterns
-    commercial_owner_terms = [
-        "airlines", "airways", "air lines", "airline",
-    ]
-    if any(t in owner for t in commercial_owner_terms):
-        # Exclude cargo/charter
-        if not any(c in owner for c in ["cargo", "freight", "charter"]):
-            return "commercial"
-
-    # ============================================================
-    # CARGO OPERATIONS
-    # ============================================================
-
-    cargo_owner_terms = ["cargo", "freight", "logistics", "express"]
-    if any(t in owner for t in cargo_owner_terms):
-        return "cargo"
-
-    cargo_type_codes = {
-        "B763", "B762", "B752", "B744", "B748", "MD11",  # Common cargo conversions
-        "A306", "A30B", "DC10", "DC86", "DC87",
-    }
-    if type_code in cargo_type_codes and not airline:
-        return "cargo"
-
-    # ============================================================
-    # PRIVATE / BUSINESS JETS
-    # ============================================================
-
-    # Charter operators (technically commercial but often categorized as private)
-    charter_owner_terms = [
-        "flexjet", "netjets", "wheels up", "xojet", "sentient",
-        "vistajet", "luxaviation", "privé", "air charter",
-        "charter", "executive", "flight options", "bombardier fractional",
-    ]
-    if any(t in owner for t in charter_owner_terms):
-        return "private"
-
-    # Personal ownership patterns
-    private_owner_terms = [
-        " llc", " inc", " trust", " corp", "holdings",
-        "management", "investments", "aviation llc",
-    ]
-    # Only classify as private if owner has these terms AND it's a jet/small aircraft
-    if any(owner.endswith(t) or t + " " in owner for t in private_owner_terms):
-        if type_code:  # Has type code, likely private
-            return "private"
-
-    # Business jet type codes (comprehensive list)
-    private_type_codes = {
-        # Embraer Phenom/Praetor/Legacy
-        "E50P", "E55P", "E545", "E550", "E35L", "E35X", "E135", "E145",
-        # Cessna Citation family
-        "C25A", "C25B", "C25C", "C500", "C501", "C510", "C525", "C550",
-        "C551", "C560", "C56X", "C650", "C680", "C700", "C750",
-        # Gulfstream
-        "GLF2", "GLF3", "GLF4", "GLF5", "GLF6", "G150", "G200", "G280",
-        "GLEX", "G650",
-        # Bombardier/Canadair
-        "CL30", "CL35", "CL60", "CL64", "CL65", "GALX", "GL5T", "GL7T",
-        # Dassault Falcon
-        "F900", "FA10", "FA20", "FA50", "FA7X", "FA8X", "FA2T", "FA5X",
-        # Learjet
-        "LJ23", "LJ24", "LJ25", "LJ31", "LJ35", "LJ40", "LJ45", "LJ55",
-        "LJ60", "LJ70", "LJ75", "LJ85",
-        # Hawker/Beechjet
-        "H25A", "H25B", "H25C", "BE40", "BE20", "BE30", "BE9L", "BE9T",
-        # Pilatus
-        "PC12", "PC24",
-        # Other common business jets
-        "HDJT", "HA4T", "ASTR", "C68A", "PRM1", "EA50",
-    }
-    if type_code in private_type_codes:
-        return "private"
+    found = cur.fetchone()
+    if found and RULES_PENDING_SQL in found[0]:
+        return
 
-    # Small single/twin props (likely private/training)
-    small_aircraft_codes = {
-        "C172", "C182", "C206", "PA28", "PA32", "PA46", "SR20", "SR22",
-        "BE36", "BE58", "C310", "C340", "C414", "C421",
-    }
-    if type_code in small_aircraft_codes:
-        return "private"
+    cur.execute("DROP INDEX IF EXISTS idx_flights_rules_pending;")
+    cur.execute(
+        f"CREATE INDEX idx_flights_rules_pending ON flights(id) WHERE {RULES_PENDING_SQL};"
+    )
+    print(f"[DB] Classifier queue indexed for rules version {RULES_VERSION}")
 
-    return "unknown"
 
+def _migrate_archive_partitions(cur) -> None:
+    # one row per monthly archive file (see archive.py); oldest / newest are
+    # the last_seen range it holds
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS archive_partitions (
+            month TEXT PRIMARY KEY,
+            events INTEGER NOT NULL DEFAULT 0,
+            oldest TEXT,
+            newest TEXT,
+            archived_at TEXT
+        );
+        """
+    )
 
 
-def log_flight(row: Dict[str, Any]) -> None:
-    init_db()
+def _migrate_tracks(cur) -> None:
+    # packed per-event position history (see tracks.py); starts empty, events
+    # logged before this version have no track
+    install_tracks(cur)
 
-    now_iso = row.get("seen_at") or datetime.now().isoformat(timespec="seconds")
-    row["seen_at"] = now_iso
-    now_dt = datetime.fromisoformat(now_iso)
 
-    event_key = _build_event_key(row)
-    classification = classify_flight(row)
+def _migrate_sites(cur) -> None:
+    # everything logged before sites existed was seen from the one observer
+    cur.execute("PRAGMA table_info(flights);")
+    cols = {row[1] for row in cur.fetchall()}
 
+    if "site_id" not in cols:
+        cur.execute(
+            f"ALTER TABLE flights ADD COLUMN site_id TEXT NOT NULL DEFAULT '{PRIMARY_SITE}';"
+        )
+    # /api/flights?site= and the per-site stats windows
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_flights_site ON flights(site_id, last_seen);")
 
-    if not event_key.replace("|", ""):
-        _insert_new_event(row, event_key)
-        return
+    # dedup keys gain the site: site|hex|reg|callsign
+    cur.execute(
+        "UPDATE flights SET event_key = site_id || '|' || event_key "
+        "WHERE event_key IS NOT NULL;"
+    )
+
+    # Rollups gain site_id in their keys. The old rows also count archived
+    # events, so they are carried over — as the all-sites totals and as the
+    # primary site's — rather than rebuilt from the hot table.
+    for name in DIMENSIONS:
+        cur.execute(f"DROP TRIGGER IF EXISTS rollup_{name}_insert;")
+        cur.execute(f"DROP TRIGGER IF EXISTS rollup_{name}_update;")
+    cur.execute("DROP INDEX IF EXISTS idx_rollup_groups_events;")
+    cur.execute("ALTER TABLE rollup_groups RENAME TO rollup_groups_v8;")
+    cur.execute("ALTER TABLE rollup_members RENAME TO rollup_members_v8;")
+
+    install_rollups(cur)
+    for site in (ALL_SITES, PRIMARY_SITE):
+        cur.execute(
+            """
+            INSERT INTO rollup_groups
+                (site_id, dimension, value, label, detail, events, aircraft, alt_sum, alt_n)
+            SELECT ?, dimension, value, label, detail, events, aircraft, alt_sum, alt_n
+            FROM rollup_groups_v8;
+            """,
+            (site,),
+        )
+        cur.execute(
+            """
+            INSERT INTO rollup_members (site_id, dimension, value, aircraft, events)
+            SELECT ?, dimension, value, aircraft, events
+            FROM rollup_members_v8;
+            """,
+            (site,),
+        )
+    cur.execute("DROP TABLE rollup_groups_v8;")
+    cur.execute("DROP TABLE rollup_members_v8;")
 
-    conn = _connect()
-    cur = conn.cursor()
 
+def _migrate_archived_events(cur) -> None:
+    # times_seen of each event key's newest archived row (see archive.py): an
+    # aircraft whose event was archived keeps counting when it returns
     cur.execute(
         """
-        SELECT id, last_seen
-        FROM flights
-        WHERE event_key = ?
-        ORDER BY last_seen DESC
-        LIMIT 1;
-        """,
-        (event_key,),
+        CREATE TABLE IF NOT EXISTS archived_events (
+            event_key TEXT PRIMARY KEY,
+            times_seen INTEGER NOT NULL,
+            last_seen TEXT NOT NULL
+        ) WITHOUT ROWID;
+        """
+    )
+
+    # Months archived before this version, oldest first. Their rows from
+    # before version 9 still carry unprefixed hex|reg|callsign keys.
+    from .archive import open_partition, partitions  # archive.py imports this module
+
+    for path in reversed(partitions(cur)):
+        with closing(open_partition(path)) as arc:
+            rows = arc.execute(
+                """
+                SELECT
+                    CASE WHEN LENGTH(event_key) - LENGTH(REPLACE(event_key, '|', '')) = 2
+                         THEN ? || '|' || event_key ELSE event_key END,
+                    COALESCE(times_seen, 1),
+                    last_seen
+                FROM flights
+                WHERE event_key NOT IN ('||') AND event_key NOT LIKE '%|||'
+                ORDER BY last_seen;
+                """,
+                (PRIMARY_SITE,),
+            ).fetchall()
+        cur.executemany(_RECORD_ARCHIVED_SQL, [tuple(r) for r in rows])
+
+
+def _migrate_archived_aircraft(cur) -> None:
+    # each aircraft's best archived event, per site and for ALL_SITES (see
+    # archive.py), so the all-time top aircraft never opens a partition
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS archived_aircraft (
+            site_id TEXT NOT NULL,
+            reg TEXT NOT NULL,
+            flight_id INTEGER NOT NULL,
+            times_seen INTEGER NOT NULL,
+            model TEXT,
+            type_code TEXT,
+            operator TEXT,
+            country_iso TEXT,
+            classification TEXT,
+            manufacturer TEXT,
+            last_seen TEXT NOT NULL,
+            PRIMARY KEY (site_id, reg)
+        ) WITHOUT ROWID;
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_archived_aircraft_top "
+        "ON archived_aircraft(site_id, times_seen DESC, flight_id DESC);"
     )
 
-    match = cur.fetchone()
+    # Months archived before this version. Those written before version 9
+    # have no site_id until upgrade_partitions() widens them, after this runs.
+    from .archive import open_partition, partitions  # archive.py imports this module
+
+    for path in partitions(cur):
+        with closing(open_partition(path)) as arc:
+            cols = {r[1] for r in arc.execute("PRAGMA table_info(flights);")}
+            site = "site_id" if "site_id" in cols else "?"
+            rows = arc.execute(
+                f"SELECT {site}, {ARCHIVED_AIRCRAFT_FIELDS} FROM flights WHERE reg IS NOT NULL;",
+                () if "site_id" in cols else (PRIMARY_SITE,),
+            ).fetchall()
+        record_archived_aircraft(cur, rows)
+
+
+# (version, step) — PRAGMA user_version records the last step applied.
+# Append new steps; never renumber or edit one that has shipped.
+MIGRATIONS = [
+    (1, _migrate_add_classification),
+    (2, _migrate_core_indexes),
+    (3, _migrate_rollups),
+    (4, _migrate_callsign_index),
+    (5, _migrate_operator_codes),
+    (6, _migrate_rule_version),
+    (7, _migrate_archive_partitions),
+    (8, _migrate_tracks),
+    (9, _migrate_sites),
+    (10, _migrate_archived_events),
+    (11, _migrate_archived_aircraft),
+]
+
+
+def _run_migrations(conn) -> None:
+    cur = conn.cursor()
+    current = cur.execute("PRAGMA user_version;").fetchone()[0]
+    pending = [(version, step) for version, step in MIGRATIONS if version > current]
 
-    if not match:
-        conn.close()
-        _insert_new_event(row, event_key)
+    if not pending:
         return
 
-    last_seen_dt = datetime.fromisoformat(match["last_seen"])
-    gap_minutes = (now_dt - last_seen_dt).total_seconds() / 60
-    increment = gap_minutes >= EVENT_WINDOW_MINUTES
-    # Recompute classification if enrichment data arrived
-    enrichment_fields = (
-        row.get("airline_name")
-        or row.get("owner")
-        or row.get("callsign")
-    )
+    for version, step in pending:
+        cur.execute("BEGIN;")
+        try:
+            step(cur)
+            cur.execute(f"PRAGMA user_version = {int(version)};")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"[DB] Migrated schema to version {version}")
+
+    # Refresh planner statistics so the new indexes are actually chosen
+    cur.execute("ANALYZE;")
+    conn.commit()
+
 
-    should_update_classification = enrichment_fields is not None
+# ============================================================
+# Active-event index
+# ============================================================
 
-    if increment:
+class ActiveEvents:
+    """
+    event_key -> (row id, last_seen) for every event seen inside
+    EVENT_WINDOW_MINUTES, so a repeat sighting is deduplicated with a dict
+    lookup instead of a read query. Entries are kept in last_seen order,
+    which makes eviction a pop from the front.
+    """
+
+    def __init__(self, window_minutes: int):
+        self.window = timedelta(minutes=window_minutes)
+        self._events: "OrderedDict[str, Tuple[int, datetime]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def get(self, event_key: str) -> Optional[Tuple[int, datetime]]:
+        with self._lock:
+            return self._events.get(event_key)
+
+    def update(self, entries: Dict[str, Tuple[int, datetime]]) -> None:
+        with self._lock:
+            for key, (row_id, last_seen) in entries.items():
+                self._events[key] = (row_id, last_seen)
+                self._events.move_to_end(key)
+
+    def evict_expired(self, now: datetime) -> None:
+        cutoff = now - self.window
+        with self._lock:
+            while self._events:
+                key, (_, last_seen) = next(iter(self._events.items()))
+                if last_seen >= cutoff:
+                    break
+                self._events.popitem(last=False)
+
+    def load(self, cur, now: datetime) -> None:
+        cutoff = (now - self.window).isoformat(timespec="seconds")
         cur.execute(
             """
-            UPDATE flights
-            SET
-                last_seen = ?,
-                seen_at = ?,
-                times_seen = times_seen + 1,
-                altitude_ft = ?,
-                ground_speed_kt = ?,
-                distance_nm = ?,
-                heading_deg = ?,
-                model = COALESCE(NULLIF(model, ''), ?),
-                manufacturer = COALESCE(NULLIF(manufacturer, ''), ?),
-                country = COALESCE(NULLIF(country, ''), ?),
-                country_iso = COALESCE(NULLIF(country_iso, ''), ?),
-                owner = COALESCE(NULLIF(owner, ''), ?),
-                airline_name = COALESCE(NULLIF(airline_name, ''), ?),
-                origin_iata = COALESCE(NULLIF(origin_iata, ''), ?),
-                origin_name = COALESCE(NULLIF(origin_name, ''), ?),
-                dest_iata = COALESCE(NULLIF(dest_iata, ''), ?),
-                dest_name = COALESCE(NULLIF(dest_name, ''), ?),
-                classification = ?
-            WHERE id = ?;
+            SELECT event_key, id, last_seen
+            FROM flights
+            WHERE last_seen >= ?
+              AND event_key IS NOT NULL
+              AND event_key NOT LIKE '%|||'
+            ORDER BY last_seen;
             """,
-            (
-                now_iso,
-                now_iso,
-                row.get("altitude_ft"),
-                row.get("ground_speed_kt"),
-                row.get("distance_nm"),
-                row.get("heading_deg"),
-                row.get("model"),
-                row.get("manufacturer"),
-                row.get("country"),
-                row.get("country_iso"),
-                row.get("owner"),
-                row.get("airline_name"),
-                row.get("origin_iata"),
-                row.get("origin_name"),
-                row.get("dest_iata"),
-                row.get("dest_name"),
-                classification,
-                match["id"],
-            ),
+            (cutoff,),
         )
-    else:
-        cur.execute(
-            """
-            UPDATE flights
-            SET
-                last_seen = ?,
-                seen_at = ?,
-                altitude_ft = ?,
-                ground_speed_kt = ?,
-                distance_nm = ?,
-                heading_deg = ?,
-                classification = ?
-            WHERE id = ?;
-            """,
-            (
+        entries = {
+            r["event_key"]: (r["id"], datetime.fromisoformat(r["last_seen"]))
+            for r in cur.fetchall()
+        }
+        with self._lock:
+            self._events.clear()
+        self.update(entries)
+
+
+_active_events = ActiveEvents(EVENT_WINDOW_MINUTES)
+
+
+# ============================================================
+# Event logic
+# ============================================================
+
+def _build_event_key(row: Dict[str, Any]) -> str:
+    # per site: an aircraft inside two sites' radius is an event at each
+    hex_ = (row.get("hex") or "").strip()
+    reg = (row.get("reg") or "").strip()
+    cs = (row.get("callsign") or "").strip()
+    return f"{row['site_id']}|{hex_}|{reg}|{cs}"
+
+
+def _has_identity(event_key: str) -> bool:
+    return not event_key.endswith("|||")
+
+
+# ---- statements reused for every sighting (sqlite3 caches them prepared) ----
+
+_FIND_EVENT_SQL = """
+    SELECT id, last_seen
+    FROM flights
+    WHERE event_key = ?
+    ORDER BY last_seen DESC
+    LIMIT 1;
+"""
+
+# the newest archived row wins: a key archived twice keeps the later count
+_RECORD_ARCHIVED_SQL = """
+    INSERT INTO archived_events (event_key, times_seen, last_seen)
+    VALUES (?, ?, ?)
+    ON CONFLICT (event_key) DO UPDATE SET
+        times_seen = excluded.times_seen,
+        last_seen = excluded.last_seen
+    WHERE excluded.last_seen >= archived_events.last_seen;
+"""
+
+_FIND_ARCHIVED_SQL = "SELECT times_seen FROM archived_events WHERE event_key = ?;"
+
+# What archived_aircraft keeps of a flights row, after its site_id
+ARCHIVED_AIRCRAFT_FIELDS = """
+    reg, id, COALESCE(times_seen, 1), model, type_code,
+    COALESCE(airline_name, owner), country_iso, classification, manufacturer, last_seen
+"""
+
+# the event with the most sightings wins (ties: the newest id, as the hot
+# table's top aircraft breaks them); last_seen is the aircraft's newest
+_BETTER_ARCHIVED_SQL = (
+    "(excluded.times_seen, excluded.flight_id) > "
+    "(archived_aircraft.times_seen, archived_aircraft.flight_id)"
+)
+_RECORD_ARCHIVED_AIRCRAFT_SQL = f"""
+    INSERT INTO archived_aircraft (
+        site_id, reg, flight_id, times_seen, model, type_code,
+        operator, country_iso, classification, manufacturer, last_seen
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (site_id, reg) DO UPDATE SET
+        {", ".join(
+            f"{col} = CASE WHEN {_BETTER_ARCHIVED_SQL} THEN excluded.{col} ELSE {col} END"
+            for col in (
+                "flight_id", "times_seen", "model", "type_code", "operator",
+                "country_iso", "classification", "manufacturer",
+            )
+        )},
+        last_seen = MAX(last_seen, excluded.last_seen);
+"""
+
+
+def record_archived_aircraft(cur, rows) -> None:
+    """
+    Folds archived (site_id, *ARCHIVED_AIRCRAFT_FIELDS) rows into
+    archived_aircraft, under their site and under ALL_SITES. Applying the
+    same rows twice changes nothing.
+    """
+    rows = [tuple(r) for r in rows]
+    cur.executemany(_RECORD_ARCHIVED_AIRCRAFT_SQL, rows)
+    cur.executemany(_RECORD_ARCHIVED_AIRCRAFT_SQL, [(ALL_SITES, *r[1:]) for r in rows])
+
+_INSERT_EVENT_SQL = """
+    INSERT INTO flights (
+        seen_at,
+        hex,
+        reg,
+        callsign,
+        type_code,
+        model,
+        manufacturer,
+        country,
+        country_iso,
+        owner,
+        airline_name,
+        origin_iata,
+        origin_name,
+        dest_iata,
+        dest_name,
+        altitude_ft,
+        ground_speed_kt,
+        distance_nm,
+        heading_deg,
+        event_key,
+        first_seen,
+        last_seen,
+        times_seen,
+        classification,
+        site_id
+    )
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?);
+"""
+
+# Enrichment columns a repeat sighting fills in but never overwrites: intel
+# cached after the event was logged reaches it on the next poll, even if the
+# worker's own patch ran before the event existed.
+_FILL_ENRICHMENT_SQL = """
+        model = COALESCE(NULLIF(model, ''), ?),
+        manufacturer = COALESCE(NULLIF(manufacturer, ''), ?),
+        country = COALESCE(NULLIF(country, ''), ?),
+        country_iso = COALESCE(NULLIF(country_iso, ''), ?),
+        owner = COALESCE(NULLIF(owner, ''), ?),
+        airline_name = COALESCE(NULLIF(airline_name, ''), ?),
+        origin_iata = COALESCE(NULLIF(origin_iata, ''), ?),
+        origin_name = COALESCE(NULLIF(origin_name, ''), ?),
+        dest_iata = COALESCE(NULLIF(dest_iata, ''), ?),
+        dest_name = COALESCE(NULLIF(dest_name, ''), ?),"""
+
+_ENRICHMENT_COLUMNS = (
+    "model", "manufacturer", "country", "country_iso", "owner",
+    "airline_name", "origin_iata", "origin_name", "dest_iata", "dest_name",
+)
+
+_INCREMENT_EVENT_SQL = f"""
+    UPDATE flights
+    SET
+        last_seen = ?,
+        seen_at = ?,
+        times_seen = times_seen + 1,
+        altitude_ft = ?,
+        ground_speed_kt = ?,
+        distance_nm = ?,
+        heading_deg = ?,{_FILL_ENRICHMENT_SQL}
+        classification = ?
+    WHERE id = ?;
+"""
+
+_REFRESH_EVENT_SQL = f"""
+    UPDATE flights
+    SET
+        last_seen = ?,
+        seen_at = ?,
+        altitude_ft = ?,
+        ground_speed_kt = ?,
+        distance_nm = ?,
+        heading_deg = ?,{_FILL_ENRICHMENT_SQL}
+        classification = ?
+    WHERE id = ?;
+"""
+
+
+def log_flight(row: Dict[str, Any]) -> None:
+    log_flights([row])
+
+
+def log_flights(rows: List[Dict[str, Any]]) -> None:
+    """
+    Applies a whole poll snapshot: one connection, one transaction, one commit.
+    Schema setup is not repeated here — init_db() runs once at startup.
+    """
+    if not rows:
+        return
+
+    started = time.perf_counter()
+
+    # Index changes are staged here and published only after the commit, so a
+    # rolled-back snapshot never leaves ids of unwritten rows in the index.
+    staged: Dict[str, Tuple[int, datetime]] = {}
+    touched: List[int] = []
+    # new track tails (tracks.py) follow the same rule
+    tails: Dict[int, Any] = {}
+
+    with connection() as conn:
+        cur = conn.cursor()
+
+        for row in rows:
+            now_iso = row.get("seen_at") or datetime.now().isoformat(timespec="seconds")
+            row["seen_at"] = now_iso
+            row["site_id"] = row.get("site_id") or PRIMARY_SITE
+            now_dt = datetime.fromisoformat(now_iso)
+
+            event_key = _build_event_key(row)
+            classification = classify_flight(row)
+
+            if not _has_identity(event_key):
+                row_id = _insert_new_event(cur, row, event_key, classification)
+                append_sample(cur, row_id, row, tails)
+                touched.append(row_id)
+                continue
+
+            match = staged.get(event_key) or _active_events.get(event_key)
+
+            if not match:
+                # Not seen inside the window: only now does the log need to be
+                # consulted, to find an older event this sighting returns to.
+                cur.execute(_FIND_EVENT_SQL, (event_key,))
+                found = cur.fetchone()
+                if found:
+                    match = (found["id"], datetime.fromisoformat(found["last_seen"]))
+
+            if not match:
+                # an aircraft whose event was archived returns: keep counting
+                cur.execute(_FIND_ARCHIVED_SQL, (event_key,))
+                archived = cur.fetchone()
+                times_seen = archived[0] + 1 if archived else 1
+                row_id = _insert_new_event(cur, row, event_key, classification, times_seen)
+                append_sample(cur, row_id, row, tails)
+                staged[event_key] = (row_id, now_dt)
+                touched.append(row_id)
+                continue
+
+            row_id, last_seen_dt = match
+            gap_minutes = (now_dt - last_seen_dt).total_seconds() / 60
+            telemetry = (
                 now_iso,
                 now_iso,
                 row.get("altitude_ft"),
                 row.get("ground_speed_kt"),
                 row.get("distance_nm"),
                 row.get("heading_deg"),
-                classification,
-                match["id"],
-            ),
-        )
+            )
 
-    conn.commit()
-    conn.close()
+            intel = tuple(row.get(col) for col in _ENRICHMENT_COLUMNS)
+            if gap_minutes >= EVENT_WINDOW_MINUTES:
+                update_sql = _INCREMENT_EVENT_SQL
+            else:
+                update_sql = _REFRESH_EVENT_SQL
+            cur.execute(update_sql, telemetry + intel + (classification, row_id))
 
+            append_sample(cur, row_id, row, tails)
+            staged[event_key] = (row_id, now_dt)
+            touched.append(row_id)
+
+        conn.commit()
+        publish_events(cur, touched)
+
+    _active_events.update(staged)
+    _active_events.evict_expired(datetime.now())
+    publish_tails(tails)
+
+    WRITE_SECONDS.observe(time.perf_counter() - started)
+    WRITE_ROWS.inc(len(rows))
 
-def _insert_new_event(row: Dict[str, Any], event_key: str) -> None:
-    conn = _connect()
-    cur = conn.cursor()
 
-    seen_at = row.get("seen_at") or datetime.now().isoformat(timespec="seconds")
-    classification = classify_flight(row)
+def _insert_new_event(
+    cur, row: Dict[str, Any], event_key: str, classification: str, times_seen: int = 1
+) -> int:
+    seen_at = row["seen_at"]
 
     cur.execute(
-        """
-        INSERT INTO flights (
-            seen_at,
-            hex,
-            reg,
-            callsign,
-            type_code,
-            model,
-            manufacturer,
-            country,
-            country_iso,
-            owner,
-            airline_name,
-            origin_iata,
-            origin_name,
-            dest_iata,
-            dest_name,
-            altitude_ft,
-            ground_speed_kt,
-            distance_nm,
-            heading_deg,
-            event_key,
-            first_seen,
-            last_seen,
-            times_seen,
-            classification
-        )
-        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-        """,
+        _INSERT_EVENT_SQL,
         (
             seen_at,
             row.get("hex"),
@@ -458,125 +945,318 @@ def _insert_new_event(row: Dict[str, Any], event_key: str) -> None:
             event_key,
             seen_at,
             seen_at,
-            1,
+            times_seen,
             classification,
+            row["site_id"],
         ),
     )
+    return cur.lastrowid
+
+
+
+# ============================================================
+# In-memory intel caches
+# ============================================================
+#
+# Sit in front of aircraft_cache / callsign_cache so a repeat sighting costs
+# neither a query nor a request. get_cached_* return the cached row, {} when
+# adsbdb is known to have nothing (negative entry), or None when unknown.
+
+aircraft_memo = TTLCache(
+    "aircraft", INTEL_CACHE_SIZE, INTEL_CACHE_TTL_SECONDS, INTEL_NEGATIVE_TTL_SECONDS
+)
+callsign_memo = TTLCache(
+    "callsign", INTEL_CACHE_SIZE, INTEL_CACHE_TTL_SECONDS, INTEL_NEGATIVE_TTL_SECONDS
+)
+
+
+def intel_cache_stats() -> Dict[str, Any]:
+    return {
+        "aircraft": aircraft_memo.stats(),
+        "callsign": callsign_memo.stats(),
+    }
 
-    conn.commit()
-    conn.close()
 
+cache_collectors(intel_cache_stats)
 
 
 # ============================================================
 # Aircraft cache helpers
 # ============================================================
 
+_UPSERT_AIRCRAFT_SQL = """
+    INSERT INTO aircraft_cache (
+        reg, type_code, model, manufacturer, owner,
+        country, country_iso, updated_at
+    )
+    VALUES (?,?,?,?,?,?,?,?)
+    ON CONFLICT(reg) DO UPDATE SET
+        type_code=excluded.type_code,
+        model=excluded.model,
+        manufacturer=excluded.manufacturer,
+        owner=excluded.owner,
+        country=excluded.country,
+        country_iso=excluded.country_iso,
+        updated_at=excluded.updated_at;
+"""
+
+
 def get_cached_aircraft(reg: str):
     if not reg:
         return None
 
-    conn = _connect()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM aircraft_cache WHERE reg = ?", (reg,))
-    row = cur.fetchone()
-    conn.close()
-    return dict(row) if row else None
+    cached = aircraft_memo.get(reg)
+    if cached is not None:
+        return cached
 
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM aircraft_cache WHERE reg = ?", (reg,))
+        row = cur.fetchone()
 
-def upsert_aircraft_cache(reg: str, intel: dict):
-    if not reg or not intel:
-        return
+    if not row:
+        return None
+    cached = dict(row)
+    aircraft_memo.put(reg, cached)
+    return cached
 
-    conn = _connect()
-    cur = conn.cursor()
 
+def _upsert_aircraft_cache(cur, reg: str, fields: Dict[str, Any]) -> None:
     cur.execute(
-        """
-        INSERT INTO aircraft_cache (
-            reg, type_code, model, manufacturer, owner,
-            country, country_iso, updated_at
-        )
-        VALUES (?,?,?,?,?,?,?,?)
-        ON CONFLICT(reg) DO UPDATE SET
-            type_code=excluded.type_code,
-            model=excluded.model,
-            manufacturer=excluded.manufacturer,
-            owner=excluded.owner,
-            country=excluded.country,
-            country_iso=excluded.country_iso,
-            updated_at=excluded.updated_at;
-        """,
+        _UPSERT_AIRCRAFT_SQL,
         (
             reg,
-            intel.get("icao_type"),
-            intel.get("type"),
-            intel.get("manufacturer"),
-            intel.get("registered_owner"),
-            intel.get("registered_owner_country_name"),
-            intel.get("registered_owner_country_iso_name"),
+            fields["type_code"],
+            fields["model"],
+            fields["manufacturer"],
+            fields["owner"],
+            fields["country"],
+            fields["country_iso"],
             datetime.now().isoformat(timespec="seconds"),
         ),
     )
 
-    conn.commit()
-    conn.close()
+
+def upsert_aircraft_cache(reg: str, intel: dict):
+    if not reg or not intel:
+        return
+
+    fields = aircraft_fields(intel)
+
+    with connection() as conn:
+        _upsert_aircraft_cache(conn.cursor(), reg, fields)
+        conn.commit()
+
+    aircraft_memo.put(reg, fields)
+
+
+def apply_aircraft_intel(reg: str, intel: dict) -> int:
+    """
+    Caches registry intel for reg and fills it into that aircraft's events
+    logged inside the event window, re-classifying them. Returns rows patched.
+    An empty intel dict means adsbdb has no record: it is remembered as a
+    negative entry so the lookup is not repeated every poll.
+    """
+    if not reg:
+        return 0
+    if not intel:
+        aircraft_memo.put_negative(reg)
+        return 0
+
+    fields = aircraft_fields(intel)
+
+    with connection() as conn:
+        cur = conn.cursor()
+        _upsert_aircraft_cache(cur, reg, fields)
+        patched = _patch_recent_events(
+            cur,
+            "reg",
+            reg,
+            fields,
+            # registry type beats the ADS-B type; everything else only fills gaps
+            overwrite=("type_code",),
+        )
+        conn.commit()
+        publish_events(cur, patched)
+
+    aircraft_memo.put(reg, fields)
+    return len(patched)
 
 
 # ============================================================
 # Callsign cache helpers
 # ============================================================
 
+_UPSERT_CALLSIGN_SQL = """
+    INSERT INTO callsign_cache (
+        callsign, airline_name,
+        origin_iata, origin_name,
+        dest_iata, dest_name,
+        updated_at
+    )
+    VALUES (?,?,?,?,?,?,?)
+    ON CONFLICT(callsign) DO UPDATE SET
+        airline_name=excluded.airline_name,
+        origin_iata=excluded.origin_iata,
+        origin_name=excluded.origin_name,
+        dest_iata=excluded.dest_iata,
+        dest_name=excluded.dest_name,
+        updated_at=excluded.updated_at;
+"""
+
+
 def get_cached_callsign(callsign: str):
     if not callsign:
         return None
 
-    conn = _connect()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM callsign_cache WHERE callsign = ?", (callsign,))
-    row = cur.fetchone()
-    conn.close()
-    return dict(row) if row else None
+    cached = callsign_memo.get(callsign)
+    if cached is not None:
+        return cached
+
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM callsign_cache WHERE callsign = ?", (callsign,))
+        row = cur.fetchone()
+
+    if not row:
+        return None
+    cached = dict(row)
+    callsign_memo.put(callsign, cached)
+    return cached
+
+
+def _upsert_callsign_cache(cur, callsign: str, fields: Dict[str, Any]) -> None:
+    cur.execute(
+        _UPSERT_CALLSIGN_SQL,
+        (
+            callsign,
+            fields["airline_name"],
+            fields["origin_iata"],
+            fields["origin_name"],
+            fields["dest_iata"],
+            fields["dest_name"],
+            datetime.now().isoformat(timespec="seconds"),
+        ),
+    )
 
 
 def upsert_callsign_cache(callsign: str, route: dict):
     if not callsign or not route:
         return
 
-    airline = route.get("airline") or {}
-    origin = route.get("origin") or {}
-    dest = route.get("destination") or {}
+    fields = route_fields(route)
 
-    conn = _connect()
-    cur = conn.cursor()
+    with connection() as conn:
+        _upsert_callsign_cache(conn.cursor(), callsign, fields)
+        conn.commit()
 
+    callsign_memo.put(callsign, fields)
+
+
+def apply_callsign_route(callsign: str, route: dict) -> int:
+    """
+    Caches route intel for callsign and fills it into events logged with that
+    callsign inside the event window, re-classifying them. Returns rows patched.
+    An empty route dict is remembered as a negative entry.
+    """
+    if not callsign:
+        return 0
+    if not route:
+        callsign_memo.put_negative(callsign)
+        return 0
+
+    fields = route_fields(route)
+
+    with connection() as conn:
+        cur = conn.cursor()
+        _upsert_callsign_cache(cur, callsign, fields)
+        patched = _patch_recent_events(cur, "callsign", callsign, fields)
+        conn.commit()
+        publish_events(cur, patched)
+
+    callsign_memo.put(callsign, fields)
+    return len(patched)
+
+
+# ============================================================
+# Live stream
+# ============================================================
+
+def publish_events(cur, ids: List[int]) -> None:
+    """
+    Sends the committed state of the given events to /api/stream clients.
+    Runs after the commit, so a client never sees a row that was rolled back.
+    """
+    if not ids:
+        return
+    if broadcaster.skip_if_idle():
+        return  # no re-read or dicts for nobody; a later resume gets a reset
+    unique = sorted(set(ids))
+    placeholders = ",".join("?" * len(unique))
+    cur.execute(f"SELECT * FROM flights WHERE id IN ({placeholders});", unique)
+    for row in cur.fetchall():
+        broadcaster.publish("flight", dict(row))
+
+
+# ============================================================
+# Late enrichment
+# ============================================================
+
+def _patch_recent_events(
+    cur,
+    key_column: str,
+    key: str,
+    fields: Dict[str, Any],
+    overwrite: Tuple[str, ...] = (),
+) -> List[int]:
+    """
+    Sightings are logged before their enrichment lookups finish; this fills
+    the missing fields into the events they produced and re-classifies them.
+    Returns the ids of the patched events.
+    """
+    cutoff = (datetime.now() - timedelta(minutes=EVENT_WINDOW_MINUTES)).isoformat(
+        timespec="seconds"
+    )
     cur.execute(
-        """
-        INSERT INTO callsign_cache (
-            callsign, airline_name,
-            origin_iata, origin_name,
-            dest_iata, dest_name,
-            updated_at
-        )
-        VALUES (?,?,?,?,?,?,?)
-        ON CONFLICT(callsign) DO UPDATE SET
-            airline_name=excluded.airline_name,
-            origin_iata=excluded.origin_iata,
-            origin_name=excluded.origin_name,
-            dest_iata=excluded.dest_iata,
-            dest_name=excluded.dest_name,
-            updated_at=excluded.updated_at;
+        f"""
+        SELECT id, airline_name, owner, callsign, type_code, reg
+        FROM flights
+        WHERE {key_column} = ?
+          AND last_seen >= ?;
         """,
-        (
-            callsign,
-            airline.get("name"),
-            origin.get("iata_code"),
-            origin.get("name") or origin.get("municipality"),
-            dest.get("iata_code"),
-            dest.get("name") or dest.get("municipality"),
-            datetime.now().isoformat(timespec="seconds"),
-        ),
+        (key, cutoff),
+    )
+    events = cur.fetchall()
+    if not events:
+        return []
+
+    columns = list(fields)
+    assignments = ",\n            ".join(
+        f"{col} = COALESCE(NULLIF(?, ''), {col})"
+        if col in overwrite
+        else f"{col} = COALESCE(NULLIF({col}, ''), ?)"
+        for col in columns
     )
 
-    conn.commit()
-    conn.close()
+    updates = []
+    for event in events:
+        merged = dict(event)
+        for col in columns:
+            if fields[col] and (col in overwrite or not merged.get(col)):
+                merged[col] = fields[col]
+        updates.append(
+            tuple(fields[col] for col in columns)
+            + (classify_flight(merged), event["id"])
+        )
+
+    cur.executemany(
+        f"""
+        UPDATE flights
+        SET
+            {assignments},
+            classification = ?
+        WHERE id = ?;
+        """,
+        updates,
+    )
+    return [event["id"] for event in events]
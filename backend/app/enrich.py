@@ -1,9 +1,13 @@
-import requests
+from .config import ADSBDB_BASE_URL, HTTP_CACHE_ENRICH
+from .httpclient import get as http_get
 
-ADSBDB_AIRCRAFT_URL = "https://api.adsbdb.com/v0/aircraft"
-ADSBDB_CALLSIGN_URL = "https://api.adsbdb.com/v0/callsign"
+ADSBDB_AIRCRAFT_URL = f"{ADSBDB_BASE_URL}/aircraft"
+ADSBDB_CALLSIGN_URL = f"{ADSBDB_BASE_URL}/callsign"
 
 
+# Both lookups return the payload, {} when adsbdb has no record for the key
+# (cached as a negative entry), or None when the request itself failed.
+
 # ------------------------------------------------------------
 # Aircraft enrichment (registration-based)
 # ------------------------------------------------------------
@@ -13,13 +17,14 @@ def fetch_aircraft_intel(reg: str):
         return None
 
     try:
-        r = requests.get(
-            f"{ADSBDB_AIRCRAFT_URL}/{reg}",
-            timeout=8,
-            headers={"User-Agent": "overhead-tracker/1.0"},
-        )
+        r = http_get(f"{ADSBDB_AIRCRAFT_URL}/{reg}", timeout=8, cache=HTTP_CACHE_ENRICH)
+        if r.status_code == 404:
+            return {}
         r.raise_for_status()
-        return r.json().get("response", {}).get("aircraft")
+        payload = r.json().get("response")
+        if not isinstance(payload, dict):
+            return {}
+        return payload.get("aircraft") or {}
     except Exception as e:
         print("[ENRICH] aircraft lookup failed:", e)
         return None
@@ -34,13 +39,43 @@ def fetch_callsign_route(callsign: str):
         return None
 
     try:
-        r = requests.get(
-            f"{ADSBDB_CALLSIGN_URL}/{callsign}",
-            timeout=8,
-            headers={"User-Agent": "overhead-tracker/1.0"},
-        )
+        r = http_get(f"{ADSBDB_CALLSIGN_URL}/{callsign}", timeout=8, cache=HTTP_CACHE_ENRICH)
+        if r.status_code == 404:
+            return {}
         r.raise_for_status()
-        return r.json().get("response", {}).get("flightroute")
+        payload = r.json().get("response")
+        if not isinstance(payload, dict):
+            return {}
+        return payload.get("flightroute") or {}
     except Exception as e:
         print("[ENRICH] callsign lookup failed:", e)
         return None
+
+
+# ------------------------------------------------------------
+# Mapping adsbdb payloads onto flights columns
+# ------------------------------------------------------------
+
+def aircraft_fields(intel: dict) -> dict:
+    return {
+        "type_code": intel.get("icao_type"),
+        "model": intel.get("type"),
+        "manufacturer": intel.get("manufacturer"),
+        "owner": intel.get("registered_owner"),
+        "country": intel.get("registered_owner_country_name"),
+        "country_iso": intel.get("registered_owner_country_iso_name"),
+    }
+
+
+def route_fields(route: dict) -> dict:
+    airline = route.get("airline") or {}
+    origin = route.get("origin") or {}
+    dest = route.get("destination") or {}
+
+    return {
+        "airline_name": airline.get("name"),
+        "origin_iata": origin.get("iata_code"),
+        "origin_name": origin.get("name") or origin.get("municipality"),
+        "dest_iata": dest.get("iata_code"),
+        "dest_name": dest.get("name") or dest.get("municipality"),
+    }
@@ -0,0 +1,141 @@
+import csv
+import io
+import json
+import zlib
+from contextlib import closing
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import archive
+from .db import connection, read_snapshot
+
+
+# ------------------------------------------------------------
+# Bulk export (/api/export)
+# ------------------------------------------------------------
+#
+# The log is walked oldest first in keyset chunks of CHUNK_SIZE rows, so
+# memory stays at one chunk. Every chunk is read inside one read transaction
+# (db.read_snapshot): a live event whose last_seen moves forward during the
+# download would otherwise come out twice, at its old position and again
+# near the end. The snapshot sits on its own connection, not a pooled one,
+# so a slow client only delays WAL checkpoints, never other requests.
+# Archived months come first (they are all older), then the hot table.
+
+CHUNK_SIZE = 2000
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+FILTER_COLUMNS = ("classification", "reg", "callsign", "site_id")
+
+_json = json.JSONEncoder(separators=(",", ":"), default=str)
+
+
+def _where(
+    filters: Dict[str, str], since: Optional[str], until: Optional[str]
+) -> Tuple[List[str], List[Any]]:
+    where = [f"{col} = ?" for col in FILTER_COLUMNS if filters.get(col)]
+    params: List[Any] = [filters[col] for col in FILTER_COLUMNS if filters.get(col)]
+    if since:
+        where.append("last_seen >= ?")
+        params.append(since)
+    if until:
+        where.append("last_seen < ?")
+        params.append(until)
+    return where, params
+
+
+def _chunks(read, where: List[str], params: List[Any]) -> Iterator[List[Dict[str, Any]]]:
+    """Keyset walk on (last_seen, id); read(sql, params) runs one chunk."""
+    after: Optional[Tuple[str, int]] = None
+    while True:
+        clauses = list(where)
+        args = list(params)
+        if after:
+            clauses.append("(last_seen, id) > (?, ?)")
+            args.extend(after)
+        rows = read(
+            f"""
+            SELECT *
+            FROM flights
+            {"WHERE " + " AND ".join(clauses) if clauses else ""}
+            ORDER BY last_seen, id
+            LIMIT {int(CHUNK_SIZE)};
+            """,
+            args,
+        )
+        if not rows:
+            return
+        yield rows
+        if len(rows) < CHUNK_SIZE:
+            return
+        after = (rows[-1]["last_seen"], rows[-1]["id"])
+
+
+def export_rows(
+    filters: Dict[str, str], since: Optional[str] = None, until: Optional[str] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """Chunks of matching events, oldest first, archived months included."""
+    where, params = _where(filters, since, until)
+
+    with read_snapshot() as snap:
+        paths = archive.partitions(snap.cursor(), since, until)
+        newest = snap.execute("SELECT MAX(newest) FROM archive_partitions;").fetchone()[0]
+
+        archived_where, archived_params = list(where), list(params)
+        if newest:
+            # rows left in flights by an interrupted archive run are already in
+            # a partition; every genuinely hot row is newer than the archives.
+            # Partition files are not in the snapshot, so rows an archive run
+            # moves during the export are left to the hot side.
+            archived_where.append("last_seen <= ?")
+            archived_params.append(newest)
+            where.append("last_seen > ?")
+            params.append(newest)
+
+        for path in reversed(paths):
+            def read_partition(sql, args, path=path):
+                with closing(archive.open_partition(path)) as arc:
+                    return [dict(r) for r in arc.execute(sql, args)]
+
+            yield from _chunks(read_partition, archived_where, archived_params)
+
+        def read_hot(sql, args):
+            return [dict(r) for r in snap.execute(sql, args)]
+
+        yield from _chunks(read_hot, where, params)
+
+
+def _columns() -> List[str]:
+    with connection() as conn:
+        return [r[1] for r in conn.execute("PRAGMA table_info(flights);")]
+
+
+def encode(fmt: str, chunks: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """Serializes each chunk as it arrives: CSV with a header row, or NDJSON."""
+    if fmt == "csv":
+        buf = io.StringIO()
+        # archived months predating a schema change leave newer columns blank
+        writer = csv.DictWriter(buf, fieldnames=_columns(), restval="", extrasaction="ignore")
+        writer.writeheader()
+        for rows in chunks:
+            writer.writerows(rows)
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue().encode("utf-8")
+    else:
+        for rows in chunks:
+            yield "".join(_json.encode(r) + "\n" for r in rows).encode("utf-8")
+
+
+def gzipped(parts: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for part in parts:
+        out = compressor.compress(part)
+        if out:
+            yield out
+    yield compressor.flush()
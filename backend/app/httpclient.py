@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import (
+    HTTP_CACHE_DIR,
+    HTTP_MAX_PER_HOST,
+    HTTP_RETRIES,
+    HTTP_BACKOFF_SECONDS,
+)
+
+
+# ------------------------------------------------------------
+# Shared outbound HTTP client
+# ------------------------------------------------------------
+#
+# One keep-alive Session per host, so the 12 s poll and the enrichment workers
+# reuse TCP+TLS connections instead of handshaking on every request. Each host
+# also gets a concurrency cap, and transient failures are retried with
+# jittered exponential backoff.
+
+USER_AGENT = "overhead-tracker/1.0"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class _Host:
+    def __init__(self, max_concurrent: int):
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrent)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+
+
+_hosts: Dict[str, _Host] = {}
+_hosts_lock = threading.Lock()
+
+
+def _host(url: str) -> _Host:
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    with _hosts_lock:
+        host = _hosts.get(key)
+        if host is None:
+            host = _hosts[key] = _Host(max(1, HTTP_MAX_PER_HOST))
+        return host
+
+
+def _backoff(attempt: int) -> float:
+    # "full jitter": spreads retries from concurrent callers apart
+    return random.uniform(0, HTTP_BACKOFF_SECONDS * (2 ** attempt))
+
+
+def get(
+    url: str,
+    timeout: float = 10,
+    headers: Optional[Dict[str, str]] = None,
+    retries: int = HTTP_RETRIES,
+    cache: bool = False,
+) -> requests.Response:
+    """
+    GET through the pooled session for url's host. With cache=True the body is
+    kept on disk and revalidated with ETag / Last-Modified; a 304 is returned
+    to the caller as the cached 200 response. Raises the last error once the
+    retries are exhausted; HTTP error statuses are returned, not raised.
+    """
+    host = _host(url)
+    request_headers = dict(headers or {})
+    cached = _cache_load(url) if cache else None
+    if cached:
+        meta = cached[0]
+        if meta.get("etag"):
+            request_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            request_headers["If-Modified-Since"] = meta["last_modified"]
+
+    attempt = 0
+    while True:
+        try:
+            with host.slots:
+                resp = host.session.get(url, timeout=timeout, headers=request_headers)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= retries:
+                raise
+        else:
+            if resp.status_code not in RETRY_STATUSES or attempt >= retries:
+                break
+
+        time.sleep(_backoff(attempt))
+        attempt += 1
+
+    if cache:
+        if resp.status_code == 304 and cached:
+            return _cached_response(url, *cached)
+        if resp.status_code == 200:
+            _cache_store(url, resp)
+
+    return resp
+
+
+# ------------------------------------------------------------
+# On-disk response cache
+# ------------------------------------------------------------
+
+def _cache_paths(url: str):
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    base = os.path.join(HTTP_CACHE_DIR, digest)
+    return base + ".json", base + ".body"
+
+
+def _cache_load(url: str):
+    meta_path, body_path = _cache_paths(url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None
+    return meta, body
+
+
+def _cache_store(url: str, resp: requests.Response) -> None:
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return  # nothing to revalidate with
+
+    meta_path, body_path = _cache_paths(url)
+    meta = {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "content_type": resp.headers.get("Content-Type"),
+        "encoding": resp.encoding,
+    }
+
+    try:
+        os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+        # write-then-rename so a reader never sees half a file
+        for path, data, mode in (
+            (body_path, resp.content, "wb"),
+            (meta_path, json.dumps(meta), "w"),
+        ):
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, mode) as f:
+                f.write(data)
+            os.replace(tmp, path)
+    except OSError as e:
+        print("[HTTP] cache write failed:", e)
+
+
+def _cached_response(url: str, meta: dict, body: bytes) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.url = url
+    resp._content = body
+    resp.encoding = meta.get("encoding")
+    if meta.get("content_type"):
+        resp.headers["Content-Type"] = meta["content_type"]
+    if meta.get("etag"):
+        resp.headers["ETag"] = meta["etag"]
+    if meta.get("last_modified"):
+        resp.headers["Last-Modified"] = meta["last_modified"]
+    resp.headers["X-Cache"] = "revalidated"
+    return resp
@@ -1,124 +1,154 @@
+import threading
 import time
-import requests
 from datetime import datetime
 
-from .config import ME_LAT, ME_LON, RADIUS_NM, POLL_SECONDS
+from .config import (
+    INGEST_MODE,
+    SITE_SOURCES,
+    SITES,
+    Site,
+)
 from .db import (
-    log_flight,
+    log_flights,
     get_cached_aircraft,
-    upsert_aircraft_cache,
     get_cached_callsign,
-    upsert_callsign_cache,
 )
-from .enrich import fetch_aircraft_intel, fetch_callsign_route
-
-
-ADSB_LOL_URL = "https://api.adsb.lol/v2/closest"
-
+from .metrics import POLL_ERRORS, POLL_LATENCY, SNAPSHOT_AIRCRAFT
+from .pipeline import enrichment, AIRCRAFT, CALLSIGN
+from .sources import source_for
+
+
+def poll_aircraft(site: Site):
+    source = source_for(site)
+    if INGEST_MODE == "closest":
+        ac = source.nearest()
+        return [ac] if ac else []
+    return source.snapshot()
+
+
+def build_row(ac, seen_at, site_id):
+    return {
+        "seen_at": seen_at,
+        "site_id": site_id,
+        "hex": ac.get("hex"),
+        "reg": ac.get("r"),
+        "callsign": (ac.get("flight") or "").strip(),
+        "type_code": ac.get("t"),
+        "altitude_ft": ac.get("alt_baro"),
+        "ground_speed_kt": ac.get("gs"),
+        "distance_nm": ac.get("dst"),
+        "heading_deg": ac.get("track"),
+        # not flights columns: only the position track (tracks.py) keeps these
+        "lat": ac.get("lat"),
+        "lon": ac.get("lon"),
+    }
+
+
+def apply_cached_enrichment(row, misses):
+    """
+    Fills row from the local caches and adds anything not cached yet to
+    misses, as (kind, key) lookups. Never touches the network. A negative
+    cache entry ({}) means adsbdb had nothing, so no lookup is needed.
+    """
+    # -------- Aircraft enrichment (registration-based) --------
+    reg = row.get("reg")
+
+    cached_aircraft = get_cached_aircraft(reg)
+    if cached_aircraft:
+        row.update({
+            "type_code": cached_aircraft.get("type_code") or row.get("type_code"),
+            "model": cached_aircraft.get("model"),
+            "manufacturer": cached_aircraft.get("manufacturer"),
+            "owner": cached_aircraft.get("owner"),
+            "country": cached_aircraft.get("country"),
+            "country_iso": cached_aircraft.get("country_iso"),
+        })
+    elif cached_aircraft is None and reg:
+        misses.append((AIRCRAFT, reg))
+
+    # -------- Route / airline enrichment (callsign-based) --------
+    callsign = row.get("callsign")
+
+    cached_route = get_cached_callsign(callsign)
+    if cached_route:
+        row.update({
+            "airline_name": cached_route.get("airline_name"),
+            "origin_iata": cached_route.get("origin_iata"),
+            "origin_name": cached_route.get("origin_name"),
+            "dest_iata": cached_route.get("dest_iata"),
+            "dest_name": cached_route.get("dest_name"),
+        })
+    elif cached_route is None and callsign:
+        misses.append((CALLSIGN, callsign))
+
+    return row
+
+
+def ingest_once(site: Site = SITES[0]) -> int:
+    """One poll of one site: fetch, enrich from cache, log. Returns the aircraft count."""
+    with POLL_LATENCY.labels(site.id).time():
+        snapshot = poll_aircraft(site)
+    seen_at = datetime.now().isoformat(timespec="seconds")
+    misses = []
+    rows = [apply_cached_enrichment(build_row(ac, seen_at, site.id), misses) for ac in snapshot]
+
+    log_flights(rows)
+    # queued only once the events exist, so the worker's patch can find them
+    for kind, key in misses:
+        enrichment.submit(kind, key)
+    SNAPSHOT_AIRCRAFT.labels(site.id).observe(len(rows))
+    return len(rows)
+
+
+def site_loop(site: Site):
+    """
+    Polls one site forever at its own cadence. The source is created by the
+    first poll, inside the guard: one that fails to start is retried next
+    cycle instead of ending the thread.
+    """
+    while True:
+        started = time.monotonic()
 
-def fetch_nearest():
-    url = f"{ADSB_LOL_URL}/{ME_LAT}/{ME_LON}/{RADIUS_NM}"
-    resp = requests.get(url, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
+        try:
+            count = ingest_once(site)
 
-    # adsb.lol sometimes returns { ac: [...] }
-    if isinstance(data, dict) and "ac" in data and data["ac"]:
-        return data["ac"][0]
+            if count:
+                print(
+                    f"[INGEST] {site.id}: {count} aircraft in "
+                    f"{time.monotonic() - started:.1f}s "
+                    f"({enrichment.pending()} lookups pending)"
+                )
 
-    # fallback shape
-    if isinstance(data, dict) and data.get("hex"):
-        return data
+        except Exception as e:
+            # Never crash the loop
+            POLL_ERRORS.labels(site.id).inc()
+            print(f"[INGEST] {site.id}: Error:", e)
 
-    return None
+        # Hold the cadence: sleep only for what is left of the cycle
+        elapsed = time.monotonic() - started
+        time.sleep(max(0.0, site.poll_seconds - elapsed))
 
 
 def ingestion_loop():
-    print("[INGEST] Ingestion thread started")
-
-    while True:
-        try:
-            ac = fetch_nearest()
-            if not ac:
-                time.sleep(POLL_SECONDS)
-                continue
-
-            row = {
-                "seen_at": datetime.now().isoformat(timespec="seconds"),
-                "hex": ac.get("hex"),
-                "reg": ac.get("r"),
-                "callsign": (ac.get("flight") or "").strip(),
-                "type_code": ac.get("t"),
-                "altitude_ft": ac.get("alt_baro"),
-                "ground_speed_kt": ac.get("gs"),
-                "distance_nm": ac.get("dst"),
-                "heading_deg": ac.get("track"),
-            }
-
-            # -------- Aircraft enrichment (registration-based) --------
-            reg = row.get("reg")
-
-            cached_aircraft = get_cached_aircraft(reg)
-            if cached_aircraft:
-                row.update({
-                    "type_code": cached_aircraft.get("type_code") or row.get("type_code"),
-                    "model": cached_aircraft.get("model"),
-                    "manufacturer": cached_aircraft.get("manufacturer"),
-                    "owner": cached_aircraft.get("owner"),
-                    "country": cached_aircraft.get("country"),
-                    "country_iso": cached_aircraft.get("country_iso"),
-                })
-            else:
-                intel = fetch_aircraft_intel(reg)
-                if intel:
-                    upsert_aircraft_cache(reg, intel)
-                    row.update({
-                        "type_code": intel.get("icao_type") or row.get("type_code"),
-                        "model": intel.get("type"),
-                        "manufacturer": intel.get("manufacturer"),
-                        "owner": intel.get("registered_owner"),
-                        "country": intel.get("registered_owner_country_name"),
-                        "country_iso": intel.get("registered_owner_country_iso_name"),
-                    })
-
-            # -------- Route / airline enrichment (callsign-based) --------
-            callsign = row.get("callsign")
-
-            cached_route = get_cached_callsign(callsign)
-            if cached_route:
-                row.update({
-                    "airline_name": cached_route.get("airline_name"),
-                    "origin_iata": cached_route.get("origin_iata"),
-                    "origin_name": cached_route.get("origin_name"),
-                    "dest_iata": cached_route.get("dest_iata"),
-                    "dest_name": cached_route.get("dest_name"),
-                })
-            else:
-                route = fetch_callsign_route(callsign)
-                if route:
-                    upsert_callsign_cache(callsign, route)
-
-                    airline = route.get("airline") or {}
-                    origin = route.get("origin") or {}
-                    dest = route.get("destination") or {}
-
-                    row.update({
-                        "airline_name": airline.get("name"),
-                        "origin_iata": origin.get("iata_code"),
-                        "origin_name": origin.get("name") or origin.get("municipality"),
-                        "dest_iata": dest.get("iata_code"),
-                        "dest_name": dest.get("name") or dest.get("municipality"),
-                    })
-
-            log_flight(row)
-            print(
-                f"[INGEST] {row.get('callsign') or 'UNKNOWN'} "
-                f"{row.get('reg') or ''} "
-                f"{row.get('altitude_ft')} ft"
-            )
-
-        except Exception as e:
-            # Never crash the loop
-            print("[INGEST] Error:", e)
-
-        time.sleep(POLL_SECONDS)
+    print(
+        f"[INGEST] Ingestion started for {len(SITES)} site(s): "
+        f"{', '.join(f'{s.id} ({SITE_SOURCES[s.id]})' for s in SITES)} (mode={INGEST_MODE})"
+    )
+
+    # Cache misses are resolved by the enrichment workers, which patch the
+    # logged events when intel arrives; the poll never waits on adsbdb.
+    # Sites share the workers and the caches, so an aircraft inside two
+    # sites' radius is looked up once.
+    enrichment.start()
+
+    # One poller per site: a slow upstream answer for one site never delays
+    # another's cadence. This thread runs the first site itself.
+    for site in SITES[1:]:
+        threading.Thread(
+            target=site_loop,
+            args=(site,),
+            daemon=True,
+            name=f"ingestion-{site.id}",
+        ).start()
+
+    site_loop(SITES[0])
@@ -0,0 +1,219 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional
+
+from .classification import RULES_VERSION, classify_many
+from .config import BACKFILL_CHUNK_SIZE, BACKFILL_WORKERS
+from .db import UNCLASSIFIED_SQL, connection
+
+
+# ------------------------------------------------------------
+# Background admin jobs (/api/admin/jobs/<id>)
+# ------------------------------------------------------------
+#
+# Long admin operations run on a daemon thread instead of inside the HTTP
+# request. The request gets a job id back straight away; progress, the final
+# counts and cancellation go through the job registry below. Only the last
+# few jobs are kept, in memory — a restart forgets them.
+
+JOB_HISTORY = 20
+
+
+class Job:
+    def __init__(self, kind: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.status = "queued"  # queued | running | done | cancelled | failed
+        self.total = 0
+        self.processed = 0
+        self.counts: Dict[str, int] = {}
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            **self.counts,
+            "cancel_requested": self.cancel_requested.is_set(),
+            "error": self.error,
+            "elapsed_seconds": round(end - self.started_at, 3) if self.started_at else 0.0,
+        }
+
+
+_jobs: "OrderedDict[str, Job]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def list_jobs() -> List[Job]:
+    with _lock:
+        return list(reversed(_jobs.values()))
+
+
+def active_job(kind: str) -> Optional[Job]:
+    with _lock:
+        return next((j for j in _jobs.values() if j.kind == kind and j.active), None)
+
+
+def cancel_job(job_id: str) -> Optional[Job]:
+    """Asks a job to stop; it finishes the chunk in hand and commits it first."""
+    job = get_job(job_id)
+    if job and job.active:
+        job.cancel_requested.set()
+    return job
+
+
+def start_job(kind: str, params: Dict[str, Any], run: Callable[[Job], None]) -> Job:
+    job = Job(kind, params)
+    with _lock:
+        _jobs[job.id] = job
+        while len(_jobs) > JOB_HISTORY:
+            oldest = next((k for k, j in _jobs.items() if not j.active), None)
+            if oldest is None:
+                break
+            del _jobs[oldest]
+
+    threading.Thread(
+        target=_run_job, args=(job, run), daemon=True, name=f"job-{kind}-{job.id}"
+    ).start()
+    return job
+
+
+def _run_job(job: Job, run: Callable[[Job], None]) -> None:
+    job.status = "running"
+    job.started_at = time.time()
+    print(f"[JOBS] {job.kind} {job.id} started {job.params}")
+    try:
+        run(job)
+        job.status = "cancelled" if job.cancel_requested.is_set() else "done"
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        print(f"[JOBS] {job.kind} {job.id} failed:", e)
+    finally:
+        job.finished_at = time.time()
+        print(f"[JOBS] {job.kind} {job.id} {job.status}: {job.processed}/{job.total}")
+
+
+# ------------------------------------------------------------
+# Reclassification backfill
+# ------------------------------------------------------------
+
+_BACKFILL_COLUMNS = "id, airline_name, owner, callsign, type_code, classification"
+
+
+def start_backfill(force: bool, limit: Optional[int]) -> Job:
+    return start_job(
+        "backfill-classification",
+        {"force": force, "limit": limit},
+        lambda job: run_backfill(job, force, limit),
+    )
+
+
+def run_backfill(job: Job, force: bool, limit: Optional[int]) -> None:
+    """
+    Re-runs the classifier over every row (force) or the unresolved ones,
+    walking the log in id order. Each chunk is read, classified (in this
+    thread, or across the process pool when BACKFILL_WORKERS is set), written
+    with one executemany and committed on its own, so the writer lock is held
+    for one chunk at a time and a cancelled job keeps what it has already done.
+    """
+    where = "" if force else f"AND {UNCLASSIFIED_SQL}"
+    job.counts = {"updated": 0, "changed": 0}
+
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT COUNT(*) FROM flights WHERE 1 = 1 {where};")
+        job.total = cur.fetchone()[0]
+    if limit:
+        job.total = min(job.total, limit)
+
+    pool = _classify_pool()
+    try:
+        last_id = 0
+        while job.processed < job.total and not job.cancel_requested.is_set():
+            size = min(BACKFILL_CHUNK_SIZE, job.total - job.processed)
+            with connection() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    f"""
+                    SELECT {_BACKFILL_COLUMNS}
+                    FROM flights
+                    WHERE id > ? {where}
+                    ORDER BY id
+                    LIMIT ?;
+                    """,
+                    (last_id, size),
+                )
+                rows = [dict(r) for r in cur.fetchall()]
+                if not rows:
+                    break
+
+                classes = _classify(pool, rows)
+                cur.executemany(
+                    """
+                    UPDATE flights
+                    SET classification = ?, classification_rule_version = ?
+                    WHERE id = ?;
+                    """,
+                    [(cls, RULES_VERSION, r["id"]) for r, cls in zip(rows, classes)],
+                )
+                conn.commit()
+
+            last_id = rows[-1]["id"]
+            job.processed += len(rows)
+            job.counts["updated"] += len(rows)
+            job.counts["changed"] += sum(
+                1 for r, cls in zip(rows, classes) if r["classification"] != cls
+            )
+    finally:
+        if pool:
+            pool.shutdown()
+
+
+# classify_many() is memoized and a chunk repeats a few thousand key tuples,
+# so the job thread classifies a 2,000-row chunk in a few milliseconds.
+# Spawning interpreters and pickling every chunk out and back costs more than
+# that, and each worker starts with a cold memo: python -m benchmarks.classify
+# --backfill-workers N measures both. The pool is opt-in (BACKFILL_WORKERS)
+# for rule sets expensive enough to pay for it.
+
+def _classify_pool(workers: int = BACKFILL_WORKERS) -> Optional[ProcessPoolExecutor]:
+    # spawn, not fork: the parent holds SQLite handles and worker threads
+    if workers <= 0:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+
+
+def _classify(
+    pool: Optional[ProcessPoolExecutor],
+    rows: List[Dict[str, Any]],
+    workers: int = BACKFILL_WORKERS,
+) -> List[str]:
+    if pool is None or len(rows) < 2 * workers:
+        return classify_many(rows)
+    step = -(-len(rows) // workers)
+    parts = pool.map(classify_many, [rows[i:i + step] for i in range(0, len(rows), step)])
+    return [cls for part in parts for cls in part]
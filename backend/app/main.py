@@ -7,6 +7,7 @@ from .db import init_db
 from .api import api_bp
 from .ingest import ingestion_loop
 from .classifier import classification_loop
+from .archive import archive_loop
 
 # Resolve the built frontend dist directory (populated by `npm run build`)
 _FRONTEND_DIST = os.path.abspath(
@@ -16,7 +17,7 @@ _FRONTEND_DIST = os.path.abspath(
 
 def create_app():
     app = Flask(__name__)
-    CORS(app)
+    CORS(app, expose_headers=["X-Next-Cursor"])
     app.register_blueprint(api_bp)
 
     # Serve the compiled React SPA if the dist folder exists.
@@ -43,6 +44,16 @@ def start_ingestion_thread():
     return t
 
 
+def start_archive_thread():
+    t = threading.Thread(
+        target=archive_loop,
+        daemon=True,
+        name="archive-thread",
+    )
+    t.start()
+    return t
+
+
 def start_classifier_thread():
     t = threading.Thread(
         target=classification_loop,
@@ -62,6 +73,7 @@ if __name__ == "__main__":
     # Background workers
     start_ingestion_thread()
     start_classifier_thread()
+    start_archive_thread()
 
     # Web API
     app = create_app()
@@ -0,0 +1,329 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+
+# ------------------------------------------------------------
+# Metrics registry (/api/admin/metrics)
+# ------------------------------------------------------------
+#
+# Counters and histograms are kept in process and rendered in the Prometheus
+# text exposition format on scrape. Recording is one uncontended lock and an
+# add (a histogram also bisects its bucket bounds), cheap enough for every
+# poll, write and request. Values that already exist elsewhere — cache hit
+# counters, queue depth — are not duplicated: a collector reads them at
+# scrape time instead.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds: 1 ms .. 30 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Labels, object] = {}
+        self._lock = threading.Lock()
+
+    def _unlabelled(self):
+        # created up front: exported as 0 before first use, and no lookup per call
+        if self.labelnames:
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return self._children.setdefault((), self._new_child())
+
+    def labels(self, *values: str):
+        """The child for one label combination (created on first use)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Labels, child) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        if not self.labelnames:
+            self.inc = self._unlabelled().inc
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # per bucket, last one is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        if not self.labelnames:
+            child = self._unlabelled()
+            self.observe = child.observe
+            self.time = child.time
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(
+                f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            )
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        # name -> (kind, help, reads); each read() returns current samples
+        self._collectors: Dict[str, Tuple[str, str, List[Callable[[], List[Sample]]]]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing  # module reloaded / imported twice
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def collector(
+        self, name: str, kind: str, help: str, read: Callable[[], List[Sample]]
+    ) -> None:
+        """
+        A gauge or counter whose samples are read from elsewhere on scrape.
+        Several modules may register reads under one name (one label set each).
+        """
+        with self._lock:
+            self._collectors.setdefault(name, (kind, help, []))[2].append(read)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        for name, (kind, help, reads) in collectors:
+            samples: List[Sample] = []
+            for read in list(reads):
+                try:
+                    samples.extend(read())
+                except Exception as e:
+                    print(f"[METRICS] collector {name} failed:", e)
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_text = _format_labels(list(labels), list(labels.values()))
+                lines.append(f"{name}{label_text} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+collector = REGISTRY.collector
+render = REGISTRY.render
+
+
+# ------------------------------------------------------------
+# Hot-path metrics (recorded where the work happens)
+# ------------------------------------------------------------
+
+POLL_LATENCY = histogram(
+    "overhead_poll_seconds", "Snapshot read from the site's source", ("site",)
+)
+POLL_ERRORS = counter(
+    "overhead_poll_errors_total", "Ingest cycles that raised (upstream or write)", ("site",)
+)
+SNAPSHOT_AIRCRAFT = histogram(
+    "overhead_snapshot_aircraft",
+    "Aircraft per logged snapshot",
+    ("site",),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+
+SBS_MESSAGES = counter(
+    "overhead_sbs_messages_total", "SBS-1 feed lines folded into the aircraft table", ("site",)
+)
+SBS_CONNECTS = counter(
+    "overhead_sbs_connects_total", "SBS-1 feed connections (reconnects included)", ("site",)
+)
+
+ENRICH_SECONDS = histogram("overhead_enrich_seconds", "adsbdb lookup latency", ("upstream",))
+ENRICH_LOOKUPS = counter(
+    "overhead_enrich_lookups_total",
+    "adsbdb lookups by outcome (found, missing, error)",
+    ("upstream", "result"),
+)
+
+WRITE_SECONDS = histogram("overhead_log_flights_seconds", "log_flights() snapshot write latency")
+WRITE_ROWS = counter("overhead_logged_rows_total", "Sightings written by log_flights()")
+POOL_TIMEOUTS = counter(
+    "overhead_db_pool_timeouts_total", "Connection borrows that gave up with every connection in use"
+)
+
+CLASSIFIER_SECONDS = histogram(
+    "overhead_classifier_pass_seconds", "Background classifier pass duration"
+)
+CLASSIFIER_ROWS = counter(
+    "overhead_classifier_rows_total",
+    "Rows read and changed by the background classifier",
+    ("result",),
+)
+
+HTTP_SECONDS = histogram(
+    "overhead_http_request_seconds", "API latency per route", ("route", "method")
+)
+HTTP_REQUESTS = counter(
+    "overhead_http_requests_total",
+    "API requests per route and status",
+    ("route", "method", "status"),
+)
+
+
+def cache_collectors(read_stats: Callable[[], Dict[str, Dict]]) -> None:
+    """
+    Exposes TTLCache.stats() dicts ({cache name: stats}) as lookup counters,
+    a hit ratio and an entry count, read on scrape.
+    """
+    def lookups() -> List[Sample]:
+        return [
+            ({"cache": name, "result": result}, stats[result])
+            for name, stats in read_stats().items()
+            for result in ("hits", "negative_hits", "misses")
+        ]
+
+    def ratios() -> List[Sample]:
+        return [({"cache": name}, s["hit_ratio"]) for name, s in read_stats().items()]
+
+    def sizes() -> List[Sample]:
+        return [({"cache": name}, s["size"]) for name, s in read_stats().items()]
+
+    collector("overhead_cache_lookups_total", "counter", "In-memory cache lookups by result", lookups)
+    collector("overhead_cache_hit_ratio", "gauge", "Lookups answered from memory (negative hits count)", ratios)
+    collector("overhead_cache_entries", "gauge", "Entries held", sizes)
@@ -0,0 +1,106 @@
+import queue
+import threading
+import time
+
+from .config import ENRICH_WORKERS, ENRICH_QUEUE_SIZE
+from .db import apply_aircraft_intel, apply_callsign_route
+from .enrich import fetch_aircraft_intel, fetch_callsign_route
+from .metrics import ENRICH_LOOKUPS, ENRICH_SECONDS, collector
+
+
+# ------------------------------------------------------------
+# Enrichment pipeline
+# ------------------------------------------------------------
+#
+# The ingest loop logs sightings straight away and hands cache misses to this
+# stage. Workers fetch from adsbdb, cache the answer and patch the events that
+# were logged without it, so poll cadence never waits on enrichment latency.
+
+AIRCRAFT = "aircraft"
+CALLSIGN = "callsign"
+
+_HANDLERS = {
+    AIRCRAFT: (fetch_aircraft_intel, apply_aircraft_intel),
+    CALLSIGN: (fetch_callsign_route, apply_callsign_route),
+}
+
+
+class EnrichmentPipeline:
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = max(1, workers)
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max(1, queue_size))
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(
+                    target=self._work,
+                    daemon=True,
+                    name=f"enrich-{i}",
+                )
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, kind: str, key: str) -> bool:
+        """
+        Queues a lookup unless the same one is already queued or running.
+        Returns False when it was coalesced or the queue is full; a dropped
+        lookup is simply retried on the next sighting.
+        """
+        if not key:
+            return False
+
+        job = (kind, key)
+        with self._lock:
+            if job in self._inflight:
+                return False
+            self._inflight.add(job)
+
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._inflight.discard(job)
+            return False
+
+        return True
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            kind, key = job
+            fetch, apply = _HANDLERS[kind]
+
+            try:
+                started = time.perf_counter()
+                result = fetch(key)
+                ENRICH_SECONDS.labels(kind).observe(time.perf_counter() - started)
+                # the fetchers return None on failure, {} when adsbdb has no record
+                outcome = "error" if result is None else "found" if result else "missing"
+                ENRICH_LOOKUPS.labels(kind, outcome).inc()
+                if result is not None:
+                    apply(key, result)  # {} is remembered as a negative entry
+            except Exception as e:
+                print(f"[ENRICH] {kind} {key} failed:", e)
+            finally:
+                with self._lock:
+                    self._inflight.discard(job)
+                self._queue.task_done()
+
+
+enrichment = EnrichmentPipeline(ENRICH_WORKERS, ENRICH_QUEUE_SIZE)
+collector(
+    "overhead_enrich_pending",
+    "gauge",
+    "Lookups queued or running",
+    lambda: [({}, enrichment.pending())],
+)
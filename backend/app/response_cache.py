@@ -0,0 +1,71 @@
+import hashlib
+from functools import wraps
+
+from flask import Response, make_response, request
+
+from .cache import TTLCache
+from .config import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS
+from .db import write_generation
+from .metrics import cache_collectors
+
+
+# ------------------------------------------------------------
+# API response cache
+# ------------------------------------------------------------
+#
+# Finished response bodies are kept per (path, query string, write
+# generation). While no write has landed, a repeat request is answered from
+# memory without running SQL or serializing JSON. The ETag is a hash of the
+# body, so a client revalidating with If-None-Match gets a bodyless 304 —
+# even across generations, as long as the body came out the same.
+
+responses = TTLCache(
+    "responses",
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+cache_collectors(lambda: {"responses": responses.stats()})
+
+
+def cached_response(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # read before running the view: rows committed after this point are
+        # newer than the key, never older
+        generation = write_generation()
+        key = (
+            request.path,
+            tuple(sorted(request.args.items(multi=True))),
+            generation,
+        )
+
+        entry = responses.get(key)
+        if entry:
+            body, mimetype, etag, extra = entry
+            cache_status = "hit"
+        else:
+            resp = make_response(view(*args, **kwargs))
+            if resp.status_code != 200:
+                return resp
+            body = resp.get_data()
+            mimetype = resp.mimetype
+            etag = hashlib.sha1(body).hexdigest()
+            # view-set metadata such as X-Next-Cursor travels with the body
+            extra = [(k, v) for k, v in resp.headers if k.startswith("X-")]
+            responses.put(key, (body, mimetype, etag, extra))
+            cache_status = "miss"
+
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            resp = Response(body, mimetype=mimetype)
+            resp.headers.extend(extra)
+
+        resp.set_etag(etag)
+        # let browsers keep the body but always revalidate it
+        resp.headers["Cache-Control"] = "no-cache"
+        resp.headers["X-Cache"] = cache_status
+        return resp
+
+    return wrapper
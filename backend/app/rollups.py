@@ -0,0 +1,467 @@
+"""
+Incrementally maintained aggregates behind the all-time /api/stats/* panels.
+
+rollup_groups holds one row per (site_id, dimension, value) — e.g. ("home",
+"operator", "Delta Air Lines") — with its event count, distinct aircraft count
+and altitude sum. rollup_members holds (site_id, dimension, value, aircraft)
+event counts, which is what lets the distinct aircraft count be maintained
+incrementally. Every event is counted twice, under its own site and under
+ALL_SITES ("*"): distinct aircraft cannot be summed across sites whose
+coverage overlaps.
+
+operator_codes counts the 3-letter callsign prefixes seen per operator, and
+operator_icao holds each operator's most frequent one (its likely ICAO code).
+
+Triggers on flights keep all of these current inside the same transaction as
+the event write, whichever path wrote it (log_flights, enrichment patches,
+the classifier). Rows deleted from flights are deliberately not subtracted:
+the rollups count every event ever logged. Run rebuild_rollups.py after
+editing flights by hand.
+"""
+
+from .config import ALL_SITES
+
+# ------------------------------------------------------------
+# Dimensions
+# ------------------------------------------------------------
+#
+# Expressions are written against "{r}", which becomes NEW / OLD inside the
+# triggers and the flights alias in a rebuild. A NULL value means the event
+# does not contribute to that dimension.
+
+AIRCRAFT_SQL = "COALESCE(NULLIF({r}.reg, ''), {r}.hex)"
+
+ALTITUDE_SQL = (
+    "CASE WHEN {r}.altitude_ft IS NOT NULL AND {r}.altitude_ft != 'ground' "
+    "THEN {r}.altitude_ft END"
+)
+
+ALTITUDE_BAND_SQL = """CASE
+        WHEN {r}.altitude_ft = 'ground' OR {r}.altitude_ft IS NULL THEN 'ground'
+        WHEN CAST({r}.altitude_ft AS INTEGER) < 10000 THEN 'low'
+        WHEN CAST({r}.altitude_ft AS INTEGER) BETWEEN 10000 AND 25000 THEN 'medium'
+        ELSE 'high'
+    END"""
+
+_ROUTE_SQL = (
+    "CASE WHEN {r}.origin_iata IS NOT NULL AND {r}.dest_iata IS NOT NULL "
+    "THEN {r}.origin_iata || '>' || {r}.dest_iata END"
+)
+
+# name: (value, label, detail, count distinct aircraft, sum altitude)
+DIMENSIONS = {
+    "total": ("''", "NULL", "NULL", True, True),
+    "classification": (
+        "COALESCE({r}.classification, 'unknown')", "NULL", "NULL", True, True,
+    ),
+    "operator": (
+        "COALESCE(NULLIF({r}.airline_name, ''), NULLIF({r}.owner, ''))",
+        "NULL", "NULL", True, False,
+    ),
+    "country": ("{r}.country_iso", "{r}.country", "NULL", True, False),
+    "type": (
+        "NULLIF({r}.type_code, '')", "{r}.model", "{r}.manufacturer", True, False,
+    ),
+    # label / detail carry the two airport codes for the airports join
+    "route": (_ROUTE_SQL, "{r}.origin_iata", "{r}.dest_iata", False, False),
+    # one row per (route, classification); label is the route value
+    "route_class": (
+        "CASE WHEN {r}.classification IS NOT NULL THEN "
+        + _ROUTE_SQL + " || '>' || {r}.classification END",
+        _ROUTE_SQL, "{r}.classification", False, False,
+    ),
+    "altitude_band": (ALTITUDE_BAND_SQL, "NULL", "NULL", False, False),
+}
+
+# the two rows every event is counted under
+SITE_KEYS = (f"'{ALL_SITES}'", "{r}.site_id")
+
+ROLLUP_TABLES_SQL = (
+    """
+    CREATE TABLE IF NOT EXISTS rollup_groups (
+        site_id TEXT NOT NULL,
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        label TEXT,
+        detail TEXT,
+        events INTEGER NOT NULL DEFAULT 0,
+        aircraft INTEGER NOT NULL DEFAULT 0,
+        alt_sum REAL NOT NULL DEFAULT 0,
+        alt_n INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (site_id, dimension, value)
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_rollup_groups_events
+    ON rollup_groups(site_id, dimension, events);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_members (
+        site_id TEXT NOT NULL,
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        aircraft TEXT NOT NULL,
+        events INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (site_id, dimension, value, aircraft)
+    ) WITHOUT ROWID;
+    """,
+)
+
+
+def _exprs(name: str, r: str):
+    value, label, detail, distinct, altitude = DIMENSIONS[name]
+    return (
+        value.format(r=r),
+        label.format(r=r),
+        detail.format(r=r),
+        AIRCRAFT_SQL.format(r=r) if distinct else None,
+        ALTITUDE_SQL.format(r=r) if altitude else None,
+    )
+
+
+def _add_sql(name: str, r: str, site: str) -> str:
+    value, label, detail, aircraft, altitude = _exprs(name, r)
+    site = site.format(r=r)
+    parts = []
+
+    if aircraft:
+        parts.append(f"""
+        INSERT INTO rollup_members (site_id, dimension, value, aircraft, events)
+        SELECT {site}, '{name}', {value}, {aircraft}, 1
+        WHERE {value} IS NOT NULL AND {aircraft} IS NOT NULL
+        ON CONFLICT (site_id, dimension, value, aircraft) DO UPDATE SET events = events + 1;""")
+        new_aircraft = (
+            f"COALESCE((SELECT events = 1 FROM rollup_members "
+            f"WHERE site_id = {site} AND dimension = '{name}' AND value = {value} "
+            f"AND aircraft = {aircraft}), 0)"
+        )
+    else:
+        new_aircraft = "0"
+
+    alt_sum = f"COALESCE({altitude}, 0)" if altitude else "0"
+    alt_n = f"(({altitude}) IS NOT NULL)" if altitude else "0"
+
+    parts.append(f"""
+        INSERT INTO rollup_groups (site_id, dimension, value, label, detail, events, aircraft, alt_sum, alt_n)
+        SELECT {site}, '{name}', {value}, {label}, {detail}, 1, {new_aircraft}, {alt_sum}, {alt_n}
+        WHERE {value} IS NOT NULL
+        ON CONFLICT (site_id, dimension, value) DO UPDATE SET
+            label = COALESCE(excluded.label, label),
+            detail = COALESCE(excluded.detail, detail),
+            events = events + 1,
+            aircraft = aircraft + excluded.aircraft,
+            alt_sum = alt_sum + excluded.alt_sum,
+            alt_n = alt_n + excluded.alt_n;""")
+    return "".join(parts)
+
+
+def _remove_sql(name: str, r: str, site: str) -> str:
+    value, _, _, aircraft, altitude = _exprs(name, r)
+    site = site.format(r=r)
+    key = f"site_id = {site} AND dimension = '{name}' AND value = {value}"
+    parts = []
+
+    if aircraft:
+        parts.append(f"""
+        UPDATE rollup_members SET events = events - 1
+        WHERE {key} AND aircraft = {aircraft};""")
+        gone_aircraft = (
+            f"COALESCE((SELECT events <= 0 FROM rollup_members "
+            f"WHERE {key} AND aircraft = {aircraft}), 0)"
+        )
+    else:
+        gone_aircraft = "0"
+
+    alt_sum = f"COALESCE({altitude}, 0)" if altitude else "0"
+    alt_n = f"(({altitude}) IS NOT NULL)" if altitude else "0"
+
+    parts.append(f"""
+        UPDATE rollup_groups SET
+            events = events - 1,
+            aircraft = aircraft - {gone_aircraft},
+            alt_sum = alt_sum - {alt_sum},
+            alt_n = alt_n - {alt_n}
+        WHERE {key};""")
+
+    if aircraft:
+        parts.append(f"""
+        DELETE FROM rollup_members
+        WHERE {key} AND aircraft = {aircraft}
+          AND events <= 0;""")
+
+    parts.append(f"""
+        DELETE FROM rollup_groups
+        WHERE {key} AND events <= 0;""")
+    return "".join(parts)
+
+
+def _changed_sql(name: str) -> str:
+    old = [e for e in _exprs(name, "OLD") if e] + ["OLD.site_id"]
+    new = [e for e in _exprs(name, "NEW") if e] + ["NEW.site_id"]
+    return "\n        OR ".join(f"({o}) IS NOT ({n})" for o, n in zip(old, new))
+
+
+def trigger_statements(name: str):
+    add = "".join(_add_sql(name, "NEW", site) for site in SITE_KEYS)
+    remove = "".join(_remove_sql(name, "OLD", site) for site in SITE_KEYS)
+    return (
+        f"DROP TRIGGER IF EXISTS rollup_{name}_insert;",
+        f"""
+        CREATE TRIGGER rollup_{name}_insert AFTER INSERT ON flights
+        BEGIN{add}
+        END;
+        """,
+        f"DROP TRIGGER IF EXISTS rollup_{name}_update;",
+        f"""
+        CREATE TRIGGER rollup_{name}_update AFTER UPDATE ON flights
+        WHEN {_changed_sql(name)}
+        BEGIN{remove}{add}
+        END;
+        """,
+    )
+
+
+# ------------------------------------------------------------
+# Operator ICAO codes
+# ------------------------------------------------------------
+
+OPERATOR_SQL = "COALESCE(NULLIF({r}.airline_name, ''), NULLIF({r}.owner, ''))"
+
+# an airline callsign starts with its ICAO designator: three letters, A-Z first
+PREFIX_SQL = (
+    "CASE WHEN LENGTH({r}.callsign) >= 3 "
+    "AND UNICODE(SUBSTR({r}.callsign, 1, 1)) BETWEEN 65 AND 90 "
+    "THEN SUBSTR({r}.callsign, 1, 3) END"
+)
+
+OPERATOR_CODES_TABLES_SQL = (
+    """
+    CREATE TABLE IF NOT EXISTS operator_codes (
+        operator TEXT NOT NULL,
+        prefix TEXT NOT NULL,
+        events INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (operator, prefix)
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS operator_icao (
+        operator TEXT PRIMARY KEY,
+        icao_code TEXT NOT NULL,
+        events INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    """,
+)
+
+
+def _operator_winner_sql(operator: str) -> str:
+    # re-picks one operator's winner: a seek over its few prefix rows
+    return f"""
+        DELETE FROM operator_icao
+        WHERE operator = {operator}
+          AND NOT EXISTS (SELECT 1 FROM operator_codes WHERE operator = {operator});
+        INSERT INTO operator_icao (operator, icao_code, events)
+        SELECT operator, prefix, events
+        FROM operator_codes
+        WHERE operator = {operator}
+        ORDER BY events DESC, prefix
+        LIMIT 1
+        ON CONFLICT (operator) DO UPDATE SET
+            icao_code = excluded.icao_code,
+            events = excluded.events;"""
+
+
+def operator_code_trigger_statements():
+    new_op, new_prefix = OPERATOR_SQL.format(r="NEW"), PREFIX_SQL.format(r="NEW")
+    old_op, old_prefix = OPERATOR_SQL.format(r="OLD"), PREFIX_SQL.format(r="OLD")
+
+    add = f"""
+        INSERT INTO operator_codes (operator, prefix, events)
+        SELECT {new_op}, {new_prefix}, 1
+        WHERE {new_op} IS NOT NULL AND {new_prefix} IS NOT NULL
+        ON CONFLICT (operator, prefix) DO UPDATE SET events = events + 1;"""
+
+    remove = f"""
+        UPDATE operator_codes SET events = events - 1
+        WHERE operator = {old_op} AND prefix = {old_prefix};
+        DELETE FROM operator_codes
+        WHERE operator = {old_op} AND prefix = {old_prefix} AND events <= 0;"""
+
+    return (
+        "DROP TRIGGER IF EXISTS operator_codes_insert;",
+        f"""
+        CREATE TRIGGER operator_codes_insert AFTER INSERT ON flights
+        WHEN {new_op} IS NOT NULL AND {new_prefix} IS NOT NULL
+        BEGIN{add}{_operator_winner_sql(new_op)}
+        END;
+        """,
+        "DROP TRIGGER IF EXISTS operator_codes_update;",
+        f"""
+        CREATE TRIGGER operator_codes_update AFTER UPDATE ON flights
+        WHEN ({old_op}) IS NOT ({new_op}) OR ({old_prefix}) IS NOT ({new_prefix})
+        BEGIN{remove}{_operator_winner_sql(old_op)}{add}{_operator_winner_sql(new_op)}
+        END;
+        """,
+    )
+
+
+# ------------------------------------------------------------
+# Install / rebuild
+# ------------------------------------------------------------
+
+def install_rollups(cur) -> None:
+    """Creates the rollup tables and (re)creates their triggers."""
+    for stmt in ROLLUP_TABLES_SQL:
+        cur.execute(stmt)
+    for name in DIMENSIONS:
+        for stmt in trigger_statements(name):
+            cur.execute(stmt)
+
+
+def install_operator_codes(cur) -> None:
+    """Creates operator_codes / operator_icao and (re)creates their triggers."""
+    for stmt in OPERATOR_CODES_TABLES_SQL:
+        cur.execute(stmt)
+    for stmt in operator_code_trigger_statements():
+        cur.execute(stmt)
+
+
+def rebuild_operator_codes(cur, source: str = "flights") -> None:
+    """Recomputes operator_codes and the operator_icao winners from source."""
+    operator, prefix = OPERATOR_SQL.format(r="f"), PREFIX_SQL.format(r="f")
+
+    cur.execute("DELETE FROM operator_codes;")
+    cur.execute("DELETE FROM operator_icao;")
+    cur.execute(f"""
+        INSERT INTO operator_codes (operator, prefix, events)
+        SELECT {operator}, {prefix}, COUNT(*)
+        FROM {source} AS f
+        WHERE {operator} IS NOT NULL AND {prefix} IS NOT NULL
+        GROUP BY 1, 2;
+    """)
+    cur.execute("""
+        INSERT INTO operator_icao (operator, icao_code, events)
+        SELECT operator, prefix, events
+        FROM (
+            SELECT
+                operator, prefix, events,
+                ROW_NUMBER() OVER (
+                    PARTITION BY operator ORDER BY events DESC, prefix
+                ) AS rank
+            FROM operator_codes
+        )
+        WHERE rank = 1;
+    """)
+
+
+def rebuild_rollups(cur, source: str = "flights") -> None:
+    """Recomputes every rollup from scratch out of source (a table or subquery)."""
+    cur.execute("DELETE FROM rollup_members;")
+    cur.execute("DELETE FROM rollup_groups;")
+
+    for name in DIMENSIONS:
+        value, label, detail, aircraft, altitude = _exprs(name, "f")
+
+        for site in SITE_KEYS:
+            site = site.format(r="f")
+
+            if aircraft:
+                cur.execute(f"""
+                    INSERT INTO rollup_members (site_id, dimension, value, aircraft, events)
+                    SELECT {site}, '{name}', {value}, {aircraft}, COUNT(*)
+                    FROM {source} AS f
+                    WHERE {value} IS NOT NULL AND {aircraft} IS NOT NULL
+                    GROUP BY 1, 3, 4;
+                """)
+
+            cur.execute(f"""
+                INSERT INTO rollup_groups (site_id, dimension, value, label, detail, events, aircraft, alt_sum, alt_n)
+                SELECT
+                    {site},
+                    '{name}',
+                    {value},
+                    MAX({label}),
+                    MAX({detail}),
+                    COUNT(*),
+                    {f"COUNT(DISTINCT {aircraft})" if aircraft else "0"},
+                    {f"COALESCE(SUM({altitude}), 0)" if altitude else "0"},
+                    {f"COUNT({altitude})" if altitude else "0"}
+                FROM {source} AS f
+                WHERE {value} IS NOT NULL
+                GROUP BY 1, 3;
+            """)
+
+
+# ------------------------------------------------------------
+# Schema version 3 (before sites)
+# ------------------------------------------------------------
+#
+# Migration 3 shipped the rollups keyed (dimension, value); version 9 carries
+# those rows over into the site-keyed tables above. The migration must keep
+# building that exact shape, so its DDL is frozen here rather than derived
+# from ROLLUP_TABLES_SQL. It installs no triggers: no step between 3 and 9
+# writes flights, and version 9 replaces whatever triggers a database has.
+
+PRESITE_ROLLUP_TABLES_SQL = (
+    """
+    CREATE TABLE IF NOT EXISTS rollup_groups (
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        label TEXT,
+        detail TEXT,
+        events INTEGER NOT NULL DEFAULT 0,
+        aircraft INTEGER NOT NULL DEFAULT 0,
+        alt_sum REAL NOT NULL DEFAULT 0,
+        alt_n INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dimension, value)
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_rollup_groups_events
+    ON rollup_groups(dimension, events);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_members (
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        aircraft TEXT NOT NULL,
+        events INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dimension, value, aircraft)
+    ) WITHOUT ROWID;
+    """,
+)
+
+
+def install_presite_rollups(cur) -> None:
+    """Creates the version-3 rollup tables and fills them from flights."""
+    for stmt in PRESITE_ROLLUP_TABLES_SQL:
+        cur.execute(stmt)
+    cur.execute("DELETE FROM rollup_members;")
+    cur.execute("DELETE FROM rollup_groups;")
+
+    for name in DIMENSIONS:
+        value, label, detail, aircraft, altitude = _exprs(name, "f")
+
+        if aircraft:
+            cur.execute(f"""
+                INSERT INTO rollup_members (dimension, value, aircraft, events)
+                SELECT '{name}', {value}, {aircraft}, COUNT(*)
+                FROM flights AS f
+                WHERE {value} IS NOT NULL AND {aircraft} IS NOT NULL
+                GROUP BY 2, 3;
+            """)
+
+        cur.execute(f"""
+            INSERT INTO rollup_groups (dimension, value, label, detail, events, aircraft, alt_sum, alt_n)
+            SELECT
+                '{name}',
+                {value},
+                MAX({label}),
+                MAX({detail}),
+                COUNT(*),
+                {f"COUNT(DISTINCT {aircraft})" if aircraft else "0"},
+                {f"COALESCE(SUM({altitude}), 0)" if altitude else "0"},
+                {f"COUNT({altitude})" if altitude else "0"}
+            FROM flights AS f
+            WHERE {value} IS NOT NULL
+            GROUP BY 2;
+        """)
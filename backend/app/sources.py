@@ -0,0 +1,328 @@
+import json
+import math
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .config import (
+    ADSB_LOL_BASE_URL,
+    RECEIVER_STALE_SECONDS,
+    SITE_SOURCES,
+    Site,
+)
+from .httpclient import get as http_get
+from .metrics import SBS_CONNECTS, SBS_MESSAGES
+
+
+# ------------------------------------------------------------
+# Ingestion sources
+# ------------------------------------------------------------
+#
+# A source answers "which aircraft are around this site right now" with
+# adsb.lol-shaped dicts (hex, r, flight, t, alt_baro, gs, track, lat, lon,
+# dst), so build_row() and everything after it — cached enrichment,
+# log_flights(), tracks — is the same whichever one a site uses:
+#
+#   adsb.lol           one REST request per poll (the default)
+#   aircraft.json      a local readsb / dump1090 JSON file or URL, read per poll
+#   sbs://host:port    a receiver's SBS-1 (BaseStation) TCP feed, read
+#                      continuously and aggregated per hex between polls
+#
+# Local receivers report everything they hear; positions are filtered to the
+# site's radius here, as adsb.lol does for a point query.
+
+ADSB_LOL_URL = f"{ADSB_LOL_BASE_URL}/closest"
+ADSB_LOL_POINT_URL = f"{ADSB_LOL_BASE_URL}/point"
+
+SBS_DEFAULT_PORT = 30003
+NM_PER_DEG_LAT = 60.0
+
+
+def distance_nm(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    # equirectangular: well inside a metre per nm at receiver ranges
+    dlat = (lat2 - lat1) * NM_PER_DEG_LAT
+    dlon = (lon2 - lon1) * NM_PER_DEG_LAT * math.cos(math.radians((lat1 + lat2) / 2))
+    return math.hypot(dlat, dlon)
+
+
+class Source:
+    kind = ""
+
+    def __init__(self, site: Site):
+        self.site = site
+
+    def start(self) -> None:
+        """Starts any background reader; a polled source has none."""
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Every aircraft inside the site's radius."""
+        raise NotImplementedError
+
+    def nearest(self) -> Optional[Dict[str, Any]]:
+        """The closest aircraft (INGEST_MODE=closest)."""
+        return min(self.snapshot(), key=lambda ac: ac["dst"], default=None)
+
+    def _in_range(self, ac: Dict[str, Any]) -> bool:
+        # sets dst, like adsb.lol, for aircraft with a position
+        lat, lon = ac.get("lat"), ac.get("lon")
+        if lat is None or lon is None:
+            return False
+        ac["dst"] = round(distance_nm(self.site.lat, self.site.lon, lat, lon), 3)
+        return ac["dst"] <= self.site.radius_nm
+
+
+# ------------------------------------------------------------
+# adsb.lol REST API
+# ------------------------------------------------------------
+
+class AdsbLolSource(Source):
+    kind = "adsb.lol"
+
+    def _url(self, base: str) -> str:
+        return f"{base}/{self.site.lat}/{self.site.lon}/{self.site.radius_nm}"
+
+    def nearest(self):
+        resp = http_get(self._url(ADSB_LOL_URL), timeout=10, retries=1)
+        resp.raise_for_status()
+        data = resp.json()
+
+        # adsb.lol sometimes returns { ac: [...] }
+        if isinstance(data, dict) and "ac" in data and data["ac"]:
+            return data["ac"][0]
+
+        # fallback shape
+        if isinstance(data, dict) and data.get("hex"):
+            return data
+
+        return None
+
+    def snapshot(self):
+        """Every aircraft inside the site's radius, in a single request."""
+        resp = http_get(self._url(ADSB_LOL_POINT_URL), timeout=10, retries=1)
+        resp.raise_for_status()
+        data = resp.json()
+
+        if isinstance(data, dict) and isinstance(data.get("ac"), list):
+            return [ac for ac in data["ac"] if isinstance(ac, dict) and ac.get("hex")]
+
+        return []
+
+
+# ------------------------------------------------------------
+# readsb / dump1090 aircraft.json
+# ------------------------------------------------------------
+
+class AircraftJsonSource(Source):
+    """
+    readsb already names its fields as adsb.lol does (it is what adsb.lol
+    runs); r / t are only present when readsb has its aircraft database.
+    """
+
+    kind = "aircraft.json"
+
+    def __init__(self, site: Site, location: str):
+        super().__init__(site)
+        self.location = location
+        self.remote = location.startswith(("http://", "https://"))
+
+    def _load(self) -> Dict[str, Any]:
+        if self.remote:
+            resp = http_get(self.location, timeout=5, retries=1)
+            resp.raise_for_status()
+            return resp.json()
+        with open(self.location, "rb") as f:
+            return json.load(f)
+
+    def snapshot(self):
+        data = self._load()
+        aircraft = data.get("aircraft") if isinstance(data, dict) else None
+        if not isinstance(aircraft, list):
+            return []
+
+        out = []
+        for ac in aircraft:
+            if not isinstance(ac, dict) or not ac.get("hex"):
+                continue
+            # age of the position, not of the last message: a fix is what
+            # places the aircraft inside the radius
+            if ac.get("seen_pos", ac.get("seen", 0)) > RECEIVER_STALE_SECONDS:
+                continue
+            if self._in_range(ac):
+                out.append(ac)
+        return out
+
+
+# ------------------------------------------------------------
+# SBS-1 / BaseStation TCP feed (dump1090 / readsb port 30003)
+# ------------------------------------------------------------
+#
+#   MSG,3,1,1,4CA2D6,1,2024/03/22,12:34:56.789,2024/03/22,12:34:56.789,,35000,,,53.12,-6.21,,,0,,0,0
+#
+# Each MSG line carries a few fields of one aircraft (type 1 the callsign,
+# 3 altitude and position, 4 speed and track, ...). A reader thread folds
+# them into one state row per hex as they arrive; a poll copies the rows out.
+# Lines stay bytes until a poll: most fields are overwritten many times
+# between two snapshots and only the last value is ever decoded.
+
+# field indexes in a MSG line
+_HEX, _CALLSIGN, _ALTITUDE, _SPEED, _TRACK, _LAT, _LON, _GROUND = 4, 10, 11, 12, 13, 14, 15, 21
+# state row slots (the last one is the monotonic time last heard)
+_STATE_FIELDS = (_CALLSIGN, _ALTITUDE, _SPEED, _TRACK, _LAT, _LON, _GROUND)
+_SEEN = len(_STATE_FIELDS)
+
+_RECONNECT_MAX_SECONDS = 30
+
+
+class SbsSource(Source):
+    kind = "sbs"
+
+    def __init__(self, site: Site, host: str, port: int):
+        super().__init__(site)
+        self.host = host
+        self.port = port
+        self._aircraft: Dict[bytes, list] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._messages = SBS_MESSAGES.labels(site.id)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, daemon=True, name=f"sbs-{self.site.id}"
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                with socket.create_connection((self.host, self.port), timeout=10) as sock:
+                    # a receiver with nothing overhead can be quiet for a while
+                    sock.settimeout(max(30.0, RECEIVER_STALE_SECONDS))
+                    SBS_CONNECTS.labels(self.site.id).inc()
+                    print(f"[INGEST] {self.site.id}: SBS feed connected ({self.host}:{self.port})")
+                    delay = 1.0
+                    self._read(sock)
+            except OSError as e:
+                print(f"[INGEST] {self.site.id}: SBS feed {self.host}:{self.port}:", e)
+
+            time.sleep(delay)
+            delay = min(delay * 2, _RECONNECT_MAX_SECONDS)
+
+    def _read(self, sock: socket.socket) -> None:
+        pending = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("feed closed")
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()  # partial line, completed by the next chunk
+            self.apply(lines)
+
+    def apply(self, lines: List[bytes], now: Optional[float] = None) -> int:
+        """Folds raw SBS lines into the per-hex state; returns how many applied."""
+        now = time.monotonic() if now is None else now
+        applied = 0
+        with self._lock:
+            aircraft = self._aircraft
+            for line in lines:
+                f = line.split(b",")
+                if len(f) < 22 or f[0] != b"MSG" or not f[_HEX]:
+                    continue
+                state = aircraft.get(f[_HEX])
+                if state is None:
+                    state = aircraft[f[_HEX]] = [None] * (_SEEN + 1)
+                for slot, field in enumerate(_STATE_FIELDS):
+                    if f[field]:
+                        state[slot] = f[field]
+                state[_SEEN] = now
+                applied += 1
+        self._messages.inc(applied)
+        return applied
+
+    def snapshot(self):
+        now = time.monotonic()
+        cutoff = now - RECEIVER_STALE_SECONDS
+        with self._lock:
+            # forget aircraft that went quiet, then copy the rest out
+            self._aircraft = {h: s for h, s in self._aircraft.items() if s[_SEEN] >= cutoff}
+            rows = list(self._aircraft.items())
+
+        out = []
+        for hex_, state in rows:
+            ac = _decode_state(hex_, state, now)
+            if ac is not None and self._in_range(ac):
+                out.append(ac)
+        return out
+
+
+def _number(raw: Optional[bytes]) -> Optional[float]:
+    # ints stay ints (altitude, mostly), as adsb.lol sends them
+    if not raw:
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        pass
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def _decode_state(hex_: bytes, state: list, now: float) -> Optional[Dict[str, Any]]:
+    callsign, altitude, speed, track, lat, lon, ground, seen = state
+    ac = {
+        "hex": hex_.decode("ascii", "replace").strip().lower(),
+        "flight": callsign.decode("ascii", "replace").strip() if callsign else None,
+        "alt_baro": _number(altitude),
+        "gs": _number(speed),
+        "track": _number(track),
+        "lat": _number(lat),
+        "lon": _number(lon),
+        "seen": round(now - seen, 1),
+    }
+    # "-1" (dump1090) or "1" means on the ground; the line may end in \r
+    if ground and ground.strip() in (b"-1", b"1"):
+        ac["alt_baro"] = "ground"
+    return ac if ac["hex"] else None
+
+
+# ------------------------------------------------------------
+# Per-site sources
+# ------------------------------------------------------------
+
+_sources: Dict[str, Source] = {}
+_sources_lock = threading.Lock()
+
+
+def _sbs_address(spec: str) -> Tuple[str, int]:
+    parts = urlsplit(spec)
+    if not parts.hostname:
+        raise ValueError(f"ingest source {spec!r}: expected sbs://host[:port]")
+    return parts.hostname, parts.port or SBS_DEFAULT_PORT
+
+
+def make_source(site: Site, spec: str) -> Source:
+    if spec == "adsb.lol":
+        return AdsbLolSource(site)
+    if spec.startswith("sbs://"):
+        return SbsSource(site, *_sbs_address(spec))
+    return AircraftJsonSource(site, spec)
+
+
+def source_for(site: Site) -> Source:
+    """The site's source (SITE_SOURCES), created and started on first use."""
+    source = _sources.get(site.id)
+    if source is None:
+        with _sources_lock:
+            source = _sources.get(site.id)
+            if source is None:
+                source = make_source(site, SITE_SOURCES.get(site.id, "adsb.lol"))
+                source.start()
+                _sources[site.id] = source
+    return source
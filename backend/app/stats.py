@@ -0,0 +1,500 @@
+"""
+Queries behind the /api/stats/* panels.
+
+Every panel is a function of a StatsSnapshot, which carries the cursor and the
+requested time windows. The single-panel routes build a snapshot per request;
+/api/stats/dashboard builds one inside a read transaction and computes every
+requested panel from it, so they all see the same committed data.
+
+All-time panels read the rollup tables (see rollups.py). The short-window
+panels — summary-24h, hourly and the count_24h column of
+classification-detailed — share one range scan over idx_flights_last_seen.
+Window cutoffs are computed in local time, matching how last_seen is stored.
+
+Those windows never reach past the hot table's retention (see archive.py).
+The two panels that can — top-aircraft (all time) and activity-by-day with a
+long ?days — also read the archive partitions their range overlaps.
+
+A snapshot is for one observer site, or for all of them (ALL_SITES, the
+default): rollup reads pick that site's rows, flights reads add a site_id
+filter.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from . import archive
+from .config import ALL_SITES
+
+
+DEFAULT_HOURS = 24
+DEFAULT_DAYS = 7
+MAX_HOURS = 24 * 30
+MAX_DAYS = 365
+
+
+class StatsSnapshot:
+    def __init__(
+        self,
+        cur,
+        hours: int = DEFAULT_HOURS,
+        days: int = DEFAULT_DAYS,
+        route_range: str = "all",
+        site: Optional[str] = None,
+    ):
+        self.cur = cur
+        self.hours = min(max(1, hours), MAX_HOURS)
+        self.days = min(max(1, days), MAX_DAYS)
+        self.route_range = route_range
+        self.site = site or ALL_SITES
+        # appended to a flights WHERE clause; empty for all sites
+        self.site_filter = "" if self.site == ALL_SITES else "AND site_id = ?"
+        self.site_params = () if self.site == ALL_SITES else (self.site,)
+        self._window: Optional[Dict[str, Any]] = None
+
+    def since(self, **delta) -> str:
+        # last_seen is stored as local-time ISO text, so the cutoff is too
+        return (datetime.now() - timedelta(**delta)).isoformat(timespec="seconds")
+
+    def window(self) -> Dict[str, Any]:
+        """One pass over the last `hours` of events, aggregated in Python."""
+        if self._window is not None:
+            return self._window
+
+        self.cur.execute(
+            f"""
+            SELECT
+                COALESCE(classification, 'unknown') AS classification,
+                COALESCE(NULLIF(reg, ''), hex) AS aircraft,
+                COALESCE(NULLIF(airline_name, ''), NULLIF(owner, '')) AS operator,
+                SUBSTR(last_seen, 12, 2) AS hour
+            FROM flights
+            WHERE last_seen >= ? {self.site_filter};
+            """,
+            (self.since(hours=self.hours), *self.site_params),
+        )
+
+        events = 0
+        aircraft = set()
+        operators = set()
+        classifications: Counter = Counter()
+        hourly: Counter = Counter()
+
+        for r in self.cur:
+            events += 1
+            hourly[r["hour"]] += 1
+            classifications[r["classification"]] += 1
+            if r["aircraft"] is not None:
+                aircraft.add(r["aircraft"])
+            if r["operator"] is not None:
+                operators.add(r["operator"])
+
+        self._window = {
+            "events": events,
+            "aircraft": len(aircraft),
+            "operators": len(operators),
+            "classifications": classifications,
+            "hourly": hourly,
+        }
+        return self._window
+
+    def rows(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        self.cur.execute(sql, params)
+        return [dict(r) for r in self.cur.fetchall()]
+
+
+# ------------------------------------------------------------
+# All-time panels (rollups)
+# ------------------------------------------------------------
+
+def summary(snap: StatsSnapshot) -> Dict[str, Any]:
+    return snap.rows("""
+        SELECT
+          COALESCE(t.events, 0) AS total_events,
+          COALESCE(t.aircraft, 0) AS unique_aircraft,
+
+          (SELECT COUNT(*) FROM rollup_groups
+           WHERE site_id = :site AND dimension = 'operator') AS operators,
+
+          (SELECT COUNT(*) FROM rollup_groups
+           WHERE site_id = :site AND dimension = 'country') AS countries,
+
+          CAST(t.alt_sum / NULLIF(t.alt_n, 0) AS INTEGER) AS avg_altitude
+        FROM (SELECT 1)
+        LEFT JOIN rollup_groups t
+          ON t.site_id = :site AND t.dimension = 'total' AND t.value = '';
+    """, {"site": snap.site})[0]
+
+
+def classification(snap: StatsSnapshot) -> List[Dict[str, Any]]:
+    return snap.rows("""
+        SELECT
+          value AS classification,
+          events AS count
+        FROM rollup_groups
+        WHERE site_id = ? AND dimension = 'classification'
+        ORDER BY value;
+    """, (snap.site,))
+
+
+def classification_detailed(snap: StatsSnapshot) -> List[Dict[str, Any]]:
+    rows = snap.rows("""
+        SELECT
+            value AS classification,
+            events AS total_count,
+            aircraft AS unique_aircraft,
+            CAST(alt_sum / NULLIF(alt_n, 0) AS INTEGER) AS avg_altitude
+        FROM rollup_groups
+        WHERE site_id = ? AND dimension = 'classification'
+        ORDER BY events DESC;
+    """, (snap.site,))
+    recent = snap.window()["classifications"]
+    for row in rows:
+        row["count_24h"] = recent.get(row["classification"], 0)
+    return rows
+
+
+_TOP_AIRCRAFT_SQL = """
+    SELECT
+      id,
+      reg,
+      model,
+      type_code,
+      COALESCE(airline_name, owner) AS operator,
+      country_iso,
+      times_seen,
+      classification,
+      manufacturer
+    FROM flights
+    WHERE reg IS NOT NULL {site_filter}
+    ORDER BY times_seen DESC, id DESC;
+"""
+
+
+def _top_events_per_reg(cur, snap: StatsSnapshot, n: int = 10) -> List[Dict[str, Any]]:
+    # walk idx_flights_times_seen from the top and keep the first event per
+    # reg, rather than grouping the whole table; ties go to the newest id, as
+    # in archived_aircraft
+    rows = []
+    seen = set()
+    sql = _TOP_AIRCRAFT_SQL.format(site_filter=snap.site_filter)
+    for r in cur.execute(sql, snap.site_params):
+        if r["reg"] in seen:
+            continue
+        seen.add(r["reg"])
+        rows.append(dict(r))
+        if len(rows) == n:
+            break
+    return rows
+
+
+_TOP_ARCHIVED_AIRCRAFT_SQL = """
+    SELECT
+      flight_id AS id,
+      reg,
+      model,
+      type_code,
+      operator,
+      country_iso,
+      times_seen,
+      classification,
+      manufacturer,
+      last_seen
+    FROM archived_aircraft
+    WHERE site_id = ?
+    ORDER BY times_seen DESC, flight_id DESC
+    LIMIT 10;
+"""
+
+
+def top_aircraft(snap: StatsSnapshot) -> List[Dict[str, Any]]:
+    cur = snap.cur
+
+    # All-time: the archive job keeps each aircraft's best archived event in
+    # archived_aircraft, so its top 10 stands in for every partition's.
+    candidates = _top_events_per_reg(cur, snap)
+    candidates += snap.rows(_TOP_ARCHIVED_AIRCRAFT_SQL, (snap.site,))
+
+    # ties keep the index order: newest id first
+    rows = []
+    seen = set()
+    for r in sorted(candidates, key=lambda r: (r["times_seen"], r["id"]), reverse=True):
+        if r["reg"] not in seen:
+            seen.add(r["reg"])
+            rows.append(r)
+    rows = rows[:10]
+
+    last_seen_sql = (
+        f"SELECT MAX(last_seen) AS last_seen FROM flights WHERE reg = ? {snap.site_filter};"
+    )
+    for row in rows:
+        del row["id"]
+        archived_last_seen = row.pop("last_seen", None)
+        cur.execute(last_seen_sql, (row["reg"], *snap.site_params))
+        # hot events are always newer than archived ones
+        row["last_seen"] = cur.fetchone()[0] or archived_last_seen
+
+    return rows
+
+
+def top_operators(snap: StatsSnapshot) -> List[Dict[str, Any]]:
+    return snap.rows("""
+        SELECT
+          g.value AS operator,
+          g.events AS total_events,
+          g.aircraft AS unique_aircraft,
+          c.icao_code
+        FROM rollup_groups g
+        LEFT JOIN operator_icao c ON c.operator = g.value
+        WHERE g.site_id = ? AND g.dimension = 'operator'
+        ORDER BY g.events DESC
+        LIMIT 10;
+    """, (snap.site,))
+
+
+def countries(snap: StatsSnapshot) -> List[Dict[str, Any]]:
+    return snap.rows("""
+        SELECT
+          value AS country_iso,
+          label AS country,
+          aircraft AS aircraft_count,
+          events AS event_count
+        FROM rollup_groups
+        WHERE site_id = ? AND dimension = 'country'
+        ORDER BY events DESC;
+    """, (snap.site,))
+
+
+def routes(snap: StatsSnapshot) -> List[Dict[str, Any]]:
+    return snap.rows("""
+        SELECT
+          r.label AS origin_iata,
+          r.detail AS dest_iata,
+          r.events AS event_count,
+          o.city AS origin_city,
+          o.country AS origin_country,
+          d.city AS dest_city,
+          d.country AS dest_country,
+          o.latitude AS origin_lat,
+          o.longitude AS origin_lon,
+          d.latitude AS dest_lat,
+          d.longitude AS dest_lon
+        FROM rollup_groups r
+        LEFT JOIN airports o ON r.label = o.iata_code
+        LEFT JOIN airports d ON r.detail = d.iata_code
+        WHERE r.site_id = ?
+          AND r.dimension = 'route'
+          AND r.events >= 2
+        ORDER BY r.events DESC
+        LIMIT 10;
+    """, (snap.site,))
+
+
+def altitude_distribution(snap: StatsSnapshot) -> List[Dict[str, Any]]:
+    return snap.rows("""
+        SELECT
+            value AS altitude_band,
+            events AS count
+        FROM rollup_groups
+        WHERE site_id = ? AND dimension = 'altitude_band'
+        ORDER BY
+            CASE value
+                WHEN 'ground' THEN 0
+                WHEN 'low' THEN 1
+                WHEN 'medium' THEN 2
+                WHEN 'high' THEN 3
+            END;
+    """, (snap.site,))
+
+
+def aircraft_types(snap: StatsSnapshot) -> List[Dict[str, Any]]:
+    return snap.rows("""
+        SELECT
+            value AS type_code,
+            label AS model,
+            detail AS manufacturer,
+            events AS event_count,
+            aircraft AS unique_aircraft
+        FROM rollup_groups
+        WHERE site_id = ? AND dimension = 'type'
+        ORDER BY events DESC
+        LIMIT 15;
+    """, (snap.site,))
+
+
+def routes_map(snap: StatsSnapshot) -> List[Dict[str, Any]]:
+    if snap.route_range == "week":
+        top_routes = f"""
+            SELECT
+                origin_iata,
+                dest_iata,
+                COUNT(*) AS flight_count,
+                GROUP_CONCAT(DISTINCT classification) AS classifications
+            FROM flights
+            WHERE last_seen >= ?
+              AND origin_iata IS NOT NULL
+              AND dest_iata IS NOT NULL
+              {snap.site_filter}
+            GROUP BY origin_iata, dest_iata
+            HAVING flight_count >= 2
+            ORDER BY flight_count DESC
+            LIMIT 12
+        """
+    else:
+        # route_class rows are keyed "<route>>classification", so each
+        # route's classifications are a primary-key prefix range
+        top_routes = """
+            SELECT
+                r.label AS origin_iata,
+                r.detail AS dest_iata,
+                r.events AS flight_count,
+                (SELECT GROUP_CONCAT(c.detail)
+                 FROM rollup_groups c
+                 WHERE c.site_id = r.site_id
+                   AND c.dimension = 'route_class'
+                   AND c.value > r.value || '>'
+                   AND c.value < r.value || '?'
+                   AND c.label = r.value
+                ) AS classifications
+            FROM rollup_groups r
+            WHERE r.site_id = ?
+              AND r.dimension = 'route'
+              AND r.events >= 2
+            ORDER BY r.events DESC
+            LIMIT 12
+        """
+
+    if snap.route_range == "week":
+        params = (snap.since(days=7), *snap.site_params)
+    else:
+        params = (snap.site,)
+    return snap.rows(f"""
+        SELECT
+            f.origin_iata,
+            f.dest_iata,
+            f.flight_count,
+            o.latitude AS origin_lat,
+            o.longitude AS origin_lon,
+            o.city AS origin_city,
+            o.country AS origin_country,
+            d.latitude AS dest_lat,
+            d.longitude AS dest_lon,
+            d.city AS dest_city,
+            d.country AS dest_country,
+            f.classifications
+        FROM ({top_routes}) f
+        JOIN airports o ON f.origin_iata = o.iata_code
+        JOIN airports d ON f.dest_iata = d.iata_code;
+    """, params)
+
+
+# ------------------------------------------------------------
+# Windowed panels (range seeks over last_seen)
+# ------------------------------------------------------------
+
+def summary_24h(snap: StatsSnapshot) -> Dict[str, Any]:
+    window = snap.window()
+    return {
+        "events_24h": window["events"],
+        "aircraft_24h": window["aircraft"],
+        "operators_24h": window["operators"],
+    }
+
+
+def hourly(snap: StatsSnapshot) -> List[Dict[str, Any]]:
+    counts = snap.window()["hourly"]
+    return [{"hour": hour, "events": counts[hour]} for hour in sorted(counts)]
+
+
+def activity_by_day(snap: StatsSnapshot) -> List[Dict[str, Any]]:
+    sql = f"""
+        SELECT
+            CASE CAST(strftime('%w', last_seen) AS INTEGER)
+                WHEN 0 THEN 'Sun'
+                WHEN 1 THEN 'Mon'
+                WHEN 2 THEN 'Tue'
+                WHEN 3 THEN 'Wed'
+                WHEN 4 THEN 'Thu'
+                WHEN 5 THEN 'Fri'
+                WHEN 6 THEN 'Sat'
+            END as day_name,
+            CAST(strftime('%w', last_seen) AS INTEGER) as day_num,
+            COUNT(*) as events
+        FROM flights
+        WHERE last_seen >= ? {snap.site_filter}
+        GROUP BY day_num
+        ORDER BY day_num;
+    """
+    since = snap.since(days=snap.days)
+    params = (since, *snap.site_params)
+    rows = snap.rows(sql, params)
+
+    # windows longer than the hot retention add the archived days
+    archived = archive.fetch(snap.cur, sql, params, since=since)
+    if not archived:
+        return rows
+
+    days = {r["day_num"]: r for r in rows}
+    for r in archived:
+        if r["day_num"] in days:
+            days[r["day_num"]]["events"] += r["events"]
+        else:
+            days[r["day_num"]] = r
+    return [days[d] for d in sorted(days)]
+
+
+def recent_notable(snap: StatsSnapshot) -> List[Dict[str, Any]]:
+    return snap.rows(f"""
+        SELECT
+            callsign,
+            reg,
+            classification,
+            COALESCE(airline_name, owner) as operator,
+            type_code,
+            model,
+            altitude_ft,
+            last_seen,
+            times_seen,
+            country_iso
+        FROM flights
+        WHERE (classification IN ('government', 'cargo') OR times_seen >= 5)
+          {snap.site_filter}
+        ORDER BY last_seen DESC
+        LIMIT 20;
+    """, snap.site_params)
+
+
+# name (as in /api/stats/<name>) -> panel
+PANELS = {
+    "summary": summary,
+    "summary-24h": summary_24h,
+    "classification": classification,
+    "classification-detailed": classification_detailed,
+    "hourly": hourly,
+    "top-aircraft": top_aircraft,
+    "top-operators": top_operators,
+    "countries": countries,
+    "routes": routes,
+    "routes-map": routes_map,
+    "altitude-distribution": altitude_distribution,
+    "aircraft-types": aircraft_types,
+    "activity-by-day": activity_by_day,
+    "recent-notable": recent_notable,
+}
+
+# what the Stats page shows; the route map fetches routes-map itself
+DASHBOARD_PANELS = (
+    "summary",
+    "summary-24h",
+    "classification-detailed",
+    "hourly",
+    "top-aircraft",
+    "top-operators",
+    "countries",
+    "routes",
+    "altitude-distribution",
+    "aircraft-types",
+    "activity-by-day",
+    "recent-notable",
+)
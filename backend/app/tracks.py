@@ -0,0 +1,243 @@
+import struct
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .cache import TTLCache
+from .config import EVENT_WINDOW_MINUTES, TRACK_MIN_INTERVAL_SECONDS
+from .metrics import cache_collectors
+
+
+# ------------------------------------------------------------
+# Per-event position tracks
+# ------------------------------------------------------------
+#
+# flights keeps only an event's latest telemetry. flight_tracks keeps every
+# sample, one row per event, as a packed blob:
+#
+#   HEADER   the first sample, absolute
+#   RECORD*  each later sample as deltas from the one before it
+#
+# Values are scaled integers (SCALES). A record is 14 bytes: dt plus six int16
+# deltas. A jump that does not fit — a long gap, a revisit hours later — is
+# split across continuation records (dt's top bit set), which the decoder
+# folds into the next sample. Appending is a blob concatenation (cast back:
+# SQLite's || yields TEXT), never a decode.
+#
+# `tail` is the last absolute sample (a HEADER) followed by the records not
+# yet moved into `data`; the full track is data plus tail's records. A sample
+# rewrites only the small tail, and every TAIL_FLUSH_RECORDS records the tail
+# moves into data in one concatenation — appending straight onto data would
+# rewrite the whole blob each sample, quadratic in the track's length. The
+# last sample is also cached in memory for events still being tracked.
+#
+# A value missing from a sighting repeats the previous one ("ground" counts as
+# 0 ft); sightings without a position are not recorded.
+
+FIELDS = ("lat", "lon", "altitude_ft", "ground_speed_kt", "distance_nm", "heading_deg")
+SCALES = (1e5, 1e5, 1, 10, 10, 10)
+
+HEADER = struct.Struct("<I6i")  # t (s since started_at) + absolute values
+RECORD = struct.Struct("<H6h")  # dt + deltas
+
+CONTINUATION = 0x8000
+MAX_DT = 0x7FFF
+MAX_DELTA = 0x7FFF
+HEADING_TURN = 3600  # heading_deg * 10 wraps here
+TAIL_FLUSH_RECORDS = 64  # ~900-byte tail: stays in the row, data is rewritten 1/64 as often
+
+Sample = Tuple[int, ...]  # (t, *scaled values)
+
+_tails = TTLCache("tracks", 4096, EVENT_WINDOW_MINUTES * 60, 0)
+cache_collectors(lambda: {"tracks": _tails.stats()})
+
+
+# ------------------------------------------------------------
+# Encoding
+# ------------------------------------------------------------
+
+def _scaled(row: Dict[str, Any], previous: Optional[Sample]) -> Optional[Tuple[int, ...]]:
+    if row.get("lat") is None or row.get("lon") is None:
+        return None
+
+    values = []
+    for i, (field, scale) in enumerate(zip(FIELDS, SCALES)):
+        value = row.get(field)
+        if value == "ground":
+            value = 0
+        try:
+            values.append(int(round(float(value) * scale)))
+        except (TypeError, ValueError):
+            values.append(previous[i + 1] if previous else 0)
+    return tuple(values)
+
+
+def _deltas(previous: Sample, sample: Sample) -> List[int]:
+    deltas = [b - a for a, b in zip(previous, sample)]
+    # shortest way round the compass
+    deltas[-1] = (deltas[-1] + HEADING_TURN // 2) % HEADING_TURN - HEADING_TURN // 2
+    return deltas
+
+
+def encode_step(previous: Sample, sample: Sample) -> bytes:
+    """Record(s) taking previous to sample."""
+    dt, *deltas = _deltas(previous, sample)
+    out = []
+    while dt > MAX_DT or any(abs(d) > MAX_DELTA for d in deltas):
+        part_dt = min(dt, MAX_DT)
+        parts = [max(-MAX_DELTA, min(MAX_DELTA, d)) for d in deltas]
+        out.append(RECORD.pack(part_dt | CONTINUATION, *parts))
+        dt -= part_dt
+        deltas = [d - p for d, p in zip(deltas, parts)]
+    out.append(RECORD.pack(dt, *deltas))
+    return b"".join(out)
+
+
+def joined(data: bytes, tail: bytes) -> bytes:
+    """The whole track: data plus the records still held in tail."""
+    return data + tail[HEADER.size:]
+
+
+def decode(data: bytes) -> Iterator[Sample]:
+    """Every stored sample, in order, as scaled integers."""
+    if len(data) < HEADER.size:
+        return
+    sample = list(HEADER.unpack_from(data))
+    yield tuple(sample)
+
+    for dt, *deltas in RECORD.iter_unpack(data[HEADER.size:]):
+        sample[0] += dt & MAX_DT
+        for i, d in enumerate(deltas, start=1):
+            sample[i] += d
+        sample[-1] %= HEADING_TURN
+        if not dt & CONTINUATION:
+            yield tuple(sample)
+
+
+# ------------------------------------------------------------
+# Schema and writes (inside log_flights' transaction)
+# ------------------------------------------------------------
+
+def install_tracks(cur, schema: str = "main") -> None:
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {schema}.flight_tracks (
+            flight_id INTEGER PRIMARY KEY,
+            started_at TEXT NOT NULL,
+            points INTEGER NOT NULL,
+            tail BLOB NOT NULL,
+            data BLOB NOT NULL
+        );
+        """
+    )
+
+
+def _tail(cur, flight_id: int, staged: Dict[int, Tuple[str, Sample]]):
+    if flight_id in staged:
+        return staged[flight_id]
+    cached = _tails.get(flight_id)
+    if cached:
+        return cached
+    cur.execute("SELECT started_at, tail FROM flight_tracks WHERE flight_id = ?;", (flight_id,))
+    found = cur.fetchone()
+    if found is None:
+        return None
+    return found["started_at"], HEADER.unpack_from(found["tail"])
+
+
+def append_sample(
+    cur,
+    flight_id: int,
+    row: Dict[str, Any],
+    staged: Dict[int, Tuple[str, Sample]],
+) -> None:
+    """
+    Adds row's telemetry to the event's track. The new tail goes into
+    staged; publish_tails() makes it visible once the transaction commits.
+    """
+    seen_at = row["seen_at"]
+    tail = _tail(cur, flight_id, staged)
+
+    if tail is None:
+        values = _scaled(row, None)
+        if values is None:
+            return
+        sample = (0,) + values
+        packed = HEADER.pack(*sample)
+        cur.execute(
+            """
+            INSERT OR REPLACE INTO flight_tracks (flight_id, started_at, points, tail, data)
+            VALUES (?, ?, 1, ?, ?);
+            """,
+            (flight_id, seen_at, packed, packed),
+        )
+        staged[flight_id] = (seen_at, sample)
+        return
+
+    started_at, previous = tail
+    t = int((datetime.fromisoformat(seen_at) - datetime.fromisoformat(started_at)).total_seconds())
+    if t - previous[0] < max(TRACK_MIN_INTERVAL_SECONDS, 1):
+        return  # same poll again, or inside the downsampling interval
+    values = _scaled(row, previous)
+    if values is None:
+        return
+    sample = (t,) + values
+
+    # SET expressions all see the old row, so data takes the old tail's
+    # records before tail is reset to the new header
+    cur.execute(
+        """
+        UPDATE flight_tracks
+        SET points = points + 1,
+            data = CASE WHEN length(tail) >= :flush
+                        THEN CAST(data || substr(tail, :records) || :step AS BLOB)
+                        ELSE data END,
+            tail = CASE WHEN length(tail) >= :flush
+                        THEN :header
+                        ELSE CAST(:header || substr(tail, :records) || :step AS BLOB) END
+        WHERE flight_id = :flight_id;
+        """,
+        {
+            "flush": HEADER.size + TAIL_FLUSH_RECORDS * RECORD.size,
+            "records": HEADER.size + 1,
+            "header": HEADER.pack(*sample),
+            "step": encode_step(previous, sample),
+            "flight_id": flight_id,
+        },
+    )
+    staged[flight_id] = (started_at, sample)
+
+
+def publish_tails(staged: Dict[int, Tuple[str, Sample]]) -> None:
+    for flight_id, tail in staged.items():
+        _tails.put(flight_id, tail)
+
+
+# ------------------------------------------------------------
+# Reads
+# ------------------------------------------------------------
+
+def to_columns(
+    started_at: str, data: bytes, max_points: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Decoded track (data as joined() returns it) as parallel arrays (no
+    per-point objects): seconds since started_at plus one array per field.
+    max_points thins it evenly, always keeping the last sample.
+    """
+    samples = list(decode(data))
+    total = len(samples)
+    if max_points and total > max_points:
+        step = total / max_points
+        keep = [samples[int(i * step)] for i in range(max_points - 1)]
+        samples = keep + [samples[-1]]
+
+    columns = list(zip(*samples)) if samples else [()] * (len(FIELDS) + 1)
+    out: Dict[str, Any] = {
+        "started_at": started_at,
+        "points": total,
+        "returned": len(samples),
+        "t": list(columns[0]),
+    }
+    for field, scale, values in zip(FIELDS, SCALES, columns[1:]):
+        out[field] = [v / scale for v in values] if scale != 1 else list(values)
+    return out
@@ -0,0 +1 @@
+"""Offline benchmarks; run from backend/ as `python -m benchmarks.<name>`."""
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: the compiled, memoized classifier (app/classification.py)
+against the rule function it replaced, on synthetic rows.
+
+    cd backend
+    python -m benchmarks.classify            # 1,000,000 rows
+    python -m benchmarks.classify --rows 200000 --seed 7
+    python -m benchmarks.classify --backfill-workers 4
+
+Every row is also checked to get the same answer from both implementations.
+--backfill-workers N also times the backfill job's chunk loop (app/jobs.py)
+classifying in its own thread against an N-process pool, pool start-up
+included.
+"""
+
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from app import classification, jobs
+from app.classification import classify_flight, classify_key, classify_many
+from app.config import BACKFILL_CHUNK_SIZE
+
+
+# ------------------------------------------------------------
+# Synthetic rows
+# ------------------------------------------------------------
+#
+# Drawn from small pools so combinations repeat the way they do in a real
+# log (the same airlines and owners all day), with some unique owners mixed
+# in so the memo cache also sees misses.
+
+AIRLINES = [
+    "", "", "", "Delta Air Lines", "United Airlines", "American Airlines",
+    "Southwest Airlines", "FedEx", "UPS Airlines", "Atlas Air", "Air Canada",
+]
+OWNERS = [
+    "", "", "United States Air Force", "Netjets Sales Inc", "Wells Fargo Trust",
+    "Flexjet LLC", "Kalitta Charters", "Michigan State Police", "Skyline Aviation LLC",
+    "Acme Holdings", "Express Logistics", "Delta Air Lines Inc", "John Smith",
+    "Private Jet Management", "Wheels Up Partners",
+]
+CALLSIGN_PREFIXES = [
+    "DAL", "UAL", "AAL", "SWA", "FDX", "UPS", "GTI", "ACA", "RCH", "SAM",
+    "EJA", "LXJ", "N", "N", "N", "REACH", "CONVOY", "EXEC",
+]
+TYPE_CODES = [
+    "", "B738", "A320", "A321", "B763", "B744", "MD11", "C172", "PA28",
+    "GLF4", "CL35", "E55P", "PC12", "C56X", "B39M", "E75L",
+]
+
+
+def synthetic_rows(n: int, seed: int) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        owner = rnd.choice(OWNERS)
+        if rnd.random() < 0.02:
+            owner = f"Owner {rnd.randrange(50000)} LLC"
+        rows.append({
+            "airline_name": rnd.choice(AIRLINES),
+            "owner": owner,
+            "callsign": f"{rnd.choice(CALLSIGN_PREFIXES)}{rnd.randrange(10, 9999)}",
+            "type_code": rnd.choice(TYPE_CODES),
+            "reg": f"N{rnd.randrange(100, 99999)}",
+        })
+    return rows
+
+
+# ------------------------------------------------------------
+# The rule function before it was compiled (kept verbatim)
+# ------------------------------------------------------------
+
+def legacy_classify_flight(row: Dict[str, Any]) -> str:
+    """
+    Returns one of: commercial | private | government | cargo | unknown
+    Uses only fields we already store: airline_name, owner, callsign, type_code, reg, country, etc.
+    """
+    airline = (row.get("airline_name") or "").strip().lower()
+    owner = (row.get("owner") or "").strip().lower()
+    callsign = (row.get("callsign") or "").strip().upper()
+    type_code = (row.get("type_code") or "").strip().upper()
+    reg = (row.get("reg") or "").strip().upper()
+
+    # ============================================================
+    # GOVERNMENT / MILITARY (highest priority - most specific)
+    # ============================================================
+
+    gov_owner_terms = [
+        "air force", "usaf", "navy", "army", "marines", "government",
+        "homeland", "state dept", "department of", "police", "sheriff",
+        "coast guard", "national guard", "royal air force", "raf",
+        "us marshal", "dhs", "customs", "border patrol", "fbi",
+        "military", "defense", "armed forces", "ministry of defence",
+    ]
+    if any(t in owner for t in gov_owner_terms):
+        return "government"
+
+    # Military callsign prefixes (US and international)
+    gov_callsign_prefixes = (
+        "RCH", "SAM", "MC", "AF", "NAVY", "ARMY", "AE", "EVAC",
+        "BOXER", "REACH", "SPAR", "VENUS", "EXEC", "PAT",
+        "CNV", "SHAMU", "CONVOY", "TEAL"
+    )
+    if callsign.startswith(gov_callsign_prefixes):
+        return "government"
+
+    # Military registration prefixes
+    if reg.startswith(("N", "AF", "166", "167", "168", "169")):
+        # US military aircraft often have registrations starting with specific numbers
+        # This is a rough heuristic
+        if any(term in owner for term in ["llc", "inc", "corp", "trust"]) == False:
+            if not airline and not any(term in owner for term in ["aviation", "air charter", "jet"]):
+                # Possible military if no clear commercial/private signals
+                pass
+
+    # ============================================================
+    # COMMERCIAL AIRLINES (high confidence)
+    # ============================================================
+
+    # Airline name from callsign lookup is strongest signal
+    if airline:
+        # Check if it's cargo masquerading as commercial
+        cargo_airlines = [
+            "fedex", "ups", "united parcel", "dhl", "amazon air", "amazon prime",
+            "atlas air", "kalitta", "polar air", "southern air", "cargo", "freight",
+            "air cargo", "express freight"
+        ]
+        if any(c in airline for c in cargo_airlines):
+            return "cargo"
+        return "commercial"
+
+    # Commercial airline owner patterns
+    commercial_owner_terms = [
+        "airlines", "airways", "air lines", "airline",
+    ]
+    if any(t in owner for t in commercial_owner_terms):
+        # Exclude cargo/charter
+        if not any(c in owner for c in ["cargo", "freight", "charter"]):
+            return "commercial"
+
+    # ============================================================
+    # CARGO OPERATIONS
+    # ============================================================
+
+    cargo_owner_terms = ["cargo", "freight", "logistics", "express"]
+    if any(t in owner for t in cargo_owner_terms):
+        return "cargo"
+
+    cargo_type_codes = {
+        "B763", "B762", "B752", "B744", "B748", "MD11",  # Common cargo conversions
+        "A306", "A30B", "DC10", "DC86", "DC87",
+    }
+    if type_code in cargo_type_codes and not airline:
+        return "cargo"
+
+    # ============================================================
+    # PRIVATE / BUSINESS JETS
+    # ============================================================
+
+    # Charter operators (technically commercial but often categorized as private)
+    charter_owner_terms = [
+        "flexjet", "netjets", "wheels up", "xojet", "sentient",
+        "vistajet", "luxaviation", "privé", "air charter",
+        "charter", "executive", "flight options", "bombardier fractional",
+    ]
+    if any(t in owner for t in charter_owner_terms):
+        return "private"
+
+    # Personal ownership patterns
+    private_owner_terms = [
+        " llc", " inc", " trust", " corp", "holdings",
+        "management", "investments", "aviation llc",
+    ]
+    # Only classify as private if owner has these terms AND it's a jet/small aircraft
+    if any(owner.endswith(t) or t + " " in owner for t in private_owner_terms):
+        if type_code:  # Has type code, likely private
+            return "private"
+
+    # Business jet type codes (comprehensive list)
+    private_type_codes = {
+        # Embraer Phenom/Praetor/Legacy
+        "E50P", "E55P", "E545", "E550", "E35L", "E35X", "E135", "E145",
+        # Cessna Citation family
+        "C25A", "C25B", "C25C", "C500", "C501", "C510", "C525", "C550",
+        "C551", "C560", "C56X", "C650", "C680", "C700", "C750",
+        # Gulfstream
+        "GLF2", "GLF3", "GLF4", "GLF5", "GLF6", "G150", "G200", "G280",
+        "GLEX", "G650",
+        # Bombardier/Canadair
+        "CL30", "CL35", "CL60", "CL64", "CL65", "GALX", "GL5T", "GL7T",
+        # Dassault Falcon
+        "F900", "FA10", "FA20", "FA50", "FA7X", "FA8X", "FA2T", "FA5X",
+        # Learjet
+        "LJ23", "LJ24", "LJ25", "LJ31", "LJ35", "LJ40", "LJ45", "LJ55",
+        "LJ60", "LJ70", "LJ75", "LJ85",
+        # Hawker/Beechjet
+        "H25A", "H25B", "H25C", "BE40", "BE20", "BE30", "BE9L", "BE9T",
+        # Pilatus
+        "PC12", "PC24",
+        # Other common business jets
+        "HDJT", "HA4T", "ASTR", "C68A", "PRM1", "EA50",
+    }
+    if type_code in private_type_codes:
+        return "private"
+
+    # Small single/twin props (likely private/training)
+    small_aircraft_codes = {
+        "C172", "C182", "C206", "PA28", "PA32", "PA46", "SR20", "SR22",
+        "BE36", "BE58", "C310", "C340", "C414", "C421",
+    }
+    if type_code in small_aircraft_codes:
+        return "private"
+
+    return "unknown"
+
+
+# ------------------------------------------------------------
+# Runner
+# ------------------------------------------------------------
+
+def _timed(label: str, fn, rows) -> List[str]:
+    started = time.perf_counter()
+    result = fn(rows)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed:8.2f}s  {len(rows) / elapsed:>12,.0f} rows/s")
+    return result
+
+
+def bench_backfill(rows: List[Dict[str, Any]], workers: int) -> None:
+    chunks = [rows[i:i + BACKFILL_CHUNK_SIZE] for i in range(0, len(rows), BACKFILL_CHUNK_SIZE)]
+
+    def run(pool_workers: int) -> List[str]:
+        classify_key.cache_clear()
+        pool = jobs._classify_pool(pool_workers)
+        try:
+            return [
+                cls for chunk in chunks for cls in jobs._classify(pool, chunk, pool_workers)
+            ]
+        finally:
+            if pool:
+                pool.shutdown()
+
+    print(f"backfill, {len(chunks):,} chunks of {BACKFILL_CHUNK_SIZE:,}:")
+    in_thread = _timed("  job thread (BACKFILL_WORKERS=0)", lambda rs: run(0), rows)
+    pooled = _timed(f"  {workers}-process pool", lambda rs: run(workers), rows)
+    if in_thread != pooled:
+        raise SystemExit("backfill: pool and job thread disagree")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backfill-workers", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} synthetic rows...")
+    rows = synthetic_rows(args.rows, args.seed)
+
+    before = _timed("legacy classify_flight", lambda rs: [legacy_classify_flight(r) for r in rs], rows)
+
+    uncached = classify_key.__wrapped__
+    _timed(
+        "compiled, no memo",
+        lambda rs: [uncached(*classification._key(r)) for r in rs],
+        rows,
+    )
+
+    classify_key.cache_clear()
+    _timed("compiled classify_flight", lambda rs: [classify_flight(r) for r in rs], rows)
+
+    classify_key.cache_clear()
+    after = _timed("compiled classify_many", classify_many, rows)
+
+    info = classify_key.cache_info()
+    print(f"memo: {info.hits:,} hits, {info.misses:,} misses, {info.currsize:,} entries")
+
+    mismatches = sum(1 for a, b in zip(before, after) if a != b)
+    print(f"mismatches: {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+    if args.backfill_workers:
+        bench_backfill(rows, args.backfill_workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Fills a flight log with synthetic history for the benchmarks: N enriched,
+classified events spread over the last --days, plus the airports the
+synthetic routes use. The schema, migrations and rollup triggers are the
+app's own, so the result looks like a log that was ingested for real.
+
+    cd backend
+    python -m benchmarks.gendb --db /tmp/bench.db --rows 1000000
+    python -m benchmarks.gendb --db /tmp/bench.db --rows 2000000 --days 730 --seed 3
+
+Appends to an existing file; delete it first for a clean log.
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+CHUNK_ROWS = 20000
+
+_ROLLUP_TRIGGERS_SQL = """
+    SELECT name FROM sqlite_master
+    WHERE type = 'trigger' AND tbl_name = 'flights'
+      AND (name LIKE 'rollup\\_%' ESCAPE '\\' OR name LIKE 'operator\\_codes\\_%' ESCAPE '\\');
+"""
+
+
+def generate(rows: int, days: int, seed: int, end: Optional[datetime] = None) -> float:
+    """Writes the rows into DB_PATH; returns the seconds it took."""
+    # imported here: app.config reads DB_PATH at import time
+    from app.classification import RULES_VERSION, classify_many
+    from app.config import PRIMARY_SITE
+    from app.db import connection, init_db
+    from app.rollups import (
+        install_operator_codes,
+        install_rollups,
+        rebuild_operator_codes,
+        rebuild_rollups,
+    )
+    from .traffic import AIRPORTS, FLIGHT_COLUMNS, flight_rows
+
+    init_db()
+    with connection() as conn:
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO airports (iata_code, name, city, country, latitude, longitude)
+            VALUES (?, ?, ?, ?, ?, ?);
+            """,
+            AIRPORTS,
+        )
+
+    columns = FLIGHT_COLUMNS + ("classification", "classification_rule_version")
+    sql = (
+        f"INSERT INTO flights ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)});"
+    )
+
+    started = time.perf_counter()
+    written = 0
+    chunk: List[tuple] = []
+    source = flight_rows(
+        rows, seed, end or datetime.now().replace(microsecond=0), days, PRIMARY_SITE
+    )
+
+    def flush():
+        nonlocal written
+        dicts: List[Dict[str, Any]] = [dict(zip(FLIGHT_COLUMNS, r)) for r in chunk]
+        classes = classify_many(dicts)
+        with connection() as conn:
+            conn.executemany(
+                sql, [r + (cls, RULES_VERSION) for r, cls in zip(chunk, classes)]
+            )
+        written += len(chunk)
+        chunk.clear()
+        rate = written / (time.perf_counter() - started)
+        print(f"[GENDB] {written:,}/{rows:,} rows ({rate:,.0f} rows/s)", flush=True)
+
+    # Per-row rollup triggers would dominate a bulk load: drop them, load,
+    # then reinstall them and rebuild the rollups once, as rebuild_rollups.py does
+    with connection() as conn:
+        triggers = [r[0] for r in conn.execute(_ROLLUP_TRIGGERS_SQL)]
+        for name in triggers:
+            conn.execute(f"DROP TRIGGER {name};")
+    try:
+        for row in source:
+            chunk.append(row)
+            if len(chunk) >= CHUNK_ROWS:
+                flush()
+        if chunk:
+            flush()
+    finally:
+        with connection() as conn:
+            cur = conn.cursor()
+            install_rollups(cur)
+            install_operator_codes(cur)
+            rebuild_rollups(cur)
+            rebuild_operator_codes(cur)
+            conn.commit()
+            cur.execute("ANALYZE;")
+
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", required=True, help="SQLite file to fill (created if missing)")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["DB_PATH"] = os.path.abspath(args.db)
+    seconds = generate(args.rows, args.days, args.seed)
+    print(f"[GENDB] {args.rows:,} rows in {seconds:.1f}s -> {args.db}")
+
+
+if __name__ == "__main__":
+    main()
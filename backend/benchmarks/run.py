@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+End-to-end offline benchmark: the real ingest, write and API code against a
+synthetic log and local stand-ins for adsb.lol and adsbdb
+(benchmarks/stub_server.py). Nothing leaves the machine.
+
+    cd backend
+    python -m benchmarks.run --db /tmp/bench.db --rows 1000000
+    python -m benchmarks.run --db /tmp/bench.db --polls 200 --fleet 120 \\
+        --adsbdb-latency-ms 120 --error-rate 0.02 --json before.json
+    python -m benchmarks.run --source sbs --sbs-rate 0 --polls 50
+
+Reports, for the same seed and arguments on the same machine:
+  ingest   polls/s and aircraft/s of back-to-back ingest_once() cycles (no
+           POLL_SECONDS sleep), and how long enrichment took to drain
+  write    log_flights() latency per snapshot (p50 / p95 / p99 / max)
+  api      every /api/stats/* route plus the /api/flights reads, each run
+           --repeat times with the response cache cleared (cold), and once
+           more served from it (warm)
+
+--rows generates history first when the log holds fewer rows than that
+(see benchmarks/gendb.py). --source picks what ingest reads: the adsb.lol
+stub (default), the stub's /data/aircraft.json, or its SBS-1 TCP feed.
+--json saves the report for comparing runs.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+from . import stub_server
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "n": len(ordered),
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+# ------------------------------------------------------------
+# Phases
+# ------------------------------------------------------------
+
+def bench_ingest(polls: int, drain_timeout: float) -> Dict[str, Any]:
+    from app import ingest
+    from app.pipeline import enrichment
+
+    # time the write inside each cycle without changing what the cycle does
+    write_times: List[float] = []
+    log_flights = ingest.log_flights
+
+    def timed_log_flights(rows):
+        started = time.perf_counter()
+        log_flights(rows)
+        write_times.append(time.perf_counter() - started)
+
+    ingest.log_flights = timed_log_flights
+    enrichment.start()
+
+    cycle_times: List[float] = []
+    aircraft = 0
+    errors = 0
+    started = time.perf_counter()
+    try:
+        for _ in range(polls):
+            cycle_started = time.perf_counter()
+            try:
+                aircraft += ingest.ingest_once()
+            except Exception as e:  # an injected upstream failure, as in production
+                errors += 1
+                print("[BENCH] poll failed:", e)
+            cycle_times.append(time.perf_counter() - cycle_started)
+    finally:
+        ingest.log_flights = log_flights
+    elapsed = time.perf_counter() - started
+
+    drain_started = time.perf_counter()
+    while enrichment.pending() and time.perf_counter() - drain_started < drain_timeout:
+        time.sleep(0.05)
+
+    return {
+        "ingest": {
+            "polls": polls,
+            "failed_polls": errors,
+            "aircraft": aircraft,
+            "seconds": round(elapsed, 3),
+            "polls_per_s": round(polls / elapsed, 1),
+            "aircraft_per_s": round(aircraft / elapsed, 1),
+            "cycle": _percentiles(cycle_times),
+            "enrichment_drain_s": round(time.perf_counter() - drain_started, 3),
+            "enrichment_pending": enrichment.pending(),
+        },
+        "write": _percentiles(write_times) if write_times else {},
+    }
+
+
+def _wait_for_feed(timeout: float) -> None:
+    """An SBS source fills its table from a background reader; poll once it has."""
+    from app.config import SITES
+    from app.sources import source_for
+
+    source = source_for(SITES[0])
+    started = time.perf_counter()
+    while not source.snapshot() and time.perf_counter() - started < timeout:
+        time.sleep(0.1)
+
+
+def _api_paths(app) -> List[str]:
+    paths = sorted(
+        rule.rule for rule in app.url_map.iter_rules()
+        if rule.rule.startswith("/api/stats/") and "<" not in rule.rule
+    )
+    now = datetime.now().isoformat(timespec="seconds")
+    return paths + [
+        "/api/stats/routes-map?range=week",
+        "/api/stats/dashboard?days=30",
+        "/api/flights?limit=100",
+        "/api/flights?limit=100&classification=cargo",
+        f"/api/flights/search-by-time?datetime={now}",
+    ]
+
+
+def bench_api(repeat: int) -> Dict[str, Any]:
+    from app.main import create_app
+    from app.response_cache import responses
+
+    app = create_app()
+    client = app.test_client()
+    results: Dict[str, Any] = {}
+
+    for path in _api_paths(app):
+        cold: List[float] = []
+        size = 0
+        for _ in range(repeat):
+            responses.clear()
+            started = time.perf_counter()
+            resp = client.get(path)
+            cold.append(time.perf_counter() - started)
+            if resp.status_code != 200:
+                raise RuntimeError(f"{path} answered {resp.status_code}")
+            size = len(resp.get_data())
+
+        started = time.perf_counter()
+        client.get(path)
+        warm = time.perf_counter() - started
+
+        results[path] = {**_percentiles(cold), "warm_ms": round(warm * 1000, 3), "bytes": size}
+    return results
+
+
+# ------------------------------------------------------------
+# Report
+# ------------------------------------------------------------
+
+def _print_report(report: Dict[str, Any]) -> None:
+    env = report["environment"]
+    print(f"\n== overhead benchmark  ({env['rows']:,} rows, seed {env['seed']}, "
+          f"python {env['python']}, sqlite {env['sqlite']})")
+
+    ing = report["ingest"]
+    print(f"\ningest   {ing['polls']} polls, {ing['aircraft']:,} aircraft in {ing['seconds']}s"
+          f"  ->  {ing['polls_per_s']} polls/s, {ing['aircraft_per_s']} aircraft/s"
+          f"  (failed polls {ing['failed_polls']})")
+    print(f"         cycle p50 {ing['cycle']['p50_ms']} ms, p95 {ing['cycle']['p95_ms']} ms;"
+          f" enrichment drained in {ing['enrichment_drain_s']}s"
+          f" ({ing['enrichment_pending']} still pending)")
+
+    w = report["write"]
+    if w:
+        print(f"write    log_flights p50 {w['p50_ms']} ms, p95 {w['p95_ms']} ms,"
+              f" p99 {w['p99_ms']} ms, max {w['max_ms']} ms")
+
+    print(f"\n{'endpoint':<52}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'warm ms':>10}{'bytes':>10}")
+    for path, r in report["api"].items():
+        print(f"{path[:51]:<52}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['max_ms']:>10}"
+              f"{r['warm_ms']:>10}{r['bytes']:>10}")
+    print("\nstub requests:", report["stub_requests"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--db", help="SQLite file (default: a fresh temp file)")
+    parser.add_argument("--rows", type=int, default=100_000, help="history to generate if the log is smaller")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--polls", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5, help="cold requests per endpoint")
+    parser.add_argument("--drain-timeout", type=float, default=60)
+    parser.add_argument("--json", help="also write the report here")
+    parser.add_argument("--source", choices=("adsb.lol", "aircraft.json", "sbs"), default="adsb.lol")
+    stub_server.add_arguments(parser)
+    args = parser.parse_args()
+
+    db_path = os.path.abspath(args.db or os.path.join(tempfile.mkdtemp(), "bench.db"))
+    config = stub_server.config_from(args)
+    server = stub_server.start(config)
+    feed = None
+    source = args.source
+    if source == "aircraft.json":
+        source = f"{server.base_url}/data/aircraft.json"
+    elif source == "sbs":
+        feed = stub_server.start_sbs(config)
+        source = f"sbs://{feed.address}"
+
+    # before anything imports app.config
+    os.environ.update({
+        "DB_PATH": db_path,
+        "ADSB_LOL_BASE_URL": f"{server.base_url}/v2",
+        "ADSBDB_BASE_URL": f"{server.base_url}/v0",
+        "HTTP_CACHE_ENRICH": "false",
+        "HTTP_MAX_PER_HOST": os.environ.get("HTTP_MAX_PER_HOST", "16"),
+        "INGEST_SOURCE": source,
+    })
+
+    import sqlite3
+
+    from app.db import connection, init_db
+    from . import gendb
+
+    init_db()
+    with connection() as conn:
+        rows = conn.execute("SELECT COUNT(*) FROM flights;").fetchone()[0]
+    if rows < args.rows:
+        print(f"[BENCH] Generating {args.rows - rows:,} rows into {db_path}")
+        gendb.generate(args.rows - rows, args.days, args.seed)
+        rows = args.rows
+
+    report: Dict[str, Any] = {
+        "environment": {
+            "db": db_path,
+            "rows": rows,
+            "seed": args.seed,
+            "args": vars(args),
+            "source": source,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(),
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+        },
+    }
+    if feed is not None:
+        _wait_for_feed(args.drain_timeout)
+    report.update(bench_ingest(args.polls, args.drain_timeout))
+    report["api"] = bench_api(args.repeat)
+    report["stub_requests"] = dict(server.counts)
+    if feed is not None:
+        report["stub_requests"]["sbs_lines"] = feed.sent
+        feed.shutdown()
+    server.shutdown()
+
+    _print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[BENCH] Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
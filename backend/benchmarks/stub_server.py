@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the two upstream APIs and for a local receiver, serving
+synthetic traffic (benchmarks/traffic.py) in the shapes app/sources.py and
+enrich.py expect:
+
+    GET /v2/point/<lat>/<lon>/<radius>      {"ac": [...], "total": n, ...}
+    GET /v2/closest/<lat>/<lon>/<radius>    {"ac": [nearest]}
+    GET /v0/aircraft/<reg>                  {"response": {"aircraft": {...}}}
+    GET /v0/callsign/<callsign>             {"response": {"flightroute": {...}}}
+    GET /data/aircraft.json                 readsb's {"now": t, "aircraft": [...]}
+    TCP --sbs-port                          SBS-1 lines, like dump1090's port 30003
+
+Unknown registrations / callsigns get adsbdb's 404 "unknown ..." body.
+Latency and failures are tunable per API, so slow or flaky upstreams can be
+reproduced offline:
+
+    cd backend
+    python -m benchmarks.stub_server --port 8990 --adsbdb-latency-ms 150 --error-rate 0.02
+
+    ADSB_LOL_BASE_URL=http://127.0.0.1:8990/v2 \\
+    ADSBDB_BASE_URL=http://127.0.0.1:8990/v0 python -m app.main
+
+    INGEST_SOURCE=sbs://127.0.0.1:30003 ...
+    INGEST_SOURCE=http://127.0.0.1:8990/data/aircraft.json ...
+
+The receiver feeds serve one fleet centred on --lat / --lon (default: the
+app's default observer).
+"""
+
+import argparse
+import json
+import random
+import socketserver
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from .traffic import Fleet, aircraft_payload, callsign_payload
+
+
+class StubConfig:
+    def __init__(
+        self,
+        adsb_latency_ms: float = 0,
+        adsbdb_latency_ms: float = 0,
+        jitter_ms: float = 0,
+        error_rate: float = 0,
+        fleet_size: int = 60,
+        seed: int = 1,
+        step_seconds: float = 12,
+        lat: float = 42.7077,
+        lon: float = -83.0315,
+        radius_nm: float = 50,
+        sbs_rate: float = 2000,
+    ):
+        self.adsb_latency_ms = adsb_latency_ms
+        self.adsbdb_latency_ms = adsbdb_latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate  # share of requests answered 503
+        self.fleet_size = fleet_size
+        self.seed = seed
+        # simulated time that passes between two snapshot requests
+        self.step_seconds = step_seconds
+        # receiver position and range for /data/aircraft.json and the SBS feed
+        self.lat = lat
+        self.lon = lon
+        self.radius_nm = radius_nm
+        self.sbs_rate = sbs_rate  # SBS lines per second per client; 0 = unthrottled
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: StubConfig):
+        super().__init__(address, _Handler)
+        self.config = config
+        self.fleet: Optional[Fleet] = None
+        self.fleet_lock = threading.Lock()
+        self.rnd = random.Random(config.seed)
+        self.counts: Dict[str, int] = {}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key: str) -> None:
+        with self.fleet_lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def snapshot(self, lat: float, lon: float, radius: float):
+        with self.fleet_lock:
+            if self.fleet is None:
+                self.fleet = Fleet(self.config.fleet_size, lat, lon, radius, self.config.seed)
+            else:
+                self.fleet.step(self.config.step_seconds)
+            return self.fleet.snapshot(lat, lon, radius)
+
+    def readsb(self) -> Dict[str, Any]:
+        cfg = self.config
+        with self.fleet_lock:
+            if self.fleet is None:
+                self.fleet = Fleet(cfg.fleet_size, cfg.lat, cfg.lon, cfg.radius_nm, cfg.seed)
+            else:
+                self.fleet.step(cfg.step_seconds)
+            return self.fleet.readsb(time.time())
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StubServer
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        cfg = self.server.config
+
+        if parts[:1] == ["v2"] and len(parts) == 5 and parts[1] in ("point", "closest"):
+            self._delay(cfg.adsb_latency_ms)
+            if self._fail("adsb"):
+                return
+            try:
+                lat, lon, radius = (float(p) for p in parts[2:])
+            except ValueError:
+                return self._send(400, {"msg": "bad coordinates"})
+            ac = self.server.snapshot(lat, lon, radius)
+            if parts[1] == "closest":
+                ac = ac[:1]
+            self.server.count("adsb")
+            return self._send(200, {"ac": ac, "msg": "No error", "now": int(time.time() * 1000),
+                                    "total": len(ac), "ctime": 0, "ptime": 0})
+
+        if parts == ["data", "aircraft.json"]:
+            if self._fail("receiver"):
+                return
+            self.server.count("aircraft_json")
+            return self._send(200, self.server.readsb())
+
+        if parts[:1] == ["v0"] and len(parts) == 3 and parts[1] in ("aircraft", "callsign"):
+            self._delay(cfg.adsbdb_latency_ms)
+            if self._fail("adsbdb"):
+                return
+            self.server.count(f"adsbdb_{parts[1]}")
+            if parts[1] == "aircraft":
+                body = aircraft_payload(parts[2])
+                missing = "unknown aircraft"
+            else:
+                body = callsign_payload(parts[2].upper())
+                missing = "unknown callsign"
+            if body is None:
+                return self._send(404, {"response": missing})
+            return self._send(200, body)
+
+        self._send(404, {"msg": "not found"})
+
+    def _delay(self, ms: float) -> None:
+        jitter = self.server.config.jitter_ms
+        seconds = max(0.0, ms + (self.server.rnd.uniform(-jitter, jitter) if jitter else 0)) / 1000
+        if seconds:
+            time.sleep(seconds)
+
+    def _fail(self, api: str) -> bool:
+        if self.server.rnd.random() < self.server.config.error_rate:
+            self.server.count(f"{api}_errors")
+            self._send(503, {"msg": "stub: injected failure"})
+            return True
+        return False
+
+    def _send(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class SbsFeed(socketserver.ThreadingTCPServer):
+    """
+    dump1090's port 30003: every client gets the SBS-1 lines of one shared
+    fleet, sbs_rate lines per second, in real time.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], config: StubConfig):
+        super().__init__(address, _SbsHandler)
+        self.config = config
+        self.fleet = Fleet(config.fleet_size, config.lat, config.lon, config.radius_nm, config.seed)
+        self.fleet_lock = threading.Lock()
+        self.sent = 0
+        self._ticked = time.monotonic()
+
+    @property
+    def address(self) -> str:
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+    def lines(self):
+        with self.fleet_lock:
+            now = time.monotonic()
+            self.fleet.step(now - self._ticked)
+            self._ticked = now
+            return self.fleet.sbs_lines(datetime.now())
+
+
+class _SbsHandler(socketserver.BaseRequestHandler):
+    server: SbsFeed
+
+    def handle(self):
+        rate = self.server.config.sbs_rate
+        try:
+            while True:
+                started = time.monotonic()
+                lines = self.server.lines()
+                self.request.sendall(b"".join(lines))
+                self.server.sent += len(lines)
+                if rate:
+                    time.sleep(max(0.0, len(lines) / rate - (time.monotonic() - started)))
+        except OSError:
+            pass  # client went away
+
+
+def start(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> StubServer:
+    """Serves on a background thread; port 0 picks a free one."""
+    server = StubServer((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True, name="stub-server").start()
+    return server
+
+
+def start_sbs(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> SbsFeed:
+    """The SBS-1 feed on a background thread; port 0 picks a free one."""
+    feed = SbsFeed((host, port), config)
+    threading.Thread(target=feed.serve_forever, daemon=True, name="stub-sbs").start()
+    return feed
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--adsb-latency-ms", type=float, default=0)
+    parser.add_argument("--adsbdb-latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="share of requests answered 503")
+    parser.add_argument("--fleet", type=int, default=60, help="aircraft in the air at any time")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--lat", type=float, default=42.7077, help="receiver feeds: fleet centre")
+    parser.add_argument("--lon", type=float, default=-83.0315)
+    parser.add_argument("--sbs-rate", type=float, default=2000, help="SBS lines/s per client (0 = unthrottled)")
+
+
+def config_from(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        adsb_latency_ms=args.adsb_latency_ms,
+        adsbdb_latency_ms=args.adsbdb_latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        fleet_size=args.fleet,
+        seed=args.seed,
+        lat=args.lat,
+        lon=args.lon,
+        sbs_rate=args.sbs_rate,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8990)
+    parser.add_argument("--sbs-port", type=int, default=30003, help="0 disables the SBS-1 feed")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    config = config_from(args)
+    server = StubServer((args.host, args.port), config)
+    print(f"[STUB] adsb.lol at {server.base_url}/v2, adsbdb at {server.base_url}/v0, "
+          f"aircraft.json at {server.base_url}/data/aircraft.json")
+    feed = None
+    if args.sbs_port:
+        feed = start_sbs(config, args.host, args.sbs_port)
+        print(f"[STUB] SBS-1 feed at sbs://{feed.address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[STUB] Requests served: {server.counts}")
+        if feed is not None:
+            print(f"[STUB] SBS lines sent: {feed.sent:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""
+Synthetic air traffic shared by the offline benchmarks: a moving fleet for
+the adsb.lol stand-in and the local receiver feeds (SBS-1, aircraft.json),
+matching adsbdb payloads, and historical flights rows for the DB generator.
+Everything is derived from a seed, so two runs with the same arguments see
+the same traffic.
+"""
+
+import hashlib
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# ------------------------------------------------------------
+# Reference pools
+# ------------------------------------------------------------
+#
+# Operators carry the fields adsbdb would return for them, so a callsign
+# prefix, its airline and its aircraft types stay consistent, and every
+# classification bucket is represented.
+
+# (callsign prefix, airline name, owner, country, iso, types, weight)
+OPERATORS = [
+    ("DAL", "Delta Air Lines", "Delta Air Lines Inc", "United States", "US", ("A321", "B739", "A320", "B752"), 18),
+    ("UAL", "United Airlines", "United Airlines Inc", "United States", "US", ("B738", "B39M", "A320", "B772"), 14),
+    ("AAL", "American Airlines", "American Airlines Inc", "United States", "US", ("A321", "B738", "E75L"), 14),
+    ("SWA", "Southwest Airlines", "Southwest Airlines Co", "United States", "US", ("B737", "B38M"), 10),
+    ("SKW", "SkyWest Airlines", "Skywest Airlines Inc", "United States", "US", ("CRJ9", "E75L"), 8),
+    ("ACA", "Air Canada", "Air Canada", "Canada", "CA", ("A320", "BCS3", "B38M"), 5),
+    ("FDX", "FedEx", "Federal Express Corp", "United States", "US", ("B763", "MD11", "B77L"), 5),
+    ("UPS", "UPS Airlines", "United Parcel Service Co", "United States", "US", ("B763", "B744", "MD11"), 4),
+    ("GTI", "Atlas Air", "Atlas Air Inc", "United States", "US", ("B744", "B763"), 2),
+    ("RCH", "", "United States Air Force", "United States", "US", ("C17", "KC46", "C130"), 2),
+    ("SAM", "", "United States Air Force", "United States", "US", ("C32", "C40"), 1),
+    ("EJA", "", "Netjets Sales Inc", "United States", "US", ("C68A", "E55P", "CL35"), 4),
+    ("LXJ", "", "Flexjet LLC", "United States", "US", ("CL35", "E545", "GL5T"), 3),
+    ("N", "", None, "United States", "US", ("C172", "PA28", "SR22", "BE36", "PC12"), 10),
+]
+
+PRIVATE_OWNERS = [
+    "Skyline Aviation LLC", "Great Lakes Holdings Inc", "Wells Fargo Trust Co",
+    "Private Jet Management", "Michigan State Police", "John Smith", "",
+]
+
+MODELS = {
+    "A320": ("Airbus", "A320-214"), "A321": ("Airbus", "A321-211"),
+    "B737": ("Boeing", "737-7H4"), "B738": ("Boeing", "737-824"),
+    "B739": ("Boeing", "737-932ER"), "B38M": ("Boeing", "737 MAX 8"),
+    "B39M": ("Boeing", "737 MAX 9"), "B752": ("Boeing", "757-232"),
+    "B763": ("Boeing", "767-300F"), "B744": ("Boeing", "747-400F"),
+    "B772": ("Boeing", "777-222"), "B77L": ("Boeing", "777-FS2"),
+    "MD11": ("McDonnell Douglas", "MD-11F"), "BCS3": ("Airbus", "A220-300"),
+    "CRJ9": ("Bombardier", "CRJ-900LR"), "E75L": ("Embraer", "ERJ-175LR"),
+    "C17": ("Boeing", "C-17A Globemaster III"), "KC46": ("Boeing", "KC-46A Pegasus"),
+    "C130": ("Lockheed", "C-130J Hercules"), "C32": ("Boeing", "C-32A"),
+    "C40": ("Boeing", "C-40B Clipper"), "C68A": ("Cessna", "Citation Latitude"),
+    "E55P": ("Embraer", "Phenom 300"), "CL35": ("Bombardier", "Challenger 350"),
+    "E545": ("Embraer", "Praetor 500"), "GL5T": ("Bombardier", "Global 5500"),
+    "C172": ("Cessna", "172S Skyhawk"), "PA28": ("Piper", "PA-28-181 Archer"),
+    "SR22": ("Cirrus", "SR22"), "BE36": ("Beechcraft", "Bonanza A36"),
+    "PC12": ("Pilatus", "PC-12/47E"),
+}
+
+# iata, name, city, country, lat, lon
+AIRPORTS = [
+    ("DTW", "Detroit Metropolitan Wayne County Airport", "Detroit", "United States", 42.2124, -83.3534),
+    ("ORD", "Chicago O'Hare International Airport", "Chicago", "United States", 41.9786, -87.9048),
+    ("ATL", "Hartsfield Jackson Atlanta International Airport", "Atlanta", "United States", 33.6367, -84.4281),
+    ("JFK", "John F Kennedy International Airport", "New York", "United States", 40.6398, -73.7789),
+    ("LAX", "Los Angeles International Airport", "Los Angeles", "United States", 33.9425, -118.4081),
+    ("DFW", "Dallas Fort Worth International Airport", "Dallas-Fort Worth", "United States", 32.8968, -97.0380),
+    ("DEN", "Denver International Airport", "Denver", "United States", 39.8617, -104.6731),
+    ("MSP", "Minneapolis-St Paul International Airport", "Minneapolis", "United States", 44.8820, -93.2218),
+    ("YYZ", "Lester B. Pearson International Airport", "Toronto", "Canada", 43.6772, -79.6306),
+    ("MEM", "Memphis International Airport", "Memphis", "United States", 35.0424, -89.9767),
+    ("SDF", "Louisville International Airport", "Louisville", "United States", 38.1744, -85.7360),
+    ("BOS", "General Edward Lawrence Logan International Airport", "Boston", "United States", 42.3643, -71.0052),
+    ("MCO", "Orlando International Airport", "Orlando", "United States", 28.4294, -81.3090),
+    ("SEA", "Seattle Tacoma International Airport", "Seattle", "United States", 47.4490, -122.3093),
+    ("PTK", "Oakland County International Airport", "Pontiac", "United States", 42.6655, -83.4201),
+]
+
+# Lookups adsbdb answers with 404 "unknown ..." (a small share, as in real use)
+UNKNOWN_SHARE = 0.05
+
+
+def _stable(text: str) -> random.Random:
+    """A Random seeded by text alone, so a key's payload never changes."""
+    return random.Random(int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:12], 16))
+
+
+def _pick(rnd: random.Random, pool, weights=None):
+    return rnd.choices(pool, weights=weights)[0] if weights else rnd.choice(pool)
+
+
+_OPERATOR_WEIGHTS = [op[-1] for op in OPERATORS]
+
+
+# ------------------------------------------------------------
+# Aircraft identities
+# ------------------------------------------------------------
+
+# Registrations encode their operator (fleet tails end in the first two
+# letters of its callsign prefix, Canadian ones are C-xxxx), so the stub can
+# answer /aircraft/<reg> consistently with the callsign the fleet flies.
+_PRIVATE_SUFFIXES = ("", "K", "P", "W")
+
+
+def operator_of(reg: str):
+    if reg.startswith("C-"):
+        return next(op for op in OPERATORS if op[0] == "ACA")
+    return next(
+        (op for op in OPERATORS if op[0] not in ("N", "ACA") and reg.endswith(op[0][:2])),
+        OPERATORS[-1],
+    )
+
+
+def type_of(reg: str) -> str:
+    types = operator_of(reg)[5]
+    return types[_stable("type:" + reg).randrange(len(types))]
+
+
+def make_identity(rnd: random.Random) -> Dict[str, Any]:
+    """Hex, registration, callsign and type of one airframe."""
+    prefix = _pick(rnd, OPERATORS, _OPERATOR_WEIGHTS)[0]
+    if prefix == "ACA":
+        reg = "C-" + "".join(rnd.choice("FGIJKLMNOPRSTUVWXY") for _ in range(4))
+    elif prefix == "N":
+        reg = f"N{rnd.randrange(100, 99999)}{rnd.choice(_PRIVATE_SUFFIXES)}"
+    else:
+        reg = f"N{rnd.randrange(100, 999)}{prefix[:2]}"
+    callsign = reg if prefix == "N" else f"{prefix}{rnd.randrange(1, 9999)}"
+    return {
+        "hex": f"{rnd.randrange(0xA00000, 0xADFFFF):06x}",
+        "reg": reg,
+        "callsign": callsign,
+        "type_code": type_of(reg),
+    }
+
+
+def aircraft_payload(reg: str) -> Optional[Dict[str, Any]]:
+    """adsbdb /aircraft/<reg> body, or None for an unknown registration."""
+    rnd = _stable("aircraft:" + reg)
+    if rnd.random() < UNKNOWN_SHARE:
+        return None
+
+    prefix, _, owner, country, iso, _, _ = operator_of(reg)
+    type_code = type_of(reg)
+    manufacturer, model = MODELS.get(type_code, ("Unknown", type_code))
+    return {
+        "response": {
+            "aircraft": {
+                "type": model,
+                "icao_type": type_code,
+                "manufacturer": manufacturer,
+                "mode_s": f"{rnd.randrange(0xA00000, 0xADFFFF):06X}",
+                "registration": reg,
+                "registered_owner_country_iso_name": iso,
+                "registered_owner_country_name": country,
+                "registered_owner_operator_flag_code": prefix if prefix != "N" else None,
+                "registered_owner": owner if owner is not None else rnd.choice(PRIVATE_OWNERS),
+                "url_photo": None,
+                "url_photo_thumbnail": None,
+            }
+        }
+    }
+
+
+def _airport(row) -> Dict[str, Any]:
+    iata, name, city, country, lat, lon = row
+    return {
+        "country_iso_name": "CA" if country == "Canada" else "US",
+        "country_name": country,
+        "elevation": 0,
+        "iata_code": iata,
+        "icao_code": ("C" if country == "Canada" else "K") + iata,
+        "latitude": lat,
+        "longitude": lon,
+        "municipality": city,
+        "name": name,
+    }
+
+
+def callsign_payload(callsign: str) -> Optional[Dict[str, Any]]:
+    """adsbdb /callsign/<callsign> body, or None when it has no route."""
+    operator = next((op for op in OPERATORS if op[0] != "N" and callsign.startswith(op[0])), None)
+    rnd = _stable("callsign:" + callsign)
+    if operator is None or not operator[1] or rnd.random() < UNKNOWN_SHARE:
+        return None
+
+    prefix, airline, _, country, iso, _, _ = operator
+    origin, dest = rnd.sample(AIRPORTS, 2)
+    return {
+        "response": {
+            "flightroute": {
+                "callsign": callsign,
+                "callsign_icao": callsign,
+                "callsign_iata": None,
+                "airline": {
+                    "name": airline,
+                    "icao": prefix,
+                    "iata": None,
+                    "country": country,
+                    "country_iso": iso,
+                    "callsign": None,
+                },
+                "origin": _airport(origin),
+                "destination": _airport(dest),
+            }
+        }
+    }
+
+
+# ------------------------------------------------------------
+# Live fleet (adsb.lol /v2/point and /v2/closest, receiver feeds)
+# ------------------------------------------------------------
+
+NM_PER_DEG_LAT = 60.0
+
+
+def _distance_nm(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    dlat = (lat2 - lat1) * NM_PER_DEG_LAT
+    dlon = (lon2 - lon1) * NM_PER_DEG_LAT * math.cos(math.radians((lat1 + lat2) / 2))
+    return math.hypot(dlat, dlon)
+
+
+class Fleet:
+    """
+    About `size` aircraft crossing a circle of radius_nm around the observer
+    in straight lines. An aircraft that leaves is replaced by a new one, or,
+    sometimes, by an earlier airframe coming back (a repeat sighting).
+    """
+
+    def __init__(self, size: int, lat: float, lon: float, radius_nm: float, seed: int = 1):
+        self.rnd = random.Random(seed)
+        self.lat = lat
+        self.lon = lon
+        self.radius_nm = radius_nm
+        self.gone: List[Dict[str, Any]] = []
+        self.aircraft = [self._enter(anywhere=True) for _ in range(size)]
+
+    def _enter(self, anywhere: bool = False) -> Dict[str, Any]:
+        rnd = self.rnd
+        if self.gone and rnd.random() < 0.2:
+            ident = self.gone.pop(rnd.randrange(len(self.gone)))
+        else:
+            ident = make_identity(rnd)
+
+        small = ident["type_code"] in ("C172", "PA28", "SR22", "BE36")
+        heading = rnd.uniform(0, 360)
+        # start on the edge heading inwards, or anywhere inside at startup
+        reach = self.radius_nm * (math.sqrt(rnd.random()) if anywhere else 0.98)
+        bearing = rnd.uniform(0, 360) if anywhere else (heading + 180 + rnd.uniform(-60, 60)) % 360
+        return {
+            **ident,
+            "lat": self.lat + reach * math.cos(math.radians(bearing)) / NM_PER_DEG_LAT,
+            "lon": self.lon + reach * math.sin(math.radians(bearing))
+            / (NM_PER_DEG_LAT * math.cos(math.radians(self.lat))),
+            "heading": heading,
+            "gs": rnd.uniform(90, 140) if small else rnd.uniform(250, 480),
+            "alt": rnd.choice(["ground", 800]) if rnd.random() < 0.03
+            else int(rnd.uniform(1500, 9000) if small else rnd.uniform(4000, 39000)),
+        }
+
+    def step(self, seconds: float) -> None:
+        for i, ac in enumerate(self.aircraft):
+            nm = ac["gs"] * seconds / 3600
+            ac["lat"] += nm * math.cos(math.radians(ac["heading"])) / NM_PER_DEG_LAT
+            ac["lon"] += nm * math.sin(math.radians(ac["heading"])) / (
+                NM_PER_DEG_LAT * math.cos(math.radians(ac["lat"]))
+            )
+            ac["heading"] = (ac["heading"] + self.rnd.uniform(-2, 2)) % 360
+            if _distance_nm(self.lat, self.lon, ac["lat"], ac["lon"]) > self.radius_nm:
+                self.gone.append({k: ac[k] for k in ("hex", "reg", "callsign", "type_code")})
+                self.gone = self.gone[-500:]
+                self.aircraft[i] = self._enter()
+
+    def snapshot(self, lat: float, lon: float, radius_nm: float) -> List[Dict[str, Any]]:
+        """The `ac` list adsb.lol returns for a point query, nearest first."""
+        out = []
+        for ac in self.aircraft:
+            dst = _distance_nm(lat, lon, ac["lat"], ac["lon"])
+            if dst > radius_nm:
+                continue
+            out.append({
+                "hex": ac["hex"],
+                "type": "adsb_icao",
+                "flight": f"{ac['callsign']:<8}",
+                "r": ac["reg"],
+                "t": ac["type_code"],
+                "alt_baro": ac["alt"],
+                "gs": round(ac["gs"], 1),
+                "track": round(ac["heading"], 2),
+                "lat": round(ac["lat"], 6),
+                "lon": round(ac["lon"], 6),
+                "dst": round(dst, 3),
+                "seen": 0.1,
+            })
+        out.sort(key=lambda a: a["dst"])
+        return out
+
+    def readsb(self, now: float) -> Dict[str, Any]:
+        """A readsb aircraft.json body for a receiver at the fleet's centre."""
+        aircraft = []
+        for ac in self.snapshot(self.lat, self.lon, self.radius_nm):
+            del ac["dst"]
+            aircraft.append({**ac, "seen_pos": 0.1, "messages": 100})
+        return {"now": now, "messages": 100 * len(aircraft), "aircraft": aircraft}
+
+    def sbs_lines(self, when: datetime) -> List[bytes]:
+        """
+        SBS-1 (BaseStation) lines as dump1090 writes them on port 30003: per
+        aircraft an identification (MSG,1), an airborne position (MSG,3) and
+        an airborne velocity (MSG,4) message.
+        """
+        stamp = f"{when:%Y/%m/%d},{when:%H:%M:%S}.{when.microsecond // 1000:03d}"
+        lines = []
+        for ac in self.aircraft:
+            head = f"MSG,{{}},1,1,{ac['hex'].upper()},1,{stamp},{stamp},"
+            ground = ac["alt"] == "ground"
+            altitude = "" if ground else ac["alt"]
+            lines += [
+                f"{head.format(1)}{ac['callsign']},,,,,,,,,,,",
+                f"{head.format(3)},{altitude},,,{ac['lat']:.5f},{ac['lon']:.5f},,,0,,0,{-1 if ground else 0}",
+                f"{head.format(4)},,{ac['gs']:.0f},{ac['heading']:.0f},,,0,,,,,0",
+            ]
+        return [line.encode("ascii") + b"\r\n" for line in lines]
+
+
+# ------------------------------------------------------------
+# Historical rows (benchmarks/gendb.py)
+# ------------------------------------------------------------
+
+def flight_rows(
+    n: int, seed: int, end: datetime, days: int, site_id: str = "default"
+) -> Iterator[Tuple[Any, ...]]:
+    """
+    n flights rows, enriched the way ingest + adsbdb would have left them,
+    spread over the `days` before end with a daytime peak and all logged at
+    site_id. Yields tuples in FLIGHT_COLUMNS order, oldest first.
+    """
+    rnd = random.Random(seed)
+    span = days * 86400
+    idents = [make_identity(rnd) for _ in range(max(50, n // 8))]
+    airports = {a[0]: a for a in AIRPORTS}
+    intel_of: Dict[str, Dict[str, Any]] = {}
+    route_of: Dict[str, Dict[str, Any]] = {}
+
+    # oldest first, like a real log
+    offsets = sorted(_daytime_offset(rnd, span) for _ in range(n))
+    start = end - timedelta(seconds=span)
+
+    for offset in offsets:
+        ident = rnd.choice(idents)
+        reg, callsign = ident["reg"], ident["callsign"]
+        if reg not in intel_of:
+            intel_of[reg] = (aircraft_payload(reg) or {}).get("response", {}).get("aircraft", {})
+        if callsign not in route_of:
+            route_of[callsign] = (callsign_payload(callsign) or {}).get("response", {}).get("flightroute", {})
+        intel, route = intel_of[reg], route_of[callsign]
+        origin = route.get("origin") or {}
+        dest = route.get("destination") or {}
+
+        last = start + timedelta(seconds=offset)
+        duration = timedelta(seconds=rnd.randrange(12, 900))
+        first = last - duration
+        times_seen = 1 if rnd.random() < 0.85 else rnd.randrange(2, 6)
+        alt = "ground" if rnd.random() < 0.02 else rnd.randrange(1000, 41000, 25)
+
+        yield (
+            first.isoformat(timespec="seconds"),
+            ident["hex"],
+            ident["reg"],
+            ident["callsign"],
+            intel.get("icao_type") or ident["type_code"],
+            intel.get("type"),
+            intel.get("manufacturer"),
+            intel.get("registered_owner_country_name"),
+            intel.get("registered_owner_country_iso_name"),
+            intel.get("registered_owner"),
+            (route.get("airline") or {}).get("name"),
+            origin.get("iata_code"),
+            airports.get(origin.get("iata_code"), (None, None))[1],
+            dest.get("iata_code"),
+            airports.get(dest.get("iata_code"), (None, None))[1],
+            alt,
+            round(rnd.uniform(80, 520), 1),
+            round(rnd.uniform(0.5, 50), 2),
+            round(rnd.uniform(0, 360), 1),
+            f"{site_id}|{ident['hex']}|{ident['reg']}|{ident['callsign']}",
+            first.isoformat(timespec="seconds"),
+            last.isoformat(timespec="seconds"),
+            times_seen,
+            site_id,
+        )
+
+
+FLIGHT_COLUMNS = (
+    "seen_at", "hex", "reg", "callsign", "type_code", "model", "manufacturer",
+    "country", "country_iso", "owner", "airline_name", "origin_iata",
+    "origin_name", "dest_iata", "dest_name", "altitude_ft", "ground_speed_kt",
+    "distance_nm", "heading_deg", "event_key", "first_seen", "last_seen",
+    "times_seen", "site_id",
+)
+
+
+def _daytime_offset(rnd: random.Random, span: int) -> int:
+    # more traffic 07:00-22:00 than overnight
+    while True:
+        offset = rnd.randrange(span)
+        hour = (offset // 3600) % 24
+        if 7 <= hour < 22 or rnd.random() < 0.3:
+            return offset
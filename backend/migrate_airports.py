@@ -7,14 +7,13 @@ Run once to populate the airports reference table with coordinates:
 """
 
 import sqlite3
-import urllib.request
 import csv
-import os
 from pathlib import Path
 
-# Determine DB path (same logic as config.py but without dotenv dependency)
-SCRIPT_DIR = Path(__file__).parent
-DB_PATH = os.getenv("DB_PATH", str(SCRIPT_DIR / "data" / "flight_log.db"))
+# The app's own config (.env included) and HTTP client, so the script writes
+# to the database the app uses and shares its download cache
+from app.config import DB_PATH
+from app.httpclient import get as http_get
 
 OPENFLIGHTS_URL = "https://raw.githubusercontent.com/jpatokal/openflights/master/data/airports.dat"
 
@@ -24,8 +23,10 @@ def download_and_parse_airports():
     print(f"Downloading airport data from {OPENFLIGHTS_URL}...")
 
     try:
-        with urllib.request.urlopen(OPENFLIGHTS_URL) as response:
-            data = response.read().decode('utf-8')
+        # Cached on disk and revalidated, so re-running the script is cheap
+        response = http_get(OPENFLIGHTS_URL, timeout=60, cache=True)
+        response.raise_for_status()
+        data = response.content.decode('utf-8')
     except Exception as e:
         print(f"Error downloading data: {e}")
         return []
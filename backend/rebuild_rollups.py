@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Recomputes the stats rollup tables (rollup_groups / rollup_members,
+operator_codes / operator_icao) from the flights table and every archive
+partition.
+
+The rollups are kept current by triggers, so this is only needed after rows
+were deleted or edited outside the app:
+    python rebuild_rollups.py
+"""
+
+import time
+
+from app.archive import partitions
+from app.db import init_db, connection
+from app.rollups import rebuild_rollups, rebuild_operator_codes
+
+
+def _collect_events(cur) -> str:
+    """
+    Copies hot and archived events into one temp table (on disk: it can be
+    the whole history) and returns its name. Partitions are attached one at
+    a time, so their number is not limited by SQLite's ATTACH cap.
+    """
+    cur.execute("PRAGMA temp_store = FILE;")
+    cur.execute("DROP TABLE IF EXISTS temp.all_flights;")
+    cur.execute("CREATE TEMP TABLE all_flights AS SELECT * FROM main.flights;")
+    columns = [r[1] for r in cur.execute("PRAGMA main.table_info(flights);").fetchall()]
+
+    for path in partitions(cur):
+        cur.execute("ATTACH DATABASE ? AS arc;", (path,))
+        archived = {r[1] for r in cur.execute("PRAGMA arc.table_info(flights);").fetchall()}
+        select = ", ".join(c if c in archived else "NULL" for c in columns)
+        cur.execute(f"INSERT INTO temp.all_flights SELECT {select} FROM arc.flights;")
+        cur.connection.commit()
+        cur.execute("DETACH DATABASE arc;")
+
+    return "temp.all_flights"
+
+
+def main():
+    init_db()
+
+    started = time.monotonic()
+    with connection() as conn:
+        cur = conn.cursor()
+        source = _collect_events(cur)
+        try:
+            rebuild_rollups(cur, source)
+            rebuild_operator_codes(cur, source)
+            conn.commit()
+        finally:
+            cur.execute("DROP TABLE IF EXISTS temp.all_flights;")
+            cur.execute("PRAGMA temp_store = MEMORY;")
+        groups = cur.execute("SELECT COUNT(*) FROM rollup_groups;").fetchone()[0]
+
+    print(f"Rebuilt {groups} rollup groups in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import "./App.css";
 import Stats from "./Stats";
 
 const API_BASE = ""; // relative URLs — works for both dev (Vite proxy) and production
+const FEED_SIZE = 150;
 
 // Railway/server runs in UTC but stores timestamps without a timezone suffix.
 // Appending "Z" tells JavaScript to treat the string as UTC so toLocaleTimeString
@@ -26,11 +27,11 @@ export default function App() {
   const [datetimeResults, setDatetimeResults] = useState(null); // null | [] | [flights...]
 
   /* -----------------------------
-     Fetch flight list
+     Fetch flight list, then follow /api/stream
   ------------------------------ */
   useEffect(() => {
     const fetchFlights = () => {
-      fetch(`${API_BASE}/api/flights?limit=150`)
+      fetch(`${API_BASE}/api/flights?limit=${FEED_SIZE}`)
         .then((res) => res.json())
         .then((data) => {
           setFlights(data);
@@ -40,8 +41,30 @@ export default function App() {
     };
 
     fetchFlights();
-    const interval = setInterval(fetchFlights, 5000);
-    return () => clearInterval(interval);
+
+    if (typeof EventSource === "undefined") {
+      const interval = setInterval(fetchFlights, 5000);
+      return () => clearInterval(interval);
+    }
+
+    // New and updated events arrive as they are written; EventSource
+    // reconnects on its own and resumes from the last event id.
+    const source = new EventSource(`${API_BASE}/api/stream`);
+
+    source.addEventListener("flight", (e) => {
+      const flight = JSON.parse(e.data);
+      setFlights((prev) =>
+        [flight, ...prev.filter((f) => f.id !== flight.id)]
+          .sort((a, b) => (a.last_seen < b.last_seen ? 1 : a.last_seen > b.last_seen ? -1 : b.id - a.id))
+          .slice(0, FEED_SIZE)
+      );
+      setLastFetchMs(Date.now());
+    });
+
+    // The server could not replay what we missed — start over
+    source.addEventListener("reset", fetchFlights);
+
+    return () => source.close();
   }, []);
 
   /* -----------------------------
@@ -30,22 +30,25 @@ export default function Stats({ apiBase }) {
   const [expandedAircraft, setExpandedAircraft] = useState(null);
 
   useEffect(() => {
-    // Existing endpoints
-    fetch(`${API}/api/stats/summary`).then(r => r.json()).then(setSummary);
-    fetch(`${API}/api/stats/summary-24h`).then(r => r.json()).then(setSummary24h);
-    fetch(`${API}/api/stats/classification-detailed`).then(r => r.json()).then(setClassificationDetailed);
-    fetch(`${API}/api/stats/hourly`).then(r => r.json()).then(setHourly);
-
-    fetch(`${API}/api/stats/top-aircraft`).then(r => r.json()).then(setTopAircraft);
-    fetch(`${API}/api/stats/top-operators`).then(r => r.json()).then(setTopOperators);
-    fetch(`${API}/api/stats/countries`).then(r => r.json()).then(setCountries);
-    fetch(`${API}/api/stats/routes`).then(r => r.json()).then(setRoutes);
-
-    // New endpoints
-    fetch(`${API}/api/stats/altitude-distribution`).then(r => r.json()).then(setAltitudeDistribution);
-    fetch(`${API}/api/stats/aircraft-types`).then(r => r.json()).then(setAircraftTypes);
-    fetch(`${API}/api/stats/activity-by-day`).then(r => r.json()).then(setActivityByDay);
-    fetch(`${API}/api/stats/recent-notable`).then(r => r.json()).then(setRecentNotable);
+    // Every panel from one request (one DB snapshot on the server)
+    fetch(`${API}/api/stats/dashboard`)
+      .then(r => r.json())
+      .then(d => {
+        setSummary(d["summary"]);
+        setSummary24h(d["summary-24h"]);
+        setClassificationDetailed(d["classification-detailed"]);
+        setHourly(d["hourly"]);
+
+        setTopAircraft(d["top-aircraft"]);
+        setTopOperators(d["top-operators"]);
+        setCountries(d["countries"]);
+        setRoutes(d["routes"]);
+
+        setAltitudeDistribution(d["altitude-distribution"]);
+        setAircraftTypes(d["aircraft-types"]);
+        setActivityByDay(d["activity-by-day"]);
+        setRecentNotable(d["recent-notable"]);
+      });
   }, []);
 
   // Load aircraft photo